@@ -31,4 +31,7 @@ setuptools.setup(
     },
     python_requires=">=3.9",
     install_requires=requirements,
+    extras_require={
+        "batch": ["numpy>=1.20"],
+    },
 )
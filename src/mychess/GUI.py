@@ -37,6 +37,13 @@ class GUI():
     piece_held : Piece
         Piece currently held by user with mouse
 
+    get_move : function
+        Plays for the computer, as the get_move functions of Chess.play_cli().
+        None if both sides are played with the mouse.
+
+    computer_color : bool
+        Color played by get_move, the one not to move when the GUI opens
+
     -------- PROMOTING LOGIC -------------
 
 
@@ -81,6 +88,9 @@ class GUI():
     gui_play_move(move)
         Play move, save relevant information, get new legal moves.
 
+    play_computer_move()
+        Play the move of get_move when it is the computer's turn
+
     -------- PROMOTING LOGIC ---------
 
     init_promotion(to:tup, start:tup)
@@ -126,11 +136,13 @@ class GUI():
 
     """
 
-    def __init__(self, width, height, chess):
+    def __init__(self, width, height, chess, get_move=None):
         pygame.init()
 
         self.chess = chess
         self.piece_held = None
+        self.get_move = get_move
+        self.computer_color = not chess.board.turn
         self.last_move_from = None
         self.last_move_to = None
 
@@ -259,7 +271,7 @@ class GUI():
                 piece = self.chess.board[i, j]
                 if piece:
                     # Draw pieces, except the one held and check if king is in check
-                    if not piece.piece_held:
+                    if piece is not self.piece_held:
                         piece_pixel_pos = self.get_piece_pixel_pos(piece)
                         # If King in check, draw King in check visual indicator
                         if piece.name == "K" and piece.in_check:
@@ -328,7 +340,6 @@ class GUI():
         self.promoting_column = to[0]
         self.promoting = True
         self.promoting_move = [start, to, ""] #
-        self.piece_held.piece_held = False
         self.piece_held = None
 
         def get_promoting_display_pieces():
@@ -381,6 +392,19 @@ class GUI():
         self.chess.legal_moves = self.chess.get_legal_moves()
         self.chess.turn_debug()
 
+    def play_computer_move(self):
+        """
+        Play the move chosen by get_move, if it is the computer's turn.
+
+        """
+        if self.get_move is None or self.promoting:
+            return
+        if self.chess.board.turn != self.computer_color:
+            return
+        move = self.get_move()
+        if move in self.chess.legal_moves:
+            self.gui_play_move(move)
+
     def hold_piece(self):
         """
         Function called when holding a piece with the mouse.
@@ -390,7 +414,6 @@ class GUI():
         piece = self.chess.board[mouse_pos]
         if piece:
             if piece.color == self.chess.board.turn:
-                piece.piece_held = True
                 self.piece_held = piece
 
     def drop_piece(self):
@@ -414,7 +437,6 @@ class GUI():
         else:
             print("Illegal move, try again")
 
-        self.piece_held.piece_held = False
         self.piece_held = None
 
 
@@ -452,6 +474,10 @@ class GUI():
 
 
             pygame.display.flip()
+            if self.chess.game_running:
+                self.play_computer_move()
+
+        print(self.chess.result.value)
 
     def show(self):
         """
@@ -1,4 +1,8 @@
 from mychess.utils import *
 from mychess.pieces import *
 from mychess.board import Board
-from mychess.mychess import Chess
+from mychess.bitboard import BitBoard
+from mychess.mychess import Chess, GameResult, IllegalMoveError
+from mychess.perft import perft
+from mychess.validate import validate_batch
+from mychess.movecache import enable_move_cache, disable_move_cache, get_move_cache
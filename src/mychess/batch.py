@@ -0,0 +1,191 @@
+"""
+batch.py -- Parses and writes many FEN positions at once with NumPy
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Positions are kept in a NumPy structured array instead of Board and Piece objects,
+so big datasets can be loaded without building a Python object for every square.
+Squares are indexed in FEN order, y*8+x as in the rest of the project:
+a8 is 0, h8 is 7 and h1 is 63.
+
+Needs NumPy, which the rest of the library doesn't, so it is not imported by mychess.
+It is installed with the batch extra: pip install -e .[batch]
+"""
+import numpy as np
+
+from .pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from .board import ROOK_SIDES, CASTLING_SIDES
+
+
+# White pieces are positive, black ones negative and empty squares 0
+PIECE_CODES = {"P": PAWN, "N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+PIECE_CODES.update({char.lower(): -code for char, code in PIECE_CODES.items()})
+
+POSITION_DTYPE = np.dtype([
+    ("pieces", np.int8, (64,)),
+    ("turn", np.bool_),
+    ("castling", np.uint8),
+    ("en_passeant", np.int8),
+    ("no_progress_plies", np.uint16),
+    ("turn_counter", np.uint16),
+])
+
+# FEN character of each piece code, shifted by 6 so black codes are positive.
+# Empty squares become dots, whose runs are later replaced by digits.
+CODE_CHARS = np.frombuffer(b"kqrbnp.PNBRQK", dtype=np.uint8)
+
+# Piece code of each ASCII FEN character, dots being the empty squares expanded from digits
+CHAR_CODES = np.zeros(256, dtype=np.int8)
+VALID_CHARS = np.zeros(256, dtype=np.bool_)
+for char, code in PIECE_CODES.items():
+    CHAR_CODES[ord(char)] = code
+    VALID_CHARS[ord(char)] = True
+VALID_CHARS[ord(".")] = True
+
+# Expands FEN digits into dots and drops rank separators
+EXPAND_EMPTY = str.maketrans({str(n): "." * n for n in range(1, 9)} | {"/": None})
+
+CASTLING_BITS = {side: 1 << bit for bit, side in enumerate(CASTLING_SIDES)}
+
+# Starting squares of pawns, which can still move two squares
+PAWN_FIRST_RANKS = {PAWN: 6, -PAWN: 1}
+
+
+class PositionArray(np.ndarray):
+    """
+    NumPy structured array of positions, one row for each FEN.
+    Made by parse_fens(), turned back into FEN by serialize_fens().
+    ...
+
+    Fields:
+    -------
+    pieces : int8[64]
+        Piece code of each square, positive for white and negative for black.
+        Ex: PAWN is a white pawn, -KING the black king, 0 an empty square
+
+    turn : bool
+        True if white is to move
+
+    castling : uint8
+        Castling rights, one bit for each of K, Q, k and q
+
+    en_passeant : int8
+        Square behind the pawn that can be taken En passeant, -1 if none
+
+    no_progress_plies : uint16
+        Half moves without captures or pawn movements
+
+    turn_counter : uint16
+        Number of the full move
+
+    Methods:
+    --------
+    pawns_first_move() -> bool[N, 64]
+        Pawns that can still move two squares, as Board.create_piece() infers them
+
+    rook_sides() -> str[N, 64]
+        Castling side of rooks in the corners, as Board.create_piece() infers them
+
+    """
+
+    def pawns_first_move(self):
+        pieces = self["pieces"]
+        first_move = np.zeros(pieces.shape, dtype=np.bool_)
+        for pawn_code, y in PAWN_FIRST_RANKS.items():
+            rank = slice(y * 8, y * 8 + 8)
+            first_move[:, rank] = pieces[:, rank] == pawn_code
+        return first_move
+
+    def rook_sides(self):
+        pieces = self["pieces"]
+        sides = np.full(pieces.shape, "", dtype="<U1")
+        for (x, y), side in ROOK_SIDES.items():
+            square = y * 8 + x
+            sides[np.abs(pieces[:, square]) == ROOK, square] = side
+        return sides
+
+
+def square_index(uci_square):
+    """
+    Index of a square in uci format, -1 for FEN's "-".
+    Ex: e3 -> 44
+
+    """
+    if uci_square == "-":
+        return -1
+    return (8 - int(uci_square[1])) * 8 + "abcdefgh".index(uci_square[0])
+
+def parse_fens(fens):
+    """
+    Parses a list of FEN strings into a PositionArray.
+    Accepts the same FEN grammar as Board.fen_2_board().
+    Raises ValueError naming the first FEN that can't be parsed.
+
+    """
+    fields = [fen.split(" ") for fen in fens]
+    positions = np.zeros(len(fields), dtype=POSITION_DTYPE).view(PositionArray)
+    if not fields:
+        return positions
+
+    # Pieces: expand every board to 64 characters and look them all up at once
+    boards = [row[0].translate(EXPAND_EMPTY) for row in fields]
+    for fen, row, board in zip(fens, fields, boards):
+        # Dots only stand for the expanded digits, FEN itself has none
+        if len(row) != 6 or len(board) != 64 or "." in row[0]:
+            raise ValueError(f"Invalid FEN: {fen}")
+    # Characters that are not ascii become "?", which is not valid either
+    squares = np.frombuffer("".join(boards).encode("ascii", "replace"), dtype=np.uint8).reshape(-1, 64)
+    valid = VALID_CHARS[squares].all(axis=1)
+    if not valid.all():
+        raise ValueError(f"Invalid FEN: {fens[np.flatnonzero(~valid)[0]]}")
+    positions["pieces"] = CHAR_CODES[squares]
+
+    # The other fields are short, so python lookups are enough
+    try:
+        castling_flags = {}
+        for row in fields:
+            if row[2] not in castling_flags:
+                castling_flags[row[2]] = sum(CASTLING_BITS[side] for side in row[2] if side != "-")
+        positions["turn"] = [row[1] == "w" for row in fields]
+        positions["castling"] = [castling_flags[row[2]] for row in fields]
+        positions["en_passeant"] = [square_index(row[3]) for row in fields]
+        positions["no_progress_plies"] = [int(row[4]) for row in fields]
+        positions["turn_counter"] = [int(row[5]) for row in fields]
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"Invalid FEN field: {e}") from None
+
+    return positions
+
+def serialize_fens(positions):
+    """
+    Writes a PositionArray back as a list of FEN strings.
+    parse_fens() followed by serialize_fens() gives the same FEN back,
+    as Board.board_2_fen() does for a single position.
+
+    """
+    if len(positions) == 0:
+        return []
+
+    # One line of 8 ranks of 9 characters per position, dots for empty squares
+    chars = np.full((len(positions), 8, 9), ord("/"), dtype=np.uint8)
+    chars[:, :, :8] = CODE_CHARS[positions["pieces"].astype(np.int16) + 6].reshape(-1, 8, 8)
+    chars[:, 7, 8] = ord("\n")
+    text = chars.tobytes().decode("ascii")
+    for n in range(8, 0, -1):
+        text = text.replace("." * n, str(n))
+    boards = text.split("\n")
+
+    castling_strings = {}
+    for flags in np.unique(positions["castling"]).tolist():
+        castling_strings[flags] = "".join(side for side in CASTLING_SIDES if flags & CASTLING_BITS[side]) or "-"
+    squares = [f"{'abcdefgh'[i % 8]}{8 - i // 8}" for i in range(64)]
+
+    fens = []
+    for board, turn, castling, en_passeant, no_progress_plies, turn_counter in zip(
+            boards, positions["turn"].tolist(), positions["castling"].tolist(),
+            positions["en_passeant"].tolist(), positions["no_progress_plies"].tolist(),
+            positions["turn_counter"].tolist()):
+        fens.append(" ".join([board, "w" if turn else "b", castling_strings[castling],
+                              squares[en_passeant] if en_passeant >= 0 else "-",
+                              str(no_progress_plies), str(turn_counter)]))
+    return fens
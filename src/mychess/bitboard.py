@@ -0,0 +1,442 @@
+"""
+bitboard.py -- Board state backed by bitboards for fast move generation
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Squares are indexed as y*8 + x, following the (x,y) coordinates of the board
+matrix. So a8 is 0, h8 is 7, a1 is 56 and h1 is 63.
+Each bitboard is a python int where bit n is set if square n is occupied.
+"""
+
+from .board import Board
+
+
+def make_leaper_table(offsets):
+    """
+    Precompute attacks of pieces that jump to fixed offsets (Knight, King, Pawn)
+    for every square of the board.
+
+    """
+    table = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        attacks = 0
+        for dx, dy in offsets:
+            if 0 <= x + dx <= 7 and 0 <= y + dy <= 7:
+                attacks |= 1 << ((y + dy) * 8 + x + dx)
+        table.append(attacks)
+    return table
+
+
+def make_ray_table(dx, dy):
+    """
+    Precompute the ray from every square to the edge of the board in one direction.
+
+    """
+    table = []
+    for sq in range(64):
+        x, y = (sq & 7) + dx, (sq >> 3) + dy
+        ray = 0
+        while 0 <= x <= 7 and 0 <= y <= 7:
+            ray |= 1 << (y * 8 + x)
+            x, y = x + dx, y + dy
+        table.append(ray)
+    return table
+
+
+SQUARES = [(sq & 7, sq >> 3) for sq in range(64)]
+
+KNIGHT_ATTACKS = make_leaper_table([(2, 1), (2, -1), (-2, 1), (-2, -1),
+                                    (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = make_leaper_table([(1, 0), (-1, 0), (0, 1), (0, -1),
+                                  (1, 1), (1, -1), (-1, 1), (-1, -1)])
+# Squares attacked by a pawn of each color standing on a square
+PAWN_ATTACKS = {True: make_leaper_table([(-1, -1), (1, -1)]),
+                False: make_leaper_table([(-1, 1), (1, 1)])}
+
+# (ray table, True if ray goes to increasing square indexes)
+# Opposite directions are kept next to each other
+DIAGONAL_RAYS = [(make_ray_table(dx, dy), dy > 0) for dx, dy in [(1, 1), (-1, -1), (-1, 1), (1, -1)]]
+ORTOGONAL_RAYS = [(make_ray_table(dx, dy), dy > 0 or (dy == 0 and dx > 0))
+                  for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]]
+
+
+def make_line_tables():
+    """
+    Precompute, for every pair of squares sharing a line:
+    BETWEEN[a][b]: squares strictly between a and b
+    LINE[a][b]: the whole board line through a and b
+
+    """
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    rays = DIAGONAL_RAYS + ORTOGONAL_RAYS
+    for a in range(64):
+        for i in range(0, len(rays), 2):
+            ray, opposite = rays[i][0], rays[i+1][0]
+            full_line = ray[a] | opposite[a] | (1 << a)
+            for table in [ray, opposite]:
+                for b in iterate_bits(table[a]):
+                    between[a][b] = table[a] & ~table[b] & ~(1 << b)
+                    line[a][b] = full_line
+    return between, line
+
+
+def slider_attacks(sq, occupied, rays):
+    """
+    Attacks of a sliding piece on `sq`: each ray stops at the first occupied square,
+    which is included since it may be a capture.
+
+    """
+    attacks = 0
+    for ray_table, positive in rays:
+        ray = ray_table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= ray_table[first]
+        attacks |= ray
+    return attacks
+
+
+def iterate_bits(bitboard):
+    """
+    Yields index of each set bit, lowest first.
+
+    """
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+BETWEEN, LINE = make_line_tables()
+# Attacks of sliders on an empty board, used to find pinning pieces
+DIAGONAL_ATTACKS = [slider_attacks(sq, 0, DIAGONAL_RAYS) for sq in range(64)]
+ORTOGONAL_ATTACKS = [slider_attacks(sq, 0, ORTOGONAL_RAYS) for sq in range(64)]
+
+# Pawn rows relevant for move generation: (start row, last row, push direction)
+PAWN_ROWS = {True: (6, 0, -8), False: (1, 7, 8)}
+
+PROMOTIONS = ["q", "b", "r", "n"]
+
+
+class BitBoard(Board):
+    """
+    A Board that also represents the position as bitboards, one for each piece type
+    and color, plus the occupancy of each color.
+    The list[list[Piece]] board is kept in sync so every Board method still works,
+    but legal move generation and attack detection are done with the bitboards.
+    ...
+
+    Attributes:
+    -----------
+    bitboards : dict
+        Bitboard of each piece type and color, keyed by its FEN character
+        Ex: bitboards["N"] are the white knights, bitboards["n"] the black ones
+
+    occupied : dict
+        Bitboard of all pieces of each color, keyed by color
+
+    Methods:
+    --------
+    sync_bitboards() -> None
+        Recompute all bitboards from the list[list[Piece]] board
+
+    attackers_mask(sq : int, color : bool, occupied : int) -> int
+        Bitboard of pieces of chosen color attacking a square
+
+    get_controlled_squares(color : bool) -> list[tup]
+        Returns coordinates of squares controlled by chosen color
+
+    is_attacked(square : tup, by_color : bool) -> bool
+        Check if square is attacked by pieces of chosen color
+
+    attackers_of(square : tup) -> list[Piece]
+        Returns pieces of both colors attacking the square
+
+    generate_legal_moves() -> list[tup]
+        Returns legal moves of the side to move
+
+    """
+    def __init__(self, fen=None):
+        self.bitboards = {char: 0 for char in "PNBRQKpnbrqk"}
+        self.occupied = {True: 0, False: 0}
+        super().__init__(fen)
+        self.sync_bitboards()
+
+    def __setitem__(self, key, value):
+        bit = 1 << (key[1] * 8 + key[0])
+        old = self.board[key[0]][key[1]]
+        if old:
+            self.bitboards[old.name if old.color else old.name.lower()] ^= bit
+            self.occupied[old.color] ^= bit
+        if value:
+            self.bitboards[value.name if value.color else value.name.lower()] |= bit
+            self.occupied[value.color] |= bit
+        super().__setitem__(key, value)
+
+    def sync_bitboards(self):
+        """
+        Recompute all bitboards from the list[list[Piece]] board.
+
+        """
+        self.bitboards = {char: 0 for char in "PNBRQKpnbrqk"}
+        self.occupied = {True: 0, False: 0}
+        for x in range(8):
+            for y in range(8):
+                piece = self.board[x][y]
+                if piece:
+                    bit = 1 << (y * 8 + x)
+                    self.bitboards[piece.name if piece.color else piece.name.lower()] |= bit
+                    self.occupied[piece.color] |= bit
+
+    def attackers_mask(self, sq, color, occupied):
+        """
+        Returns bitboard of pieces of chosen color that attack `sq`,
+        given the occupancy of the board.
+
+        """
+        bitboards = self.bitboards
+        if color:
+            pawns, knights, bishops, rooks, queens, king = "PNBRQK"
+        else:
+            pawns, knights, bishops, rooks, queens, king = "pnbrqk"
+        queens = bitboards[queens]
+        return ((PAWN_ATTACKS[not color][sq] & bitboards[pawns])
+                | (KNIGHT_ATTACKS[sq] & bitboards[knights])
+                | (KING_ATTACKS[sq] & bitboards[king])
+                | (slider_attacks(sq, occupied, DIAGONAL_RAYS) & (bitboards[bishops] | queens))
+                | (slider_attacks(sq, occupied, ORTOGONAL_RAYS) & (bitboards[rooks] | queens)))
+
+    def get_attacks_mask(self, color):
+        """
+        Returns bitboard of squares attacked by pieces of chosen color.
+
+        """
+        bitboards = self.bitboards
+        occupied = self.occupied[True] | self.occupied[False]
+        if color:
+            pawns, knights, bishops, rooks, queens, king = "PNBRQK"
+        else:
+            pawns, knights, bishops, rooks, queens, king = "pnbrqk"
+        attacks = 0
+        for sq in iterate_bits(bitboards[pawns]):
+            attacks |= PAWN_ATTACKS[color][sq]
+        for sq in iterate_bits(bitboards[knights]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in iterate_bits(bitboards[king]):
+            attacks |= KING_ATTACKS[sq]
+        for sq in iterate_bits(bitboards[bishops] | bitboards[queens]):
+            attacks |= slider_attacks(sq, occupied, DIAGONAL_RAYS)
+        for sq in iterate_bits(bitboards[rooks] | bitboards[queens]):
+            attacks |= slider_attacks(sq, occupied, ORTOGONAL_RAYS)
+        return attacks
+
+    def get_controlled_squares(self, color):
+        """
+        Returns squares which are target of pieces of a certain color.
+        """
+
+        return [SQUARES[sq] for sq in iterate_bits(self.get_attacks_mask(color))]
+
+    def is_attacked(self, square, by_color):
+        """
+        Check if square is attacked by any piece of a certain color.
+
+        """
+        occupied = self.occupied[True] | self.occupied[False]
+        return self.attackers_mask(square[1] * 8 + square[0], by_color, occupied) != 0
+
+    def attackers_of(self, square):
+        """
+        Returns pieces of both colors attacking a square.
+
+        """
+        sq = square[1] * 8 + square[0]
+        occupied = self.occupied[True] | self.occupied[False]
+        attackers = self.attackers_mask(sq, True, occupied) | self.attackers_mask(sq, False, occupied)
+        return [self.board[attacker & 7][attacker >> 3] for attacker in iterate_bits(attackers)]
+
+    # Attacks are computed from the bitboards when needed,
+    # so the incremental attack maps of Board are not kept
+
+    def init_attack_maps(self):
+        pass
+
+    def lift_attacks(self, squares, undo):
+        pass
+
+    def drop_attacks(self, squares, undo):
+        pass
+
+    def restore_attacks(self, undo):
+        pass
+
+    def get_pinned_mask(self, king_sq, color, occupied):
+        """
+        Returns bitboard of pieces of chosen color pinned to their king.
+
+        """
+        bitboards = self.bitboards
+        if color:
+            bishops, rooks, queens = "brq"
+        else:
+            bishops, rooks, queens = "BRQ"
+        queens = bitboards[queens]
+        snipers = ((DIAGONAL_ATTACKS[king_sq] & (bitboards[bishops] | queens))
+                   | (ORTOGONAL_ATTACKS[king_sq] & (bitboards[rooks] | queens)))
+        pinned = 0
+        own = self.occupied[color]
+        for sniper in iterate_bits(snipers):
+            blockers = BETWEEN[king_sq][sniper] & occupied
+            # Exactly one piece between king and sniper, and it is ours
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+        return pinned
+
+    def generate_legal_moves(self):
+        """
+        Generate legal moves of the side to move.
+        Checkers and pinned pieces are computed once, so only king moves and
+        En passeant need to check the king safety square by square.
+
+        """
+        turn = self.turn
+        bitboards = self.bitboards
+        own = self.occupied[turn]
+        enemy = self.occupied[not turn]
+        occupied = own | enemy
+        if turn:
+            pawns, knights, bishops, rooks, queens, king = "PNBRQK"
+        else:
+            pawns, knights, bishops, rooks, queens, king = "pnbrqk"
+
+        moves = []
+        king_bb = bitboards[king]
+        king_sq = king_bb.bit_length() - 1
+        checkers = self.attackers_mask(king_sq, not turn, occupied)
+        not_own = ~own
+
+        # King moves: target can't be attacked once the king left its square
+        without_king = occupied ^ king_bb
+        king_pos = SQUARES[king_sq]
+        for to in iterate_bits(KING_ATTACKS[king_sq] & not_own):
+            if not self.attackers_mask(to, not turn, without_king):
+                moves.append((king_pos, SQUARES[to], "%"))
+
+        # Only the king can move on double check
+        if checkers & (checkers - 1):
+            return moves
+
+        if checkers:
+            checker_sq = checkers.bit_length() - 1
+            target_mask = checkers | BETWEEN[king_sq][checker_sq]
+        else:
+            target_mask = not_own
+            self.generate_castling_moves(king_sq, moves)
+
+        pinned = self.get_pinned_mask(king_sq, turn, occupied)
+        line = LINE[king_sq]
+
+        # Knights: a pinned knight can never move
+        for sq in iterate_bits(bitboards[knights] & ~pinned):
+            start = SQUARES[sq]
+            for to in iterate_bits(KNIGHT_ATTACKS[sq] & target_mask):
+                moves.append((start, SQUARES[to], "%"))
+
+        for piece_bb, rays in [(bitboards[bishops], DIAGONAL_RAYS),
+                               (bitboards[rooks], ORTOGONAL_RAYS),
+                               (bitboards[queens], DIAGONAL_RAYS + ORTOGONAL_RAYS)]:
+            for sq in iterate_bits(piece_bb):
+                targets = slider_attacks(sq, occupied, rays) & target_mask
+                if pinned >> sq & 1:
+                    targets &= line[sq]
+                start = SQUARES[sq]
+                for to in iterate_bits(targets):
+                    moves.append((start, SQUARES[to], "%"))
+
+        self.generate_pawn_moves(pawns, king_sq, occupied, enemy, target_mask, pinned, moves)
+        return moves
+
+    def generate_pawn_moves(self, pawns, king_sq, occupied, enemy, target_mask, pinned, moves):
+        """
+        Append legal pawn moves, including double movement, promotions and En passeant.
+
+        """
+        turn = self.turn
+        start_row, last_row, push = PAWN_ROWS[turn]
+        attacks = PAWN_ATTACKS[turn]
+        line = LINE[king_sq]
+        ghost_pawn = self.get_ghost_pawn(not turn)
+        ghost_sq = ghost_pawn[1] * 8 + ghost_pawn[0] if ghost_pawn else None
+
+        for sq in iterate_bits(self.bitboards[pawns]):
+            targets = 0
+            one_ahead = sq + push
+            if not occupied >> one_ahead & 1:
+                targets |= 1 << one_ahead
+                if sq >> 3 == start_row and not occupied >> (one_ahead + push) & 1:
+                    targets |= 1 << (one_ahead + push)
+            targets |= attacks[sq] & enemy
+            targets &= target_mask
+            if pinned >> sq & 1:
+                targets &= line[sq]
+
+            start = SQUARES[sq]
+            for to in iterate_bits(targets):
+                if to >> 3 == last_row:
+                    for promotion in PROMOTIONS:
+                        moves.append((start, SQUARES[to], promotion))
+                else:
+                    moves.append((start, SQUARES[to], "%"))
+
+            if ghost_sq is not None and attacks[sq] >> ghost_sq & 1:
+                if self.en_passeant_is_legal(sq, ghost_sq, king_sq, occupied):
+                    moves.append((start, SQUARES[ghost_sq], "%"))
+
+    def en_passeant_is_legal(self, sq, ghost_sq, king_sq, occupied):
+        """
+        En passeant removes two pieces from the same row, which can discover
+        an attack on the king, so it is checked by playing it on the occupancy.
+
+        """
+        turn = self.turn
+        captured_sq = ghost_sq - PAWN_ROWS[turn][2]
+        captured_bit = 1 << captured_sq
+        occupied = (occupied ^ (1 << sq) ^ captured_bit) | (1 << ghost_sq)
+        captured_char = "p" if turn else "P"
+        self.bitboards[captured_char] ^= captured_bit
+        attacked = self.attackers_mask(king_sq, not turn, occupied)
+        self.bitboards[captured_char] ^= captured_bit
+        return not attacked
+
+    def generate_castling_moves(self, king_sq, moves):
+        """
+        Append castling moves. Called only when the king is not in check.
+        Needs the right to castle, the rook still in place,
+        the squares between king and rook empty and
+        the squares the king goes through not attacked.
+
+        """
+        turn = self.turn
+        occupied = self.occupied[True] | self.occupied[False]
+        _, y = SQUARES[king_sq]
+        for rook_side, rook_x, direction in [("K", 7, 1), ("Q", 0, -1)]:
+            if not turn:
+                rook_side = rook_side.lower()
+            if not self.can_castle[rook_side]:
+                continue
+            rook = self.board[rook_x][y]
+            if not rook or rook.name != "R" or rook.rook_side != rook_side:
+                continue
+            between = BETWEEN[king_sq][y * 8 + rook_x]
+            if between & occupied:
+                continue
+            passing = [king_sq + direction, king_sq + 2 * direction]
+            if any(self.attackers_mask(sq, not turn, occupied) for sq in passing):
+                continue
+            moves.append((SQUARES[king_sq], SQUARES[passing[1]], "%"))
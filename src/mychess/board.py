@@ -4,10 +4,112 @@ Author: Geraldo Luiz Pereira
 www.github.com/rousbound
 """
 
+import struct
 from collections import OrderedDict
 
 from .pieces import King, Queen, Rook, Bishop, Knight, Pawn
-from .utils import mat_2_uci
+from .pieces import DIAGONAL_DIRECTIONS, ORTOGONAL_DIRECTIONS, KNIGHT_OFFSETS, KING_OFFSETS
+from .utils import mat_2_uci, uci_2_mat, move_2_uci, disambiguate
+from .zobrist import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_EN_PASSEANT
+from .evaluation import MIDGAME_SCORES, ENDGAME_SCORES, PHASES, EXCHANGE_VALUES
+
+# Packed position: occupancy bitboard, one piece per nibble in square order,
+# turn and castling flags, En passeant file, no progress plies and turn counter
+POSITION_FORMAT = struct.Struct(">Q16sBBHH")
+POSITION_SIZE = POSITION_FORMAT.size
+PIECE_CODES = "PNBRQKpnbrqk"
+CASTLING_SIDES = "KQkq"
+ROOK_SIDES = {(0, 0): "q", (0, 7): "Q", (7, 0): "k", (7, 7): "K"}
+
+
+def sign(n):
+    """
+    Returns -1, 0 or 1 according to the sign of n.
+    """
+    return (n > 0) - (n < 0)
+
+
+class UndoRecord():
+    """
+    Everything Board.make_move() changes in the board state, saved so that
+    Board.unmake_move() can bring the board back to the exact previous position.
+    ...
+
+    Attributes:
+    -----------
+    move : tup
+        Move that was made
+        Ex: ((4,6),(4,4),%)
+
+    piece : Piece
+        Piece that was moved
+
+    captured_piece : Piece
+        Piece that was captured, None if the move wasn't a capture.
+        Obs: On En passeant it is not on the target square, but it still
+        knows its own position.
+
+    castling : str
+        "O-O", "O-O-O" or None
+
+    rook : Piece
+    rook_start : tup
+        Rook moved by castling and its starting square
+
+    promoted_piece : Piece
+        Piece that replaced the pawn on promotion
+
+    first_move : bool
+        Pawn first_move flag before the move
+
+    can_castle : dict
+    white_ghost_pawn : tup
+    black_ghost_pawn : tup
+    no_progress_plies : int
+    turn_counter : int
+        Board state before the move
+
+    board_states_counter : dict
+        Counter before the move. Castling replaces it with a new dict.
+
+    board_state : int
+        Key incremented in board_states_counter after the move
+
+    zobrist_key : int
+        Zobrist key before the move
+
+    kings_in_check : list[tup]
+        Kings and their in_check flag before the move
+
+    lifted_attacks : list[tup]
+        Pieces whose attacks were removed from the attack maps before
+        the move, and their attacked squares at that time
+
+    dropped_attacks : list[Piece]
+        Pieces whose attacks were added to the attack maps after the move
+
+    """
+    def __init__(self, move, piece):
+        self.move = move
+        self.piece = piece
+        self.captured_piece = None
+        self.castling = None
+        self.rook = None
+        self.rook_start = None
+        self.promoted_piece = None
+        self.first_move = None
+        self.can_castle = None
+        self.white_ghost_pawn = None
+        self.black_ghost_pawn = None
+        self.no_progress_plies = 0
+        self.turn_counter = 0
+        self.board_states_counter = None
+        self.board_state = None
+        self.zobrist_key = 0
+        self.kings_in_check = []
+        self.lifted_attacks = []
+        self.dropped_attacks = []
+
 
 class Board():
     """
@@ -41,8 +143,39 @@ class Board():
     black_ghost_pawn : tup
         The coordinates of a white/black ghost piece representing a takeable pawn for en passant
 
-    board_states : list[Board]
-        List of boards, relevant for three fold repetition draw criteria.
+    board_states_counter : dict
+        Number of times each position happened, keyed by zobrist_key.
+        Relevant for three fold repetition draw criteria.
+
+    zobrist_key : int
+        64 bit hash of the position: pieces, turn, castling rights and
+        En passeant file, when the capture is possible.
+        Updated incrementally as pieces are placed and moves are made.
+
+    midgame_score : int
+    endgame_score : int
+        Material and piece-square score of the position for white, in centipawns,
+        with middle game and endgame values. Used by evaluation.evaluate().
+
+    phase : int
+        Non pawn material left, weighted as evaluation.PHASE_WEIGHTS.
+        The scores are updated incrementally with the Zobrist key.
+
+    piece_lists : dict
+        Pieces of each type and color keyed by their square, for each FEN character
+        Ex: piece_lists["N"] are the white knights, piece_lists["k"] the black king
+        Kept up to date by __setitem__, so every board write updates them.
+
+    attackers : list[list[set[Piece]]]
+        Pieces attacking each square
+
+    attack_counts : dict
+        Number of pieces of each color attacking each square, keyed by color
+
+    piece_attacks : dict
+        Squares attacked by each piece on the board.
+        The attack maps are built when the board is created and
+        updated incrementally by make_move() and unmake_move().
 
     Methods:
     --------
@@ -55,12 +188,45 @@ class Board():
     get_controlled_squares(color : bool) -> list[tup]
         Returns coordinates of squares controlled by chosen color
 
+    get_least_valuable_attacker(square : tup, color : bool, removed : set) -> Piece
+        Returns the cheapest piece of a color attacking a square, ignoring the removed squares
+
+    see(move : tup) -> int
+        Static exchange evaluation: material won by a capture after all recaptures on its square
+
+    is_attacked(square : tup, by_color : bool) -> bool
+        Check if square is attacked by pieces of chosen color
+
+    attackers_of(square : tup) -> list[Piece]
+        Returns pieces of both colors attacking the square
+
     remove_castling_rights(color: bool) -> None
         Remove castling rights of player
 
     board_2_fen() -> str
         Make a string representation of the board in the well known FEN format
 
+    create_piece(char : str, x : int, y : int) -> Piece
+        Create the piece of a FEN character on a square
+
+    to_bytes() -> bytes
+        Pack the position in POSITION_SIZE bytes, holding the same information as FEN
+
+    from_bytes(data : bytes) -> Board
+        Create a board from a position packed by to_bytes()
+
+    compute_zobrist_key() -> int
+        Compute the Zobrist key of the position from scratch
+
+    init_evaluation() -> None
+        Compute the middle game and endgame scores and the phase from scratch
+
+    material_draw() -> str
+        Name of the combination of pieces no side can checkmate with, None if there is none
+
+    get_state_key() -> int
+        Zobrist key of turn, castling rights and En passeant file
+
     get_ghost_pawn(color: bool) -> tup
         Returns the ghost pawn of the desired color
 
@@ -70,10 +236,13 @@ class Board():
     activate_ghost_pawn(pos, color) -> None
         Activates ghost pawn of desired color
 
+    init_piece_lists() -> None
+        Build the piece lists from scratch
+
     get_all_pieces() -> list[Piece]
         Returns all board alive pieces in a list for easy iteration
 
-    has_same_target(start : tup, color: bool, piece : Piece) -> str
+    has_same_target(start : tup, to : tup, piece : Piece, color: bool) -> str
         Check if two pieces could have gone to the same square and return
         information needed to discern the start piece.
 
@@ -83,6 +252,27 @@ class Board():
     get_king(color : bool) -> Piece
         Get king of desired color
 
+    generate_legal_moves() -> list[tup]
+        Returns legal moves of the side to move
+
+    is_legal(move : tup) -> bool
+        Check if a single move is legal, without generating the others
+
+    get_pins(king : Piece) -> dict
+        Returns pieces pinned to the king and the squares they can still move to
+
+    get_pin(king : Piece, piece : Piece) -> list[tup]
+        Returns the squares a piece pinned to the king can still move to, None if it isn't pinned
+
+    get_check_block_squares(king : Piece, checker : Piece) -> list[tup]
+        Returns squares that stop a check, by capture or interposition
+
+    make_move(move : tup) -> UndoRecord
+        Make move on the board, updating all board state
+
+    unmake_move(undo : UndoRecord) -> None
+        Undo move made by make_move()
+
 
     """
     def __init__(self, fen=None):
@@ -98,15 +288,43 @@ class Board():
         self.white_ghost_pawn = None
         self.black_ghost_pawn = None
         self.board_states_counter = OrderedDict()
+        self.zobrist_key = 0
+        self.midgame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        self.piece_lists = {char: {} for char in "PNBRQKpnbrqk"}
 
         self.uci_moves_list = []
-        if fen:
+        if isinstance(fen, bytes):
+            self.bytes_2_board(fen)
+        elif fen:
             self.fen_2_board(fen)
         else:
             self.setup_initial_position()
+        self.init_piece_lists()
+        self.zobrist_key = self.compute_zobrist_key()
+        self.init_evaluation()
+        self.init_attack_maps()
 
     def __setitem__(self, key, value):
-        self.board[key[0]][key[1]] = value
+        x, y = key
+        column = self.board[x]
+        old = column[y]
+        if old:
+            char = old.name if old.color else old.name.lower()
+            self.zobrist_key ^= ZOBRIST_PIECES[char][x][y]
+            self.midgame_score -= MIDGAME_SCORES[char][x][y]
+            self.endgame_score -= ENDGAME_SCORES[char][x][y]
+            self.phase -= PHASES[char]
+            del self.piece_lists[char][key]
+        if value:
+            char = value.name if value.color else value.name.lower()
+            self.zobrist_key ^= ZOBRIST_PIECES[char][x][y]
+            self.midgame_score += MIDGAME_SCORES[char][x][y]
+            self.endgame_score += ENDGAME_SCORES[char][x][y]
+            self.phase += PHASES[char]
+            self.piece_lists[char][key] = value
+        column[y] = value
 
 
     def __getitem__(self, item):
@@ -165,7 +383,7 @@ class Board():
         as we can see in the exact order below.
 
         """
-        fen_pieces, turn, castling, enpasseant, no_progress_counter, turn_counter = fen.split(" ")
+        fen_pieces, turn, castling, enpasseant, no_progress_plies, turn_counter = fen.split(" ")
 
         self.can_castle = {"K": False, "Q": False, "k": False, "q": False, None: False}
 
@@ -177,65 +395,49 @@ class Board():
             self.can_castle[side_color] = True
 
         # Load counters
-        self.no_progress_counter = int(no_progress_counter)
+        self.no_progress_plies = int(no_progress_plies)
         self.turn_counter = int(turn_counter)
 
         # Load En Passeant
         if enpasseant != "-":
             if self.turn:
-                self.black_ghost_pawn = mat_2_uci(enpasseant)
+                self.black_ghost_pawn = uci_2_mat(enpasseant)
             else:
-                self.white_ghost_pawn = mat_2_uci(enpasseant)
+                self.white_ghost_pawn = uci_2_mat(enpasseant)
 
         # Load pieces
+        for y, row in enumerate(fen_pieces.split("/")):
+            x = 0
+            for char in row:
+                if char.isdigit():
+                    x += int(char)
+                else:
+                    self[x,y] = self.create_piece(char, x, y)
+                    x += 1
 
-        skip = 0
-        squares = 0
-        fen_pieces = fen_pieces.replace("/","")
-        i = 0
-        while True:
-            x, y = squares%8, squares//8
-            char = fen_pieces[i]
-            if char in "12345678":
-                skip += int(char)
-                squares += int(char)
-                i+=1
-            elif skip == 0:
-                if char in "rnbqkpRNBQKP":
-                    squares += 1
-                    color = char.isupper()
-                    if char in "rR":
-                        rook_side = None
-                        if (x,y) == (0,0):
-                            rook_side = "q"
-                        if (x,y) == (0,7):
-                            rook_side = "Q"
-                        if (x,y) == (7,0):
-                            rook_side = "k"
-                        if (x,y) == (7,7):
-                            rook_side = "K"
-                        self[x,y] = Rook(color, x, y, rook_side)
-                    if char in "nN":
-                        self[x,y] = Knight(color, x, y)
-                    if char in "bB":
-                        self[x,y] = Bishop(color, x, y, color_complex = True)
-                    if char in "qQ":
-                        self[x,y] = Queen(color, x, y)
-                    if char in "kK":
-                        self[x,y] = King(color, x, y)
-                    if char in "pP":
-                        if (char == "p" and y == 1) or (char == "P" and y == 6):
-                            self[x,y] = Pawn(color, x , y, first_move = True)
-                        else:
-                            self[x,y] = Pawn(color, x , y, first_move = False)
-
-                    i+=1
-            elif skip != 0:
-                skip = max(0,skip-1)
-
+    def create_piece(self, char, x, y):
+        """
+        Create the piece of a FEN character standing at (x, y).
+        What FEN doesn't say is deduced from the square: rooks in the corners
+        can castle with the king, pawns in their first rank can move two squares.
+        Raises ValueError for characters that are not pieces.
 
-            if squares == 64:
-                break
+        """
+        color = char.isupper()
+        name = char.upper()
+        if name == "P":
+            return Pawn(color, x, y, first_move = y == (6 if color else 1))
+        if name == "N":
+            return Knight(color, x, y)
+        if name == "B":
+            return Bishop(color, x, y, color_complex = (x + y) % 2 == 1)
+        if name == "R":
+            return Rook(color, x, y, ROOK_SIDES.get((x, y)))
+        if name == "Q":
+            return Queen(color, x, y)
+        if name == "K":
+            return King(color, x, y)
+        raise ValueError(f"Invalid piece in FEN: {char}")
 
     def board_2_fen(self):
         """
@@ -246,56 +448,185 @@ class Board():
         number of "no progress moves" and turn counter.
 
         """
-        fen = ""
+        rows = []
         for y in range(8):
+            row = ""
             no_piece = 0
             for x in range(8):
-                piece = self[x,y]
+                piece = self.board[x][y]
                 if piece:
-                    if no_piece != 0:
-                        fen += str(no_piece)
+                    if no_piece:
+                        row += str(no_piece)
                         no_piece = 0
-                    if piece.color:
-                        fen += piece.name
-                    else:
-                        fen += piece.name.lower()
-                elif x != 7:
-                    no_piece += 1
-                elif x == 7:
+                    row += piece.name if piece.color else piece.name.lower()
+                else:
                     no_piece += 1
-                    if no_piece != 0:
-                        fen += str(no_piece)
-            if y != 7:
-                fen += "/"
+            if no_piece:
+                row += str(no_piece)
+            rows.append(row)
 
-        # Concatanate turn information
-        fen += " w " if self.turn else " b "
-        can_castle = ""
+        # Castling rights
+        can_castle = "".join(side for side in CASTLING_SIDES if self.can_castle[side]) or "-"
 
-        # Concatenate castling right information
-        for key, value in self.can_castle.items():
-            if value:
-                can_castle += key
-        can_castle = "-" if len(can_castle) == 0 else can_castle
-        fen += can_castle
+        # En passeant
+        ghost_pawn = self.white_ghost_pawn or self.black_ghost_pawn
+        enpasseant = mat_2_uci(ghost_pawn) if ghost_pawn else "-"
 
-        # Concatenate En passeant information
-        if self.white_ghost_pawn:
-            fen += " " + mat_2_uci(self.white_ghost_pawn)
-        elif self.black_ghost_pawn:
-            fen += " " + mat_2_uci(self.black_ghost_pawn)
-        elif not self.white_ghost_pawn and not self.black_ghost_pawn:
-            fen += " " + "-"
+        return " ".join(["/".join(rows), "w" if self.turn else "b", can_castle, enpasseant,
+                         str(self.no_progress_plies), str(self.turn_counter)])
 
-        # Concatenate turn counter and no progress plies information
-        fen += " " + str(self.no_progress_plies)
-        fen += " " + str(self.turn_counter)
+    def to_bytes(self):
+        """
+        Packs the position in POSITION_SIZE bytes, holding the same information as FEN:
+        a 64 bit occupancy, a nibble for each piece in square order, turn and
+        castling flags, En passeant file and both counters.
+        Positions with more than 32 pieces can't be packed.
 
-        return fen
+        """
+        occupancy = 0
+        codes = []
+        for y in range(8):
+            for x in range(8):
+                piece = self.board[x][y]
+                if piece:
+                    occupancy |= 1 << (y * 8 + x)
+                    codes.append(PIECE_CODES.index(piece.name if piece.color else piece.name.lower()))
+        if len(codes) > 32:
+            raise ValueError("Can't pack a position with more than 32 pieces")
+        codes += [0] * (32 - len(codes))
+        nibbles = bytes(codes[i] << 4 | codes[i+1] for i in range(0, 32, 2))
+
+        flags = 16 if self.turn else 0
+        for bit, side in enumerate(CASTLING_SIDES):
+            if self.can_castle[side]:
+                flags |= 1 << bit
+
+        # En passeant file plus one, zero if there is none
+        ghost_pawn = self.white_ghost_pawn or self.black_ghost_pawn
+        enpasseant = ghost_pawn[0] + 1 if ghost_pawn else 0
+
+        return POSITION_FORMAT.pack(occupancy, nibbles, flags, enpasseant,
+                                    self.no_progress_plies, self.turn_counter)
+
+    def bytes_2_board(self, data):
+        """
+        Loads a position packed by to_bytes(), as fen_2_board() does with FEN.
+
+        """
+        occupancy, nibbles, flags, enpasseant, self.no_progress_plies, self.turn_counter = \
+            POSITION_FORMAT.unpack(data)
+
+        self.turn = bool(flags & 16)
+        self.can_castle = {"K": False, "Q": False, "k": False, "q": False, None: False}
+        for bit, side in enumerate(CASTLING_SIDES):
+            self.can_castle[side] = bool(flags & (1 << bit))
+
+        # Same squares board_2_fen() writes for the pawn that can be taken
+        if enpasseant:
+            if self.turn:
+                self.black_ghost_pawn = (enpasseant - 1, 2)
+            else:
+                self.white_ghost_pawn = (enpasseant - 1, 5)
 
+        codes = [code for byte in nibbles for code in (byte >> 4, byte & 15)]
+        i = 0
+        while occupancy:
+            square = (occupancy & -occupancy).bit_length() - 1
+            occupancy &= occupancy - 1
+            x, y = square & 7, square >> 3
+            self[x,y] = self.create_piece(PIECE_CODES[codes[i]], x, y)
+            i += 1
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates a board from a position packed by to_bytes().
+        Ex: Board.from_bytes(board.to_bytes()).board_2_fen() == board.board_2_fen()
+
+        """
+        return cls(bytes(data))
+
+    def compute_zobrist_key(self):
+        """
+        Compute the Zobrist key of the position from scratch.
 
+        """
+        key = self.get_state_key()
+        for x in range(8):
+            for y in range(8):
+                piece = self.board[x][y]
+                if piece:
+                    key ^= ZOBRIST_PIECES[piece.name if piece.color else piece.name.lower()][x][y]
+        return key
 
+    def init_evaluation(self):
+        """
+        Compute the middle game and endgame scores and the phase from scratch.
 
+        """
+        self.midgame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        for char, pieces in self.piece_lists.items():
+            for x, y in pieces:
+                self.midgame_score += MIDGAME_SCORES[char][x][y]
+                self.endgame_score += ENDGAME_SCORES[char][x][y]
+                self.phase += PHASES[char]
+
+    def material_draw(self):
+        """
+        Certain combinations of pieces are impossible to deliver checkmate with.
+        What constitutes objetively a draw.
+        Returns the name of the combination on the board: "ONLY_KINGS", "KING_AND_BISHOP",
+        "KING_AND_KNIGHT" or "OPPOSITE_BISHOPS", None if checkmate is still possible.
+
+        """
+        pieces_left = [] # Other than both kings
+        for char, pieces in self.piece_lists.items():
+            if char not in "Kk":
+                pieces_left.extend(pieces.values())
+                if len(pieces_left) > 2:
+                    return None
+        if not pieces_left:
+            return "ONLY_KINGS"
+        elif len(pieces_left) == 1:
+            piece = pieces_left[0]
+            if piece.name == "B":
+                return "KING_AND_BISHOP"
+            elif piece.name == "N":
+                return "KING_AND_KNIGHT"
+        else:
+            piece1, piece2 = pieces_left
+            if piece1.color != piece2.color:
+                if piece1.name == "B" and piece2.name == "B":
+                    if piece1.color_complex != piece2.color_complex:
+                        return "OPPOSITE_BISHOPS"
+        return None
+
+    def get_state_key(self):
+        """
+        Zobrist key of the state that is not pieces:
+        turn, castling rights and En passeant file.
+        The En passeant file only counts if a pawn of the side to move
+        stands next to the pawn that can be taken, otherwise positions
+        reached with or without a double pawn movement would differ.
+
+        """
+        key = 0 if self.turn else ZOBRIST_BLACK_TO_MOVE
+        for side, side_key in ZOBRIST_CASTLING.items():
+            if self.can_castle[side]:
+                key ^= side_key
+        ghost_pawn = self.get_ghost_pawn(not self.turn)
+        if ghost_pawn:
+            x = ghost_pawn[0]
+            y = ghost_pawn[1] + 1 if self.turn else ghost_pawn[1] - 1
+            for side in [-1, 1]:
+                if 0 <= x + side <= 7:
+                    piece = self.board[x + side][y]
+                    if piece and piece.name == "P" and piece.color == self.turn:
+                        key ^= ZOBRIST_EN_PASSEANT[x]
+                        break
+        return key
 
     def get_ghost_pawn(self, color):
         """
@@ -327,42 +658,415 @@ class Board():
         else:
             self.black_ghost_pawn = (pos[0], pos[1] + 1)
 
+    def generate_legal_moves(self):
+        """
+        Iterate through all pieces of turn color and get it's valid moves.
+        Checkers and pinned pieces are computed once for the position, and
+        the valid moves are filtered with them instead of simulating each move:
+        - King can't go to attacked squares, nor stay on the line of a checking slider.
+        - On double check only the king can move.
+        - On check, other pieces must capture the checker or block it.
+        - Pinned pieces can only move along the pin.
+        En passeant is the exception, since it removes two pieces from the
+        same row and can discover a check no pin covers, so it is simulated.
+
+        """
+        legal_moves = []
+        turn = self.turn
+        king = self.get_king(turn)
+        king_pos = king.get_pos()
+        checkers = [piece for piece in self.attackers_of(king_pos) if piece.color != turn]
+
+        # The king would still be in the ray of a checking slider after stepping back
+        x_ray_squares = []
+        for checker in checkers:
+            if checker.name in "BRQ":
+                x_ray_squares.append((king.x - sign(checker.x - king.x),
+                                      king.y - sign(checker.y - king.y)))
+
+        for move in king.get_valid_moves(self):
+            to = move[1]
+            # Castling squares were already checked by the King
+            if abs(to[0] - king.x) > 1:
+                legal_moves.append(move)
+            elif not self.is_attacked(to, not turn) and to not in x_ray_squares:
+                legal_moves.append(move)
+
+        if len(checkers) > 1:
+            return legal_moves
+
+        block_squares = self.get_check_block_squares(king, checkers[0]) if checkers else None
+        pins = self.get_pins(king)
+
+        for piece in self.get_all_pieces():
+            if piece.color != turn or piece is king:
+                continue
+            pin_squares = pins.get(piece)
+            for move in piece.get_valid_moves(self):
+                to = move[1]
+                if piece.name == "P" and to[0] != piece.x and not self[to]:
+                    undo = self.make_move(move)
+                    if not self.is_attacked(king_pos, not turn):
+                        legal_moves.append(move)
+                    self.unmake_move(undo)
+                    continue
+                if pin_squares is not None and to not in pin_squares:
+                    continue
+                if block_squares is not None and to not in block_squares:
+                    continue
+                legal_moves.append(move)
+        return legal_moves
+
+    def is_legal(self, move):
+        """
+        Check if a move of the side to move is legal, as generate_legal_moves() would,
+        but only generating the moves of the piece being moved.
+        The king safety tests are the same: attacked squares for the king,
+        and for other pieces checks, pins and En passeant simulated.
+
+        """
+        start, to, _ = move
+        turn = self.turn
+        piece = self[start]
+        if not piece or piece.color != turn:
+            return False
+        if move not in piece.get_valid_moves(self):
+            return False
+
+        king = self.get_king(turn)
+        king_pos = king.get_pos()
+        checkers = [attacker for attacker in self.attackers_of(king_pos) if attacker.color != turn]
+        if piece is king:
+            # Castling squares were already checked by the King
+            if abs(to[0] - king.x) > 1:
+                return True
+            if self.is_attacked(to, not turn):
+                return False
+            # The king would still be in the ray of a checking slider after stepping back
+            for checker in checkers:
+                if checker.name in "BRQ" and to == (king.x - sign(checker.x - king.x),
+                                                    king.y - sign(checker.y - king.y)):
+                    return False
+            return True
+
+        if len(checkers) > 1:
+            return False
+        if piece.name == "P" and to[0] != piece.x and not self[to]:
+            undo = self.make_move(move)
+            legal = not self.is_attacked(king_pos, not turn)
+            self.unmake_move(undo)
+            return legal
+        pin_squares = self.get_pin(king, piece)
+        if pin_squares is not None and to not in pin_squares:
+            return False
+        if checkers and to not in self.get_check_block_squares(king, checkers[0]):
+            return False
+        return True
+
+    def get_pins(self, king):
+        """
+        Scan rays from the king, as get_diagonal_moves() and get_ortogonal_moves() do.
+        If the first piece found is friendly and the next one is an enemy slider
+        moving along that ray, the friendly piece is pinned.
+        Returns a dict of pinned pieces and the squares from the king to the pinner,
+        which are the only ones they can move to.
+
+        """
+        pins = {}
+        for directions, sliders in [(DIAGONAL_DIRECTIONS, "BQ"), (ORTOGONAL_DIRECTIONS, "RQ")]:
+            for dx, dy in directions:
+                ray = []
+                blocker = None
+                x, y = king.x + dx, king.y + dy
+                while 0 <= x <= 7 and 0 <= y <= 7:
+                    ray.append((x, y))
+                    piece = self.board[x][y]
+                    if piece:
+                        if piece.color == king.color:
+                            if blocker:
+                                break
+                            blocker = piece
+                        else:
+                            if blocker and piece.name in sliders:
+                                pins[blocker] = ray
+                            break
+                    x, y = x + dx, y + dy
+        return pins
+
+    def get_pin(self, king, piece):
+        """
+        Same as get_pins(), for a single piece: only the ray from the king
+        through the piece is scanned.
+        Returns the squares from the king to the pinner, None if the piece isn't pinned.
+
+        """
+        dx, dy = piece.x - king.x, piece.y - king.y
+        if dx and dy and abs(dx) != abs(dy):
+            return None
+        sliders = "BQ" if dx and dy else "RQ"
+        dx, dy = sign(dx), sign(dy)
+        ray = []
+        x, y = king.x + dx, king.y + dy
+        while 0 <= x <= 7 and 0 <= y <= 7:
+            ray.append((x, y))
+            other = self.board[x][y]
+            if other and other is not piece:
+                # The first piece after the king must be `piece`, and the next an enemy slider
+                if other.color != king.color and other.name in sliders and piece.get_pos() in ray:
+                    return ray
+                return None
+            x, y = x + dx, y + dy
+        return None
+
+    def get_check_block_squares(self, king, checker):
+        """
+        Squares where a piece stops the check: the checker square,
+        and for sliders, the squares between it and the king.
+
+        """
+        squares = [checker.get_pos()]
+        if checker.name in "BRQ":
+            dx, dy = sign(checker.x - king.x), sign(checker.y - king.y)
+            x, y = king.x + dx, king.y + dy
+            while (x, y) != checker.get_pos():
+                squares.append((x, y))
+                x, y = x + dx, y + dy
+        return squares
+
+    def get_promotion(self, promotion, selected_piece):
+        """
+        Return promoted piece
+
+        """
+        color = selected_piece.color
+        if promotion == "q":
+            promoted_piece = Queen(color, selected_piece.x, selected_piece.y)
+        elif promotion == "r":
+            promoted_piece = Rook(color, selected_piece.x, selected_piece.y)
+        elif promotion == "b":
+            promoted_piece = Bishop(color, selected_piece.x, selected_piece.y)
+        elif promotion == "n":
+            promoted_piece = Knight(color, selected_piece.x, selected_piece.y)
+        return promoted_piece
+
+    def apply_castle(self, move, undo):
+        """
+        Move the rook of a castling move and save it in the undo record.
+
+        """
+        to = move[1]
+        y = to[1]
+        # ShortCastling
+        if to[0] == 6:
+            undo.castling = "O-O"
+            rook_start, rook_to = (7,y), (5,y)
+        # LongCastling
+        elif to[0] == 2:
+            undo.castling = "O-O-O"
+            rook_start, rook_to = (0,y), (3,y)
+        undo.rook = self[rook_start]
+        undo.rook_start = rook_start
+        undo.rook.move(rook_to, self)
+
+    def make_move(self, move):
+        """
+        Moves a piece at `start` to `to`.
+        Checks if the move is a special one, and apply the
+        correct transformation to the board.
+        The move is expected to be valid, returns an UndoRecord
+        to be passed to unmake_move().
+
+        move: tup
+            Ex: ((4,6),(4,4),%)
+
+        """
+        start = move[0]
+        to = move[1]
+        promotion = move[2]
+
+        selected_piece = self[start]
+        undo = UndoRecord(move, selected_piece)
+        undo.can_castle = self.can_castle.copy()
+        undo.white_ghost_pawn = self.white_ghost_pawn
+        undo.black_ghost_pawn = self.black_ghost_pawn
+        undo.no_progress_plies = self.no_progress_plies
+        undo.turn_counter = self.turn_counter
+        undo.board_states_counter = self.board_states_counter
+        undo.zobrist_key = self.zobrist_key
+        # Turn, castling and En passeant are XORed out now and back in after the move
+        self.zobrist_key ^= self.get_state_key()
+        undo.kings_in_check = [(king, king.in_check) for king in self.get_piece("K", True) + self.get_piece("K", False)]
+
+        # Squares whose pieces change with the move
+        changed_squares = [start, to]
+        if selected_piece.name == "P" and start[0] != to[0] and not self[to]:
+            # En passeant
+            changed_squares.append((to[0], start[1]))
+        if selected_piece.name == "K" and abs(start[0]-to[0]) > 1:
+            # Castling rook
+            changed_squares += [(0, to[1]), (3, to[1])] if to[0] == 2 else [(7, to[1]), (5, to[1])]
+        self.lift_attacks(changed_squares, undo)
+
+        if selected_piece.name == "P":
+            undo.first_move = selected_piece.first_move
+            # Double pawn movement logic
+            if abs(to[1]-start[1]) > 1:
+                self.activate_ghost_pawn(start, selected_piece.color)
+
+            # Check Promotion
+            if promotion in "qrbn":
+                undo.promoted_piece = self.get_promotion(promotion, selected_piece)
+
+            # Pawn moves resets no progress counter
+            self.no_progress_plies = 0
+
+        if selected_piece.name == "K":
+            # If king moves, whether is castle or normal move:
+            # Removes all castling rights
+            self.remove_castling_rights(self.turn)
+
+            # If king moves more than one square, it is castling
+            if abs(start[0]-to[0]) > 1:
+                self.apply_castle(move, undo)
+
+                # After castle, a position can't be repeated
+                self.board_states_counter = {}
+
+        undo.captured_piece = selected_piece.move(to, self)
+
+        # Check if move made progress to the game
+        # whether it captured or moved a pawn
+        if undo.captured_piece:
+            self.no_progress_plies = 0
+        elif selected_piece.name != "P":
+            self.no_progress_plies += 1
+
+        if undo.promoted_piece:
+            undo.promoted_piece.move(to, self)
+
+        self.drop_attacks(changed_squares, undo)
+
+        # Increment turn counter for draw criteria
+        if not self.turn:
+            self.turn_counter += 1
+
+        # Remove first_move from pieces that has special movement
+        if selected_piece.name == "P":
+            selected_piece.first_move = False
+        if selected_piece.name == "R":
+            self.can_castle[selected_piece.rook_side] = False
+        # A rook captured on its home square can't castle anymore
+        # Obs: undo.can_castle and the state key XORed out above keep the old rights
+        if undo.captured_piece:
+            self.can_castle[ROOK_SIDES.get(to)] = False
+
+        # Flip turn
+        self.turn = not self.turn
+
+        # Deactivate ghost pawn
+        self.deactivate_ghost_pawn(self.turn)
+
+        self.zobrist_key ^= self.get_state_key()
+
+        # Adds current board state to board state counter
+        # Relevant for draw criteria
+        undo.board_state = self.zobrist_key
+        if undo.board_state in self.board_states_counter:
+            self.board_states_counter[undo.board_state] += 1
+        else:
+            self.board_states_counter[undo.board_state] = 1
+
+        self.uci_moves_list.append(move_2_uci(move))
+
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Undo a move made by make_move(), restoring the board state
+        saved in the undo record.
+
+        """
+        start = undo.move[0]
+        to = undo.move[1]
+        selected_piece = undo.piece
+
+        self.uci_moves_list.pop()
+        self.restore_attacks(undo)
+
+        if undo.board_states_counter is self.board_states_counter:
+            if self.board_states_counter[undo.board_state] == 1:
+                del self.board_states_counter[undo.board_state]
+            else:
+                self.board_states_counter[undo.board_state] -= 1
+        self.board_states_counter = undo.board_states_counter
+
+        # Put pieces back
+        self[to] = None
+        self[start] = selected_piece
+        selected_piece.set_pos(start)
+        if undo.captured_piece:
+            self[undo.captured_piece.get_pos()] = undo.captured_piece
+        if undo.rook:
+            self[undo.rook.get_pos()] = None
+            self[undo.rook_start] = undo.rook
+            undo.rook.set_pos(undo.rook_start)
+        if selected_piece.name == "P":
+            selected_piece.first_move = undo.first_move
+        for king, in_check in undo.kings_in_check:
+            king.in_check = in_check
+
+        # Restore board state
+        self.turn = not self.turn
+        self.can_castle = undo.can_castle
+        self.white_ghost_pawn = undo.white_ghost_pawn
+        self.black_ghost_pawn = undo.black_ghost_pawn
+        self.no_progress_plies = undo.no_progress_plies
+        self.turn_counter = undo.turn_counter
+        self.zobrist_key = undo.zobrist_key
+
+    def init_piece_lists(self):
+        """
+        Build the piece lists from the list[list[Piece]] board.
+
+        """
+        self.piece_lists = {char: {} for char in "PNBRQKpnbrqk"}
+        for x in range(8):
+            for y in range(8):
+                piece = self.board[x][y]
+                if piece:
+                    self.piece_lists[piece.name if piece.color else piece.name.lower()][x, y] = piece
+
     def get_all_pieces(self):
         """
         Returns the board pieces in a vector for linear iteration.
         """
 
         l_pieces = []
-        for i in range(8):
-            for j in range(8):
-                if self[i,j]:
-                    l_pieces.append(self[i,j])
+        for pieces in self.piece_lists.values():
+            l_pieces.extend(pieces.values())
         return l_pieces
 
-    def has_same_target(self, start, piece, color):
+    def has_same_target(self, start, to, piece, color):
         """
         Designed to check if two pieces can go to the same square.
         Returns the information needed to distinct the start square.
+        Must be called before the move is made.
 
         """
-        specifier = ""
-        l_pieces = self.get_piece(piece.name, color)
-        if len(l_pieces) == 2:
-            other_piece = l_pieces[0] if l_pieces[0].get_pos() != piece.get_pos() else l_pieces[1]
-            self[piece.get_pos()] = None
-            other_piece_targets = other_piece.get_valid_moves(self)
-            other_piece_targets = [move[1] for move in other_piece_targets]
-            if piece.get_pos() in other_piece_targets:
-                uci_move = mat_2_uci(start)
-                if start[0] == other_piece.x:
-                    specifier = uci_move[1]
-                elif start[1] == other_piece.y:
-                    specifier = uci_move[0]
-                else:
-                    specifier = uci_move[0]
-            self[piece.get_pos()] = piece
-            return specifier
-        return ""
+        others = []
+        for other_piece in self.get_piece(piece.name, color):
+            if other_piece is piece:
+                continue
+            other_piece_targets = [move[1] for move in other_piece.get_valid_moves(self)]
+            if to in other_piece_targets:
+                others.append(other_piece)
+        if others:
+            # A pinned piece that can't leave its pin line is no ambiguity.
+            # In check, `piece` going to `to` stops it, so others would as well.
+            pins = self.get_pins(self.get_king(color))
+            others = [other_piece for other_piece in others
+                      if other_piece not in pins or to in pins[other_piece]]
+        return disambiguate(start, [other_piece.get_pos() for other_piece in others])
 
     def print_board(self):
         """
@@ -399,18 +1103,11 @@ class Board():
 
     def get_piece(self, name, color):
         """
-        Iterates through board and return desired piece in a list.
-        If it is king return just the piece object.
+        Return pieces of desired type and color in a list.
+
         """
 
-        l_pieces = []
-        for i in range(8):
-            for j in range(8):
-                piece = self.board[i][j]
-                if piece:
-                    if piece.color == color and piece.name == name:
-                        l_pieces.append(piece)
-        return l_pieces
+        return list(self.piece_lists[name if color else name.lower()].values())
 
     def get_king(self, color):
         """
@@ -418,35 +1115,194 @@ class Board():
 
         """
 
-        return self.get_piece("K", color)[0]
+        return next(iter(self.piece_lists["K" if color else "k"].values()))
+
+    def init_attack_maps(self):
+        """
+        Build the attack maps from scratch.
+
+        """
+        self.attackers = [[set() for _ in range(8)] for _ in range(8)]
+        self.attack_counts = {True: [[0]*8 for _ in range(8)],
+                              False: [[0]*8 for _ in range(8)]}
+        self.piece_attacks = {}
+        for piece in self.get_all_pieces():
+            self.add_attacks(piece, piece.get_attacked_squares(self))
+
+    def add_attacks(self, piece, squares):
+        """
+        Add squares attacked by piece to the attack maps.
+
+        """
+        self.piece_attacks[piece] = squares
+        counts = self.attack_counts[piece.color]
+        attackers = self.attackers
+        for x, y in squares:
+            counts[x][y] += 1
+            attackers[x][y].add(piece)
+
+    def remove_attacks(self, piece):
+        """
+        Remove squares attacked by piece from the attack maps and return them.
+
+        """
+        squares = self.piece_attacks.pop(piece)
+        counts = self.attack_counts[piece.color]
+        attackers = self.attackers
+        for x, y in squares:
+            counts[x][y] -= 1
+            attackers[x][y].discard(piece)
+        return squares
+
+    def lift_attacks(self, squares, undo):
+        """
+        Called before the pieces on `squares` change.
+        Removes from the attack maps the pieces on those squares and the sliding
+        pieces attacking them, since their rays may get longer or shorter.
+
+        """
+        pieces = []
+        for x, y in squares:
+            if self.board[x][y] and self.board[x][y] not in pieces:
+                pieces.append(self.board[x][y])
+            for piece in self.attackers[x][y]:
+                if piece.name in "BRQ" and piece not in pieces:
+                    pieces.append(piece)
+        undo.lifted_attacks = [(piece, self.remove_attacks(piece)) for piece in pieces]
+
+    def drop_attacks(self, squares, undo):
+        """
+        Called after the pieces on `squares` changed.
+        Recompute the attacks of lifted pieces still on the board
+        and of the pieces now on those squares.
+
+        """
+        pieces = [piece for piece, _ in undo.lifted_attacks if self[piece.get_pos()] is piece]
+        for x, y in squares:
+            piece = self.board[x][y]
+            if piece and piece not in pieces:
+                pieces.append(piece)
+        for piece in pieces:
+            self.add_attacks(piece, piece.get_attacked_squares(self))
+        undo.dropped_attacks = pieces
+
+    def restore_attacks(self, undo):
+        """
+        Bring the attack maps back to before the move of the undo record.
+
+        """
+        for piece in undo.dropped_attacks:
+            self.remove_attacks(piece)
+        for piece, squares in undo.lifted_attacks:
+            self.add_attacks(piece, squares)
+
+    def is_attacked(self, square, by_color):
+        """
+        Check if square is attacked by any piece of a certain color.
+
+        """
+        return self.attack_counts[by_color][square[0]][square[1]] > 0
+
+    def attackers_of(self, square):
+        """
+        Returns pieces of both colors attacking a square.
+
+        """
+        return list(self.attackers[square[0]][square[1]])
 
     def get_controlled_squares(self, color):
         """
         Returns squares which are target of pieces of a certain color.
         """
 
-        enemy_moves = set()
-        for piece in self.get_all_pieces():
-            if piece.color == color:
-                if piece.name == "P":
-                    # Pawns are the only pieces that
-                    # control squares without having
-                    # valid moves to that square
-                    # Ex:
-                    # Relevant when a pawn control a square between
-                    # Rook and King, even when it doesnt have any piece in there
-                    # Therefore we need to add that square to controlled squares
-                    # Even when it isn't a valid pawn move
-                    for move in piece.get_valid_moves(self):
-                        enemy_moves.add(move[1])
-                    pos = piece.get_pos()
-                    ahead = -1 if color else 1
-                    for side in [-1,1]:
-                        enemy_moves.add(((pos[0]+side),(pos[1]+ahead)))
-                elif piece.name != "K":
-                    for move in piece.get_valid_moves(self):
-                        enemy_moves.add(move[1])
-                elif piece.name == "K":
-                    for move in piece.get_normal_valid_moves(self):
-                        enemy_moves.add(move[1])
-        return list(enemy_moves)
+        counts = self.attack_counts[color]
+        return [(x, y) for x in range(8) for y in range(8) if counts[x][y]]
+
+    def get_least_valuable_attacker(self, square, color, removed):
+        """
+        Returns the least valuable piece of `color` attacking `square`, None if there is none.
+        Pieces on `removed` squares are taken as gone, so sliders behind them attack
+        through their squares: the x-ray attackers of an exchange.
+        Rays are scanned from the square as get_pins() does from the king.
+
+        """
+        x, y = square
+        board = self.board
+        forward = 1 if color else -1 # A pawn attacks from the row behind the square
+        for dx in (-1, 1):
+            if 0 <= x + dx <= 7 and 0 <= y + forward <= 7 and (x + dx, y + forward) not in removed:
+                piece = board[x + dx][y + forward]
+                if piece and piece.color == color and piece.name == "P":
+                    return piece
+
+        for dx, dy in KNIGHT_OFFSETS:
+            if 0 <= x + dx <= 7 and 0 <= y + dy <= 7 and (x + dx, y + dy) not in removed:
+                piece = board[x + dx][y + dy]
+                if piece and piece.color == color and piece.name == "N":
+                    return piece
+
+        best = None
+        for directions, sliders in [(DIAGONAL_DIRECTIONS, "BQ"), (ORTOGONAL_DIRECTIONS, "RQ")]:
+            for dx, dy in directions:
+                ray_x, ray_y = x + dx, y + dy
+                while 0 <= ray_x <= 7 and 0 <= ray_y <= 7:
+                    piece = board[ray_x][ray_y]
+                    if piece and (ray_x, ray_y) not in removed:
+                        if piece.color == color and piece.name in sliders:
+                            if best is None or EXCHANGE_VALUES[piece.name] < EXCHANGE_VALUES[best.name]:
+                                best = piece
+                        break
+                    ray_x, ray_y = ray_x + dx, ray_y + dy
+        if best:
+            return best
+
+        for dx, dy in KING_OFFSETS:
+            if 0 <= x + dx <= 7 and 0 <= y + dy <= 7 and (x + dx, y + dy) not in removed:
+                piece = board[x + dx][y + dy]
+                if piece and piece.color == color and piece.name == "K":
+                    return piece
+        return None
+
+    def see(self, move):
+        """
+        Static exchange evaluation of a move, before it is made.
+        Both sides keep capturing on the target square with their least valuable
+        attacker, and each can stop when going on would lose material.
+        Returns the material won by the side making the move, in centipawns,
+        negative if the move loses material.
+        Ex: A pawn taking a defended knight wins 320 - 100 = 220
+
+        """
+        start, to, promotion = move
+        piece = self[start]
+        removed = {start}
+        captured = self[to]
+        if captured:
+            gain = [EXCHANGE_VALUES[captured.name]]
+        elif piece.name == "P" and start[0] != to[0]:
+            # En passeant
+            gain = [EXCHANGE_VALUES["P"]]
+            removed.add((to[0], start[1]))
+        else:
+            gain = [0]
+        attacker_value = EXCHANGE_VALUES[piece.name]
+        if promotion != "%":
+            attacker_value = EXCHANGE_VALUES[promotion.upper()]
+            gain[0] += attacker_value - EXCHANGE_VALUES["P"]
+
+        color = not piece.color
+        while True:
+            # What is won if the last piece to move is captured
+            gain.append(attacker_value - gain[-1])
+            attacker = self.get_least_valuable_attacker(to, color, removed)
+            if attacker is None:
+                break
+            removed.add(attacker.get_pos())
+            attacker_value = EXCHANGE_VALUES[attacker.name]
+            color = not color
+
+        # The last gain is of a capture no piece can make.
+        # Going back from the one before, each side only captures if it gains.
+        for i in range(len(gain) - 2, 0, -1):
+            gain[i-1] = -max(-gain[i-1], gain[i])
+        return gain[0]
@@ -0,0 +1,495 @@
+"""
+database.py -- Compact game store on disk, read through mmap
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+A database is a file of game records, written one after the other by GameWriter:
+    - Record header: length of the tags, number of plies and flags
+    - Starting position packed by Board.to_bytes(), only if it is not the standard one
+    - Header tags of the game, as JSON
+    - One byte per ply: index of the move played in the sorted legal moves
+
+Sorting the legal moves makes the indices the same for every board backend.
+Offsets of the records are kept in a second file, "<path>.idx", so any game
+can be read by GameDatabase without going through the ones before it.
+
+The position index, "<path>.pos", lists (Zobrist key, game id, ply) for every
+position of every game, sorted by key, so the games reaching a position are
+found by binary search.
+"""
+import os
+import json
+import mmap
+import heapq
+import struct
+import tempfile
+from array import array
+
+from .mychess import Chess, BACKENDS, IllegalMoveError
+from .board import Board, POSITION_SIZE
+from .utils import move_2_uci
+
+
+DATABASE_MAGIC = b"MYCHESS\x01"
+RECORD_HEADER = struct.Struct(">IHB")
+CUSTOM_START = 1 # Record flag: the game doesn't start from the standard position
+POSITION_ENTRY = struct.Struct("<QIH2x") # Zobrist key, game id and ply
+
+
+class StoredGame():
+    """
+    A game read from a GameDatabase.
+    ...
+
+    Attributes:
+    -----------
+    game_id : int
+        Position of the game in the database
+
+    headers : dict
+        Header tags of the game
+        Ex: {"White": "Kasparov", "Result": "1-0"}
+
+    start : bytes
+        Starting position packed by Board.to_bytes(), None for the standard one
+
+    moves : list[tup]
+        Moves of the game in tuple format
+        Ex: ((4,6),(4,4),%)
+
+    Methods:
+    --------
+    fen() -> str
+        Starting position, None for the standard one
+
+    uci_moves() -> list[str]
+        Moves of the game in UCI format
+
+    """
+    def __init__(self, game_id, headers, start, moves):
+        self.game_id = game_id
+        self.headers = headers
+        self.start = start
+        self.moves = moves
+
+    def fen(self):
+        """
+        Returns the starting position in FEN, None for the standard one.
+
+        """
+        if self.start is None:
+            return None
+        return Board.from_bytes(self.start).board_2_fen()
+
+    def uci_moves(self):
+        """
+        Returns the moves of the game in UCI format.
+
+        """
+        return [move_2_uci(move) for move in self.moves]
+
+
+class PositionIndexBuilder():
+    """
+    Writes a position index file from entries given in any order.
+    Entries are sorted in chunks of fixed size, spilled to temporary files,
+    and merged at the end, so memory doesn't grow with the number of games.
+    ...
+
+    Attributes:
+    -----------
+    path : str
+        Position index file
+
+    chunk_entries : int
+        Number of entries sorted in memory at once
+
+    entries : list[int]
+        Entries of the current chunk, packed in an int so they sort by key, game and ply
+
+    chunk_files : list[file]
+        Sorted chunks already spilled to disk
+
+    Methods:
+    --------
+    add(key : int, game_id : int, ply : int) -> None
+        Add a position to the index
+
+    close() -> None
+        Merge the chunks into the index file
+
+    """
+    def __init__(self, path, chunk_entries=1_000_000):
+        self.path = path
+        self.chunk_entries = chunk_entries
+        self.entries = []
+        self.chunk_files = []
+
+    def add(self, key, game_id, ply):
+        """
+        Add a position to the index.
+
+        """
+        self.entries.append(key << 48 | game_id << 16 | ply)
+        if len(self.entries) >= self.chunk_entries:
+            self.spill()
+
+    def spill(self):
+        """
+        Sort the current chunk and move it to a temporary file.
+
+        """
+        chunk_file = tempfile.TemporaryFile()
+        self.write_entries(chunk_file, sorted(self.entries))
+        chunk_file.seek(0)
+        self.chunk_files.append(chunk_file)
+        self.entries = []
+
+    def write_entries(self, out_file, entries):
+        """
+        Write packed entries as POSITION_ENTRY records.
+
+        """
+        buffer = bytearray()
+        for entry in entries:
+            buffer += POSITION_ENTRY.pack(entry >> 48, entry >> 16 & 0xFFFFFFFF, entry & 0xFFFF)
+            if len(buffer) >= 1 << 20:
+                out_file.write(buffer)
+                buffer = bytearray()
+        out_file.write(buffer)
+
+    def read_entries(self, chunk_file):
+        """
+        Read back the packed entries of a chunk file.
+
+        """
+        while True:
+            block = chunk_file.read(POSITION_ENTRY.size * 4096)
+            if not block:
+                return
+            for key, game_id, ply in POSITION_ENTRY.iter_unpack(block):
+                yield key << 48 | game_id << 16 | ply
+
+    def close(self):
+        """
+        Merge the sorted chunks into the index file.
+
+        """
+        if self.chunk_files:
+            self.spill()
+            entries = heapq.merge(*[self.read_entries(chunk_file) for chunk_file in self.chunk_files])
+        else:
+            entries = sorted(self.entries)
+        with open(self.path, "wb") as index_file:
+            self.write_entries(index_file, entries)
+        for chunk_file in self.chunk_files:
+            chunk_file.close()
+        self.chunk_files = []
+        self.entries = []
+
+
+class GameWriter():
+    """
+    Writes games to a new database file.
+    Use as a context manager, or call close() to write the offsets file.
+    With position_index=True the position index is built in the same pass,
+    otherwise an index of a database previously at the path is removed.
+    Ex: with GameWriter("games.db") as writer:
+            for game in iter_games(pgn_file):
+                writer.add_game(game.moves, game.headers, game.fen())
+    ...
+
+    Attributes:
+    -----------
+    path : str
+        Database file
+
+    backend : str
+        Board backend used to replay the games while encoding them
+
+    offsets : array
+        Offset of each game record in the file
+
+    positions : PositionIndexBuilder
+        Builder of the position index, None if it is not wanted
+
+    Methods:
+    --------
+    add_game(moves : list[tup], headers : dict, fen : str) -> int
+        Encode and write a game, returns its id
+
+    close() -> None
+        Finish the database file and write the offsets and position index files
+
+    """
+    def __init__(self, path, backend="bitboard", position_index=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown board backend: {backend}")
+        self.path = path
+        self.backend = backend
+        self.offsets = array("Q")
+        self.positions = PositionIndexBuilder(path + ".pos") if position_index else None
+        # An index left at the path by an older database would answer for its games
+        if os.path.exists(path + ".pos"):
+            os.remove(path + ".pos")
+        self.file = open(path, "wb")
+        self.file.write(DATABASE_MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_game(self, moves, headers=None, fen=None):
+        """
+        Encode a game as one byte per ply and append it to the file.
+        Raises IllegalMoveError if a move is not legal, nothing is written then.
+        Returns the id of the game.
+
+        """
+        chess = Chess(fen, debug=False, backend=self.backend)
+        flags = 0
+        start = b""
+        if fen:
+            flags |= CUSTOM_START
+            start = chess.board.to_bytes()
+
+        keys = [chess.board.zobrist_key]
+        encoded_moves = bytearray()
+        for move in moves:
+            legal_moves = sorted(chess.get_legal_moves())
+            try:
+                encoded_moves.append(legal_moves.index(move))
+            except ValueError:
+                raise IllegalMoveError(f"{move_2_uci(move)}: illegal move at ply {len(encoded_moves)}") from None
+            chess.play_move(move)
+            keys.append(chess.board.zobrist_key)
+
+        encoded_headers = json.dumps(headers or {}).encode("utf-8")
+        self.offsets.append(self.file.tell())
+        self.file.write(RECORD_HEADER.pack(len(encoded_headers), len(encoded_moves), flags))
+        self.file.write(start)
+        self.file.write(encoded_headers)
+        self.file.write(encoded_moves)
+        game_id = len(self.offsets) - 1
+        if self.positions:
+            for ply, key in enumerate(keys):
+                self.positions.add(key, game_id, ply)
+        return game_id
+
+    def close(self):
+        """
+        Finish the database file and write the offsets and position index files.
+
+        """
+        if self.file.closed:
+            return
+        self.file.close()
+        with open(self.path + ".idx", "wb") as index_file:
+            self.offsets.tofile(index_file)
+        if self.positions:
+            self.positions.close()
+
+
+class GameDatabase():
+    """
+    Reads a database written by GameWriter.
+    The file is memory mapped, so reading a game only touches its own record.
+    Ex: db = GameDatabase("games.db")
+        db[1234].uci_moves()
+    ...
+
+    Attributes:
+    -----------
+    path : str
+        Database file
+
+    backend : str
+        Board backend used to replay the games
+
+    data : mmap
+        Contents of the database file
+
+    offsets : memoryview
+        Offset of each game record, from the offsets file
+
+    Methods:
+    --------
+    read_record(offset : int) -> tup
+        Headers, packed start position and encoded moves of the record at `offset`
+
+    read_game(offset : int, game_id : int) -> StoredGame
+        Read and decode the game record at `offset`
+
+    read_headers(game_id : int) -> dict
+        Header tags of a game, without decoding its moves
+
+    replay(game_id : int) -> Iterator[Chess]
+        Plays a game, yielding the game after each ply, starting with ply 0
+
+    build_position_index(chunk_entries : int) -> None
+        Write the position index of a database written without it
+
+    games_with_position(fen : str) -> list[tup]
+        Returns (game id, ply) of every time a game reached the position
+
+    close() -> None
+        Unmap the files
+
+    """
+    def __init__(self, path, backend="bitboard"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown board backend: {backend}")
+        self.path = path
+        self.backend = backend
+        with open(path, "rb") as db_file:
+            self.data = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(DATABASE_MAGIC)] != DATABASE_MAGIC:
+            self.data.close()
+            raise ValueError(f"{path} is not a game database")
+
+        self.index_data = None
+        if os.path.getsize(path + ".idx"):
+            with open(path + ".idx", "rb") as index_file:
+                self.index_data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.offsets = memoryview(self.index_data).cast("Q")
+        else:
+            self.offsets = memoryview(array("Q"))
+        self.positions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, game_id):
+        if not 0 <= game_id < len(self.offsets):
+            raise IndexError(f"No game {game_id} in {self.path}")
+        return self.read_game(self.offsets[game_id], game_id)
+
+    def __iter__(self):
+        for game_id in range(len(self.offsets)):
+            yield self[game_id]
+
+    def read_record(self, offset):
+        """
+        Returns headers, packed start position and encoded moves of the record at `offset`.
+
+        """
+        headers_length, plies, flags = RECORD_HEADER.unpack_from(self.data, offset)
+        offset += RECORD_HEADER.size
+        start = None
+        if flags & CUSTOM_START:
+            start = self.data[offset:offset + POSITION_SIZE]
+            offset += POSITION_SIZE
+        headers = json.loads(self.data[offset:offset + headers_length].decode("utf-8"))
+        offset += headers_length
+        return headers, start, self.data[offset:offset + plies]
+
+    def read_game(self, offset, game_id=None):
+        """
+        Read and decode the game record at `offset`.
+
+        """
+        headers, start, encoded_moves = self.read_record(offset)
+        chess = Chess(start, debug=False, backend=self.backend)
+        moves = []
+        for index in encoded_moves:
+            move = sorted(chess.get_legal_moves())[index]
+            chess.play_move(move)
+            moves.append(move)
+        return StoredGame(game_id, headers, start, moves)
+
+    def read_headers(self, game_id):
+        """
+        Returns the header tags of a game, without decoding its moves.
+
+        """
+        return self.read_record(self.offsets[game_id])[0]
+
+    def replay(self, game_id):
+        """
+        Plays a game through Chess, yielding the game after each ply,
+        starting with the position before the first move.
+        The same Chess object is yielded every time.
+
+        """
+        _, start, encoded_moves = self.read_record(self.offsets[game_id])
+        chess = Chess(start, debug=False, backend=self.backend)
+        yield chess
+        for index in encoded_moves:
+            chess.play_move(sorted(chess.get_legal_moves())[index])
+            yield chess
+
+    def build_position_index(self, chunk_entries=1_000_000):
+        """
+        Write the position index of a database written without it,
+        replaying every game once.
+
+        """
+        if self.positions is not None:
+            self.positions.close()
+            self.positions = None
+        builder = PositionIndexBuilder(self.path + ".pos", chunk_entries)
+        for game_id in range(len(self.offsets)):
+            for ply, chess in enumerate(self.replay(game_id)):
+                builder.add(chess.board.zobrist_key, game_id, ply)
+        builder.close()
+
+    def open_position_index(self):
+        """
+        Map the position index file, raising FileNotFoundError if it wasn't built.
+
+        """
+        if self.positions is None:
+            with open(self.path + ".pos", "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size == 0:
+                    return b""
+                self.positions = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.positions
+
+    def games_with_position(self, fen=None):
+        """
+        Returns (game id, ply) of every time a game reached the position, in game order.
+        Positions are compared by Zobrist key, as for repetitions.
+        Ex: db.games_with_position("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+            -> [(0, 2), (3, 2)]
+
+        """
+        key = Board(fen).zobrist_key
+        positions = self.open_position_index()
+        entry_size = POSITION_ENTRY.size
+
+        # First entry with the key
+        low, high = 0, len(positions) // entry_size
+        while low < high:
+            middle = (low + high) // 2
+            if POSITION_ENTRY.unpack_from(positions, middle * entry_size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        games = []
+        for index in range(low, len(positions) // entry_size):
+            entry_key, game_id, ply = POSITION_ENTRY.unpack_from(positions, index * entry_size)
+            if entry_key != key:
+                break
+            games.append((game_id, ply))
+        return games
+
+    def close(self):
+        """
+        Unmap the files.
+
+        """
+        if self.positions:
+            self.positions.close()
+        self.offsets.release()
+        if self.index_data is not None:
+            self.index_data.close()
+        self.data.close()
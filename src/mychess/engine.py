@@ -0,0 +1,655 @@
+"""
+engine.py -- Searches the best move of a position
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+The search is a negamax with alpha-beta pruning, run by iterative deepening:
+depth 1, 2, 3... until the time or node limit is reached, so a move is always ready.
+Every iteration searches first the best line of the previous one, which
+together with the move ordering makes alpha-beta cut most of the tree.
+Positions already searched, by a previous iteration or through another
+move order, are looked up in a transposition table.
+At the leaves a quiescence search plays captures until the position is quiet,
+so a position is never scored in the middle of an exchange.
+
+A Searcher can play a game, as the other get_move functions:
+    chess = Chess()
+    searcher = Searcher(chess, time_limit=1.0)
+    chess.play_cli(searcher.get_move)
+"""
+import time
+from array import array
+
+from .utils import move_2_uci
+from .evaluation import evaluate
+
+
+PIECE_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+PROMOTION_VALUES = {"q": 900, "r": 500, "b": 330, "n": 320, "%": 0}
+
+MATE = 100000 # Score of giving checkmate now, less one for each ply until it
+INFINITY = 1000000
+MAX_PLY = 64
+
+# Bound of a score saved in the transposition table, 0 marks an empty slot
+EXACT = 1 # Score of the position
+LOWER = 2 # The position is at least this good, a move refuted the previous one
+UPPER = 3 # The position is at most this good, no move reached alpha
+
+PROMOTIONS = "%qrbn"
+
+# Move ordering scores, captures before killer moves before the other moves.
+# Captures that lose material, by Board.see(), go last.
+CAPTURE_ORDER = 2000000
+KILLER_ORDER = 1000000
+LOSING_CAPTURE_ORDER = -1000000
+
+
+class SearchResult():
+    """
+    Result of a search.
+    ...
+
+    Attributes:
+    -----------
+    move : tup
+        Best move found, None if there are no legal moves
+        Ex: ((4,6),(4,4),%)
+
+    score : int
+        Score of the position in centipawns, for the side to move.
+        Mates are scored MATE less the plies until it, negative if getting mated.
+
+    depth : int
+        Depth in plies of the last completed iteration
+
+    pv : list[tup]
+        Principal variation: the best line found, starting with move
+
+    nodes : int
+        Number of positions searched
+
+    elapsed : float
+        Time spent in seconds
+
+    hash_probes : int
+    hash_hits : int
+        Lookups and hits in the transposition table, if one was used
+
+    Methods:
+    --------
+    nodes_per_second() -> float
+        Speed of the search
+
+    hash_hit_rate() -> float
+        Fraction of transposition table lookups that hit
+
+    uci_pv() -> list[str]
+        Principal variation in UCI format
+
+    """
+    def __init__(self):
+        self.move = None
+        self.score = 0
+        self.depth = 0
+        self.pv = []
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.hash_probes = 0
+        self.hash_hits = 0
+
+    def hash_hit_rate(self):
+        """
+        Returns fraction of transposition table lookups that hit.
+
+        """
+        if self.hash_probes == 0:
+            return 0.0
+        return self.hash_hits / self.hash_probes
+
+    def nodes_per_second(self):
+        """
+        Returns nodes searched per second.
+
+        """
+        if self.elapsed == 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    def uci_pv(self):
+        """
+        Returns the principal variation in UCI format.
+
+        """
+        return [move_2_uci(move) for move in self.pv]
+
+
+def encode_move(move):
+    """
+    Packs a move in 15 bits: start and target squares in FEN order, and the promotion.
+    0 is no move.
+    Ex: ((4,6),(4,4),%) -> 52 | 36 << 6
+
+    """
+    if move is None:
+        return 0
+    (start_x, start_y), (to_x, to_y), promotion = move
+    return (start_y*8 + start_x) | (to_y*8 + to_x) << 6 | PROMOTIONS.index(promotion) << 12
+
+def decode_move(code):
+    """
+    Unpacks a move packed by encode_move(), None for 0.
+
+    """
+    if code == 0:
+        return None
+    start, to = code & 63, code >> 6 & 63
+    return ((start % 8, start // 8), (to % 8, to // 8), PROMOTIONS[code >> 12])
+
+
+def capture_gain(board, move):
+    """
+    Material taken by a capture or promotion, before any recapture.
+    None for quiet moves.
+
+    """
+    start, to, promotion = move
+    victim = board[to]
+    if victim:
+        return PIECE_VALUES[victim.name] + PROMOTION_VALUES[promotion]
+    if start[0] != to[0] and board[start].name == "P":
+        # En passeant captures a pawn on an empty square
+        return PIECE_VALUES["P"]
+    if promotion != "%":
+        return PROMOTION_VALUES[promotion]
+    return None
+
+
+class TranspositionTable():
+    """
+    Fixed size transposition table for the search, mapping the zobrist key of a
+    position to what was found searching it: best move, score, bound and depth.
+    Entries live in flat arrays, as in PerftTable, so memory is fixed by size_mb.
+    ...
+
+    Every key maps to a bucket of two slots:
+    the first keeps the entry searched deepest, since it saved more work,
+    unless it is from an older search. The second is always replaced,
+    so recent positions are kept as well.
+
+    Attributes:
+    -----------
+    size : int
+        Number of entries, twice the number of buckets
+
+    keys : array
+    moves : array
+    scores : array
+    depths : array
+    bounds : array
+    ages : array
+        Entry fields. Moves are packed by encode_move(), bound 0 marks an empty slot.
+
+    age : int
+        Number of the current search, modulo 256.
+        Entries of older searches are replaced first.
+
+    probes : int
+    hits : int
+    stores : int
+        Usage statistics
+
+    Methods:
+    --------
+    probe(key : int) -> tup
+        Returns (move, score, depth, bound) saved for the position, None if not in the table
+
+    store(key : int, move : tup, score : int, depth : int, bound : int) -> None
+        Save what was found searching the position
+
+    new_search() -> None
+        Age the entries saved so far
+
+    clear() -> None
+        Empty the table
+
+    """
+    ENTRY_SIZE = 17 # Bytes: key, move, score, depth, bound and age
+
+    def __init__(self, size_mb=16):
+        self.size = max(2, int(size_mb * 1024 * 1024) // self.ENTRY_SIZE // 2 * 2)
+        self.clear()
+
+    def clear(self):
+        """
+        Empties the table.
+
+        """
+        self.keys = array("Q", bytes(8 * self.size))
+        self.moves = array("H", bytes(2 * self.size))
+        self.scores = array("i", bytes(4 * self.size))
+        self.depths = array("B", bytes(self.size))
+        self.bounds = array("B", bytes(self.size))
+        self.ages = array("B", bytes(self.size))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Ages the entries saved so far, so they give way to the ones of the new search.
+
+        """
+        self.age = (self.age + 1) % 256
+
+    def probe(self, key):
+        """
+        Returns (move, score, depth, bound) saved for the position, None if not in the table.
+
+        """
+        self.probes += 1
+        index = key % (self.size // 2) * 2
+        for slot in (index, index + 1):
+            if self.keys[slot] == key and self.bounds[slot]:
+                self.hits += 1
+                return (decode_move(self.moves[slot]), self.scores[slot],
+                        self.depths[slot], self.bounds[slot])
+        return None
+
+    def store(self, key, move, score, depth, bound):
+        """
+        Save what was found searching the position `depth` plies deep.
+        Goes to the depth-preferred slot of the bucket if it is as deep as the one there,
+        or the one there is older, otherwise to the always-replace slot.
+
+        """
+        index = key % (self.size // 2) * 2
+        if (self.keys[index] == key or not self.bounds[index]
+                or depth >= self.depths[index] or self.ages[index] != self.age):
+            slot = index
+        else:
+            slot = index + 1
+        # Keep the best move of a previous search of the position
+        if move is not None or self.keys[slot] != key:
+            self.moves[slot] = encode_move(move)
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = min(depth, 255)
+        self.bounds[slot] = bound
+        self.ages[slot] = self.age
+        self.stores += 1
+
+
+class Searcher():
+    """
+    Searches the best move of a position with iterative deepening alpha-beta.
+    ...
+
+    Attributes:
+    -----------
+    chess : Chess
+        Game whose board is searched by get_move()
+
+    time_limit : float
+        Seconds a search may take, None for no limit
+
+    node_limit : int
+        Positions a search may visit, None for no limit
+
+    max_depth : int
+        Last depth searched by iterative deepening
+
+    table : TranspositionTable
+        Positions already searched, kept between searches.
+        None if created with hash_mb=0.
+
+    info : function
+        Called with the SearchResult after every completed iteration, None for no calls.
+        Ex: to print the progress of the search
+
+    nodes : int
+        Positions visited by the current search
+
+    stopped : bool
+        Set when a limit is reached, or by stop(), to end the search
+
+    killers : list[list[tup]]
+        For each ply, the last two quiet moves that caused a beta cutoff.
+        They are likely to cut sibling positions as well.
+
+    history : dict
+        For each color, how often each quiet (start, to) caused a cutoff,
+        weighted by depth. Orders the quiet moves that are not killers.
+
+    pv : list[list[tup]]
+        Best line found under each ply of the current search
+
+    last_pv : list[tup]
+        Best line of the last completed iteration
+
+    Methods:
+    --------
+    get_move() -> tup
+        Best move of the game position, to be used as a get_move function
+
+    search(board : Board) -> SearchResult
+        Search the best move of a board position
+
+    stop() -> None
+        End the current search, which returns the best move found so far
+
+    check_limits() -> None
+        Stop the search if the time or node limit was reached
+
+    negamax(board : Board, depth : int, alpha : int, beta : int, ply : int) -> int
+        Score of the position searched `depth` plies deep
+
+    quiescence(board : Board, alpha : int, beta : int, ply : int) -> int
+        Score of the position once captures are over
+
+    order_moves(board : Board, moves : list[tup], ply : int, first_move : tup) -> list[tup]
+        Sort moves, most promising first
+
+    add_cutoff(color : bool, move : tup, depth : int, ply : int) -> None
+        Save a quiet move that caused a beta cutoff as killer and in the history
+
+    """
+    def __init__(self, chess=None, time_limit=None, node_limit=None, max_depth=MAX_PLY, hash_mb=16,
+                 info=None):
+        self.chess = chess
+        self.info = info
+        self.table = TranspositionTable(hash_mb) if hash_mb else None
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = min(max_depth, MAX_PLY)
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = None
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = {True: {}, False: {}}
+        self.pv = [[] for _ in range(MAX_PLY + 2)]
+        self.last_pv = []
+
+    def get_move(self):
+        """
+        Returns the best move in the position of the game.
+        Can be given to Chess.play_cli() as the get_move function.
+
+        """
+        return self.search(self.chess.board).move
+
+    def stop(self):
+        """
+        Ends the current search, which returns the best move found so far.
+        Can be called from another thread.
+
+        """
+        self.stopped = True
+
+    def search(self, board):
+        """
+        Searches the best move of the position with iterative deepening,
+        until max_depth, the time limit or the node limit is reached.
+        The board is left as it was.
+
+        """
+        result = SearchResult()
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = start + self.time_limit if self.time_limit is not None else None
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = {True: {}, False: {}}
+        self.last_pv = []
+        if self.table:
+            self.table.new_search()
+            probes, hits = self.table.probes, self.table.hits
+
+        moves = board.generate_legal_moves()
+        if not moves:
+            result.elapsed = time.perf_counter() - start
+            return result
+        # Even a search stopped right away plays a legal move, the most promising one
+        result.move = self.order_moves(board, moves, 0)[0]
+        result.pv = [result.move]
+
+        for depth in range(1, self.max_depth + 1):
+            score = self.negamax(board, depth, -INFINITY, INFINITY, 0)
+            if self.stopped:
+                # Root moves are searched in full before they are kept in pv[0],
+                # and the best line of the last iteration goes first,
+                # so the best move of the interrupted iteration is at least as good
+                if self.pv[0]:
+                    result.pv = self.pv[0]
+                    result.move = result.pv[0]
+                break
+            result.score = score
+            result.depth = depth
+            result.pv = self.pv[0]
+            self.last_pv = result.pv
+            result.move = result.pv[0]
+            if self.info:
+                result.nodes = self.nodes
+                result.elapsed = time.perf_counter() - start
+                self.info(result)
+            # A shorter mate can't be found deeper
+            if abs(score) >= MATE - depth or len(moves) == 1:
+                break
+            # The next iteration takes longer than all before it
+            if self.deadline is not None and time.perf_counter() - start > (self.deadline - start) / 2:
+                break
+
+        result.nodes = self.nodes
+        if self.table:
+            result.hash_probes = self.table.probes - probes
+            result.hash_hits = self.table.hits - hits
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def check_limits(self):
+        """
+        Stops the search if the time or node limit was reached.
+
+        """
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        """
+        Returns the score of the position for the side to move, searched `depth` plies deep.
+        Scores outside of (alpha, beta) are bounds, good enough to refute the
+        move that led here (beta) or worse than a move already found (alpha).
+        The best line found is saved in pv[ply].
+
+        """
+        self.pv[ply] = []
+        self.nodes += 1
+        if self.nodes & 63 == 0 or self.node_limit is not None:
+            self.check_limits()
+        if self.stopped:
+            return 0
+
+        # Repeating a position is a draw the other side can claim
+        if ply and (board.no_progress_plies >= 100
+                    or board.board_states_counter.get(board.zobrist_key, 0) > 1):
+            return 0
+
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(board, alpha, beta, ply)
+
+        # The line of the previous iteration is searched first,
+        # and elsewhere the best move found last time the position was searched
+        first_move = self.last_pv[ply] if ply < len(self.last_pv) else None
+        entry = self.table.probe(board.zobrist_key) if self.table else None
+        if entry:
+            move, score, entry_depth, bound = entry
+            if ply and entry_depth >= depth:
+                # Mates are saved as plies from the position, not from the root
+                if score >= MATE - MAX_PLY:
+                    score -= ply
+                elif score <= -MATE + MAX_PLY:
+                    score += ply
+                if (bound == EXACT or (bound == LOWER and score >= beta)
+                        or (bound == UPPER and score <= alpha)):
+                    if move:
+                        self.pv[ply] = [move]
+                    return score
+            if first_move is None:
+                first_move = move
+
+        moves = board.generate_legal_moves()
+        if not moves:
+            if board.is_attacked(board.get_king(board.turn).get_pos(), not board.turn):
+                return -MATE + ply
+            return 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(board, moves, ply, first_move):
+            undo = board.make_move(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move(undo)
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv[ply] = [move] + self.pv[ply + 1]
+                if score >= beta:
+                    if not undo.captured_piece and move[2] == "%":
+                        self.add_cutoff(board.turn, move, depth, ply)
+                    break
+
+        if self.table:
+            if best_score >= beta:
+                bound = LOWER
+            elif best_score > original_alpha:
+                bound = EXACT
+            else:
+                bound = UPPER
+                # No move was better than alpha, so none is known to be best
+                best_move = None
+            score = best_score
+            if score >= MATE - MAX_PLY:
+                score += ply
+            elif score <= -MATE + MAX_PLY:
+                score -= ply
+            self.table.store(board.zobrist_key, best_move, score, depth, bound)
+        return best_score
+
+    def quiescence(self, board, alpha, beta, ply):
+        """
+        Returns the score of the position for the side to move, searching only captures
+        and promotions until none is worth playing.
+        The side to move may stand pat, keeping the static evaluation,
+        since it is not forced to capture. Captures that lose material
+        by Board.see() are not searched.
+        A side in check can't stand pat, since it can't pass, so all its
+        evasions are searched and mates are found.
+
+        """
+        self.pv[ply] = []
+        self.nodes += 1
+        if self.nodes & 63 == 0 or self.node_limit is not None:
+            self.check_limits()
+        if self.stopped:
+            return 0
+        if ply >= MAX_PLY:
+            return evaluate(board)
+
+        in_check = board.is_attacked(board.get_king(board.turn).get_pos(), not board.turn)
+        if in_check:
+            moves = board.generate_legal_moves()
+            if not moves:
+                return -MATE + ply
+            best_score = -INFINITY
+            searched = self.order_moves(board, moves, ply)
+        else:
+            stand_pat = evaluate(board)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best_score = stand_pat
+
+            moves = board.generate_legal_moves()
+            if not moves:
+                return 0
+            captures = []
+            for move in moves:
+                gain = capture_gain(board, move)
+                if gain is None:
+                    continue
+                attacker_value = PIECE_VALUES[board[move[0]].name]
+                if gain < attacker_value and board.see(move) < 0:
+                    continue
+                captures.append((10 * gain - attacker_value, move))
+            captures.sort(reverse=True)
+            searched = [move for _, move in captures]
+
+        for move in searched:
+            undo = board.make_move(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.unmake_move(undo)
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                if score >= beta:
+                    break
+        return best_score
+
+    def order_moves(self, board, moves, ply, first_move=None):
+        """
+        Sorts moves so the ones most likely to be best are searched first:
+        `first_move`, then captures and promotions by MVV-LVA (most valuable victim,
+        least valuable attacker), then killer moves, then the rest by history,
+        and last the captures that lose material by Board.see().
+
+        """
+        killers = self.killers[ply]
+        history = self.history[board.turn]
+        scores = {}
+        for move in moves:
+            if move == first_move:
+                scores[move] = INFINITY * 10
+                continue
+            gain = capture_gain(board, move)
+            if gain is not None:
+                # Only taking a cheaper piece can lose material
+                attacker_value = PIECE_VALUES[board[move[0]].name]
+                exchange = board.see(move) if gain < attacker_value else 0
+                if exchange < 0:
+                    scores[move] = LOSING_CAPTURE_ORDER + exchange
+                else:
+                    scores[move] = CAPTURE_ORDER + 10 * gain - attacker_value
+            elif move == killers[0]:
+                scores[move] = KILLER_ORDER + 1
+            elif move == killers[1]:
+                scores[move] = KILLER_ORDER
+            else:
+                scores[move] = history.get((move[0], move[1]), 0)
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def add_cutoff(self, color, move, depth, ply):
+        """
+        Saves a quiet move that caused a beta cutoff: as killer move of the ply
+        and in the history of its color, where deeper cutoffs weigh more.
+
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[color]
+        key = (move[0], move[1])
+        history[key] = history.get(key, 0) + depth * depth
@@ -0,0 +1,156 @@
+"""
+evaluation.py -- Static evaluation of positions: material and piece-square tables
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Every piece is worth its material value plus a bonus for the square it stands on.
+There are two sets of values, one for the middle game and one for the endgame,
+mixed by the game phase: the non pawn material left on the board.
+The board keeps both sums up to date as pieces are placed and removed,
+as it does with the Zobrist key, so evaluating a position takes no scan.
+"""
+
+MIDGAME_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+ENDGAME_VALUES = {"P": 120, "N": 300, "B": 320, "R": 520, "Q": 920, "K": 0}
+
+# Values for exchanges on a square, see Board.see().
+# The king is worth more than everything else, so it never captures into a defended square.
+EXCHANGE_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 20000}
+
+# Phase of the starting position is 24, it goes down to 0 as pieces are traded
+PHASE_WEIGHTS = {"P": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}
+MAX_PHASE = 24
+
+# Square bonus for white pieces, in FEN order: a8 first, h1 last.
+# Black pieces use the same tables upside down.
+PAWN_MIDGAME_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+# Passed pawns decide endgames, so the closer to promotion the better
+PAWN_ENDGAME_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    80,  80,  80,  80,  80,  80,  80,  80,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    30,  30,  30,  30,  30,  30,  30,  30,
+    15,  15,  15,  15,  15,  15,  15,  15,
+     5,   5,   5,   5,   5,   5,   5,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+KNIGHT_TABLE = [
+   -50, -40, -30, -30, -30, -30, -40, -50,
+   -40, -20,   0,   0,   0,   0, -20, -40,
+   -30,   0,  10,  15,  15,  10,   0, -30,
+   -30,   5,  15,  20,  20,  15,   5, -30,
+   -30,   0,  15,  20,  20,  15,   0, -30,
+   -30,   5,  10,  15,  15,  10,   5, -30,
+   -40, -20,   0,   5,   5,   0, -20, -40,
+   -50, -40, -30, -30, -30, -30, -40, -50,
+]
+
+BISHOP_TABLE = [
+   -20, -10, -10, -10, -10, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,  10,  10,   5,   0, -10,
+   -10,   5,   5,  10,  10,   5,   5, -10,
+   -10,   0,  10,  10,  10,  10,   0, -10,
+   -10,  10,  10,  10,  10,  10,  10, -10,
+   -10,   5,   0,   0,   0,   0,   5, -10,
+   -20, -10, -10, -10, -10, -10, -10, -20,
+]
+
+ROOK_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+]
+
+QUEEN_TABLE = [
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+     0,   0,   5,   5,   5,   5,   0,  -5,
+   -10,   5,   5,   5,   5,   5,   0, -10,
+   -10,   0,   5,   0,   0,   0,   0, -10,
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+
+# The king hides behind its pawns while there are pieces to attack it...
+KING_MIDGAME_TABLE = [
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -20, -30, -30, -40, -40, -30, -30, -20,
+   -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20,
+]
+
+# ...and goes to the center when they are gone
+KING_ENDGAME_TABLE = [
+   -50, -40, -30, -20, -20, -30, -40, -50,
+   -30, -20, -10,   0,   0, -10, -20, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -30,   0,   0,   0,   0, -30, -30,
+   -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+MIDGAME_TABLES = {"P": PAWN_MIDGAME_TABLE, "N": KNIGHT_TABLE, "B": BISHOP_TABLE,
+                  "R": ROOK_TABLE, "Q": QUEEN_TABLE, "K": KING_MIDGAME_TABLE}
+ENDGAME_TABLES = {"P": PAWN_ENDGAME_TABLE, "N": KNIGHT_TABLE, "B": BISHOP_TABLE,
+                  "R": ROOK_TABLE, "Q": QUEEN_TABLE, "K": KING_ENDGAME_TABLE}
+
+
+def piece_square_scores(values, tables):
+    """
+    Score of each piece on each square, value plus square bonus.
+    Keyed by FEN character of the piece, then x and y, as ZOBRIST_PIECES.
+    Black scores are negative, so the sum over the board is white's advantage.
+
+    """
+    scores = {}
+    for name, table in tables.items():
+        scores[name] = [[values[name] + table[y*8 + x] for y in range(8)] for x in range(8)]
+        scores[name.lower()] = [[-values[name] - table[(7-y)*8 + x] for y in range(8)] for x in range(8)]
+    return scores
+
+MIDGAME_SCORES = piece_square_scores(MIDGAME_VALUES, MIDGAME_TABLES)
+ENDGAME_SCORES = piece_square_scores(ENDGAME_VALUES, ENDGAME_TABLES)
+PHASES = PHASE_WEIGHTS | {name.lower(): weight for name, weight in PHASE_WEIGHTS.items()}
+
+
+def evaluate(board):
+    """
+    Score of the position in centipawns, for the side to move.
+    Mixes the middle game and endgame scores kept by the board by the game phase.
+    Positions where no side can checkmate, as found by Board.material_draw(), are 0.
+
+    """
+    phase = min(board.phase, MAX_PHASE)
+    # Only a few pieces without pawns can be a draw
+    if phase <= 2 and not board.piece_lists["P"] and not board.piece_lists["p"] and board.material_draw():
+        return 0
+    score = board.midgame_score * phase + board.endgame_score * (MAX_PHASE - phase)
+    # Rounded toward zero before taking the side, so both sides,
+    # and both colors of mirrored positions, see the same score
+    score = score // MAX_PHASE if score >= 0 else -(-score // MAX_PHASE)
+    return score if board.turn else -score
@@ -4,8 +4,27 @@ Author: Geraldo Luiz Pereira
 www.github.com/rousbound
 """
 import sys
+import asyncio
 
-from mychess import Chess
+from mychess import Chess, perft
+from mychess.engine import Searcher
+from mychess.uci import UciEngine
+from mychess.server import GameServer
+
+
+def print_perft(result):
+    """
+    Print perft divide, node count and speed.
+
+    """
+    for uci_move, nodes in sorted(result.divide.items()):
+        print(f"{uci_move}: {nodes}")
+    print("")
+    print("Nodes:", result.nodes)
+    print(f"Time: {result.elapsed:.2f}s")
+    print(f"Nodes/second: {result.nodes_per_second():.0f}")
+    if result.hash_probes:
+        print(f"Hash hits: {result.hash_hits}/{result.hash_probes} ({100*result.hash_hit_rate():.1f}%)")
 
 
 def main(args):
@@ -19,6 +38,29 @@ def main(args):
     else:
         arg = args[1]
 
+    if arg == "-perft":
+        # -perft <depth> [-workers <n>] [-hash <mb>] [fen]
+        depth = int(args[2])
+        options = {"-workers": 1, "-hash": 0}
+        rest = args[3:]
+        while rest and rest[0] in options:
+            options[rest[0]] = int(rest[1])
+            rest = rest[2:]
+        fen = " ".join(rest) or None
+        print_perft(perft(fen, depth, divide=True,
+                          workers=options["-workers"], hash_mb=options["-hash"]))
+        return
+
+    if arg == "-server":
+        # -server [port]
+        port = int(args[2]) if len(args) > 2 else 8765
+        asyncio.run(GameServer(port=port).serve_forever())
+        return
+
+    if arg == "-uci":
+        UciEngine().run()
+        return
+
     chess = Chess(print_turn_decorator=False)
     if arg == "-cli":
 
@@ -27,6 +69,14 @@ def main(args):
     if arg == "-clir":
         chess.play_cli(chess.get_move_random)
 
+    if arg == "-clie":
+        # Player has white, engine black
+        searcher = Searcher(chess, time_limit=2.0)
+        chess.play_cli(lambda: chess.get_move_player() if chess.board.turn else searcher.get_move())
+
+    if arg == "-guie":
+        chess.play_gui(Searcher(chess, time_limit=2.0).get_move)
+
     if arg in ["-gui", None]:
 
         chess.play_gui()
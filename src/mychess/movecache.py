@@ -0,0 +1,156 @@
+"""
+movecache.py -- Process wide cache of the legal moves of positions
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Games keep asking for the legal moves of positions already generated:
+a game generates them again after every push_uci(), and services see the
+same opening positions over and over. When enabled, Chess.get_legal_moves()
+and the game server look positions up here first.
+
+Entries never go stale: the zobrist key stands for everything the legal moves
+depend on (pieces, turn, castling rights and En passeant file), so nothing is
+ever invalidated. Only the least recently used positions are dropped when the
+cache is full.
+
+The cache is off by default:
+    >>> from mychess import enable_move_cache
+    >>> cache = enable_move_cache(10000)
+    >>> cache.hits, cache.misses
+"""
+import threading
+from collections import OrderedDict
+
+# Positions kept by default. An entry of about 30 moves takes some kilobytes.
+DEFAULT_SIZE = 10000
+
+
+class MoveCache():
+    """
+    LRU cache mapping a position to its legal moves and to the endings
+    that only depend on the position.
+    ...
+
+    Positions are keyed by zobrist key and board class, since backends may
+    generate the moves in a different order.
+    Endings depending on the game history, as the 50 moves rule and
+    repetitions, are not kept, see Chess.check_endgame_conditions().
+
+    Attributes:
+    -----------
+    size : int
+        Maximum number of positions kept
+
+    entries : OrderedDict
+        (legal_moves, outcomes) of each position, least recently used first.
+        legal_moves is a tuple, outcomes is as returned by Chess.position_outcomes().
+
+    hits : int
+    misses : int
+        Usage statistics
+
+    Methods:
+    --------
+    get(board : Board) -> tup
+        Returns (legal_moves, outcomes) of the position, None if it is not cached
+
+    put(board : Board, legal_moves : list[tup], outcomes : tup) -> tup
+        Save the position, returns the legal moves as kept
+
+    hit_rate() -> float
+        Fraction of lookups that hit
+
+    clear() -> None
+        Empty the cache and its statistics
+
+    """
+    def __init__(self, size=DEFAULT_SIZE):
+        if size < 1:
+            raise ValueError(f"Move cache size must be positive: {size}")
+        self.size = size
+        # Games on other threads, as the UCI search, share the cache
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """
+        Empties the cache and its statistics.
+
+        """
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board):
+        """
+        Returns (legal_moves, outcomes) of the position on the board,
+        None if it is not cached.
+
+        """
+        key = (board.zobrist_key, type(board))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, board, legal_moves, outcomes):
+        """
+        Saves the legal moves and outcomes of the position on the board,
+        dropping the least recently used position if the cache is full.
+        Returns the legal moves as kept, a tuple, so no game can change them.
+
+        """
+        legal_moves = tuple(legal_moves)
+        key = (board.zobrist_key, type(board))
+        with self.lock:
+            self.entries[key] = (legal_moves, outcomes)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return legal_moves
+
+    def hit_rate(self):
+        """
+        Returns fraction of lookups that hit.
+
+        """
+        if self.hits + self.misses == 0:
+            return 0.0
+        return self.hits / (self.hits + self.misses)
+
+
+# The cache used by every game of the process, None while disabled
+move_cache = None
+
+def enable_move_cache(size=DEFAULT_SIZE):
+    """
+    Makes every game of the process cache legal moves, keeping up to `size` positions.
+    Returns the cache, whose hits and misses can be read.
+    Enabling it again starts a new empty cache.
+
+    """
+    global move_cache
+    move_cache = MoveCache(size)
+    return move_cache
+
+def disable_move_cache():
+    """
+    Stops caching legal moves and forgets the cached positions.
+
+    """
+    global move_cache
+    move_cache = None
+
+def get_move_cache():
+    """
+    Returns the cache in use, None if it is disabled.
+
+    """
+    return move_cache
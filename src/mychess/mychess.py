@@ -5,11 +5,60 @@ www.github.com/rousbound
 """
 import random
 import logging
+from enum import Enum
 
-from .utils import mat_2_uci, move_2_algebric, uci_2_move, move_2_uci
-from .pieces import Queen, Knight, Rook, Bishop
+from .utils import move_2_algebric, legal_moves_2_algebric, uci_2_move, move_2_uci, LazyMoveList
+from .utils import InvalidMoveError
 from .board import Board
+from .bitboard import BitBoard
+from . import movecache
 
+# Board classes selectable by name
+BACKENDS = {"board": Board, "bitboard": BitBoard}
+
+
+class IllegalMoveError(ValueError):
+    """
+    Raised when a move is not legal in the current position,
+    or the game is already over.
+
+    """
+
+
+class GameResult(Enum):
+    """
+    How a game ended. The value of each result is the message shown to the players.
+    Ex: GameResult.STALEMATE.value -> "DRAW -- Stalemate"
+
+    Methods:
+    --------
+    winner() -> bool
+        Color of the winner, None if it is a draw
+
+    score() -> str
+        Result in PGN format
+        Ex: 1-0, 0-1, 1/2-1/2
+
+    """
+    WHITE_WINS = "CHECKMATE -- White wins"
+    BLACK_WINS = "CHECKMATE -- Black wins"
+    STALEMATE = "DRAW -- Stalemate"
+    NO_PROGRESS = "DRAW -- 100 moves without captures or pawn movements"
+    ONLY_KINGS = "DRAW -- Only kings left"
+    KING_AND_BISHOP = "DRAW -- King and Bishop cannot checkmate"
+    KING_AND_KNIGHT = "DRAW -- King and Knight cannot checkmate"
+    OPPOSITE_BISHOPS = "DRAW -- Kings and Bishop vs Bishop of different color complexes cannot checkmate"
+    THREE_FOLD_REPETITION = "DRAW -- Three fold repetition"
+
+    def winner(self):
+        if self is GameResult.WHITE_WINS:
+            return True
+        if self is GameResult.BLACK_WINS:
+            return False
+        return None
+
+    def score(self):
+        return {True: "1-0", False: "0-1", None: "1/2-1/2"}[self.winner()]
 
 
 class Chess():
@@ -26,14 +75,17 @@ class Chess():
         List of current legal moves in tuple format
         Ex: ((4,4),(4,6),%)
 
-    uci_legal_moves : list[tup]
+    uci_legal_moves : LazyMoveList
         List of current legal moves in uci format
         Ex: e2e4; a2a4
 
-    algebric_legal_moves : list[str]
+    algebric_legal_moves : LazyMoveList
         List of current legal moves in algebric format
         Ex: e4; Nc3
 
+        Both lists are only computed when first used, and are
+        emptied when a move is played.
+
     last_move_algebric : str
         Last move played in algebric format
 
@@ -49,11 +101,15 @@ class Chess():
     ----------- GAME LOGIC ------------
 
     board : Board
-        represents the chess board of the game
+        represents the chess board of the game.
+        BitBoard if created with backend="bitboard"
 
     game_running : bool
         True if none of draw or win conditions are met.
 
+    result : GameResult
+        How the game ended, None while it is running.
+
 
     Methods:
     --------
@@ -63,28 +119,31 @@ class Chess():
     turn_debug(move: tup) -> None
         Print last move played, pgn of game until last move and FEN of current board position
 
-    debug_algebric_legal_moves(move : tup, piece : Piece, captured_piece : Piece) -> None
-        Converts and save current legal moves in algebric format
+    get_algebric_move(move : tup) -> str
+        Converts move to algebric format, before it is made
 
     debug_game_uci(move : tup) -> None
         Save moves list in uci format
 
-    debug_game_pgn(move : tup, selected_piece : Piece,
-                captured_piece : Piece, castling : str) -> None
+    debug_game_pgn(move : tup) -> None
         Save moves  list in pgn format
 
     -------- GAME LOGIC ---------
 
-    play_move(move:up) -> None
+    play_move(move:tup) -> UndoRecord
         Make move, check special cases, update board information
 
-    push_uci(move:str) -> None
-        Function to be used when making moves on the interpreter
+    push_uci(move:str) -> UndoRecord
+        Function to be used when making moves on the interpreter.
+        Raises InvalidMoveError or IllegalMoveError on bad moves
 
     get_legal_moves() -> list[tup]
-        Check legal moves
+        Check legal moves, from the move cache if it is enabled
+
+    position_outcomes(legal_moves : list[tup]) -> tup
+        Check endings that only depend on the position: checkmate, stalemate and material draws
 
-    check_endgame_conditions() -> None
+    check_endgame_conditions(legal_moves : list[tup], outcomes : tup) -> GameResult
         Check checkmate and draw criteria
 
     kings_in_check() -> None
@@ -99,13 +158,22 @@ class Chess():
 
     """
 
-    def __init__(self, fen=None, print_turn_decorator=True, debug=True):
-        self.board = Board(fen)
+    def __init__(self, fen=None, print_turn_decorator=False, debug=True, backend="board"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown board backend: {backend}")
+        self.board = BACKENDS[backend](fen)
+        if len(self.board.piece_lists["K"]) != 1 or len(self.board.piece_lists["k"]) != 1:
+            raise ValueError(f"Invalid position, each side needs one king: {fen}")
+        # The side to move could capture the king
+        if self.board.is_attacked(self.board.get_king(not self.board.turn).get_pos(), self.board.turn):
+            raise ValueError(f"Invalid position, the side not to move is in check: {fen}")
         self.game_running = True
+        self.result = None
         self.debug = debug
 
         self.algebric_legal_moves = []
         self.uci_legal_moves = []
+        self.kings_in_check()
         self.legal_moves = self.get_legal_moves()
         self.moves_list = []
         self.last_move_algebric = ""
@@ -143,24 +211,28 @@ class Chess():
         print("FEN:", self.board.board_2_fen())
         print("")
 
-    def debug_algebric_legal_moves(self, move, piece, captured_piece):
+    def get_algebric_move(self, move):
         """
-        Returns list of legal moves in algebric format.
-        Ex: Nc3, e4, exd4, O-O, O-O-O
+        Returns move in algebric format.
+        Must be called before the move is made, so the board still
+        has the captured piece and the moving piece at the start square.
 
         """
 
         castling = None
         origin = move[0]
         target = move[1]
+        piece = self.board[origin]
+        captured_piece = self.board[target]
+        if piece.name == "P" and not captured_piece:
+            captured_piece = piece.is_en_passeant(move, self.board)
         if piece.name == "K":
-            res = res = tuple(map(lambda i, j: i - j, origin, target))
+            res = tuple(map(lambda i, j: i - j, origin, target))
             if res[0] < -1:
                 castling = "O-O"
             elif res[0] > 1:
                 castling = "O-O-O"
-        algebric_move = move_2_algebric(self.board, move, piece, captured_piece, castling)
-        self.algebric_legal_moves.append(algebric_move)
+        return move_2_algebric(self.board, move, piece, captured_piece, castling)
 
     def debug_game_uci(self, move):
         """
@@ -169,25 +241,16 @@ class Chess():
 
         """
 
-        start = mat_2_uci(move[0])
-        to = mat_2_uci(move[1])
-        promotion = move[2]
-        promotion = "" if promotion == "%" else promotion
-        self.uci_moves_list += f"{start}{to}{promotion} "
-        self.board.uci_moves_list.append(f"{start}{to}{promotion}")
+        self.uci_moves_list += f"{move_2_uci(move)} "
 
-    def debug_game_pgn(self, move, selected_piece, captured_piece, castling):
+    def debug_game_pgn(self, move):
         """
         Save list of moves in PGN notation.
         Ex: 1. e4 e5 2. Nf3 Nc6 3. Bb5
 
         """
 
-        algebric_move = move_2_algebric(self.board,
-                                              move,
-                                              selected_piece,
-                                              captured_piece,
-                                              castling)
+        algebric_move = self.get_algebric_move(move)
         self.last_move_algebric = algebric_move
 
         if self.board.turn:
@@ -199,103 +262,42 @@ class Chess():
 
     def get_legal_moves(self):
         """
-        Iterate through all pieces of turn color and get it's valid moves.
-        Then simulate the move and check if King ends in check.
-        If not, it is legal move.
+        Get legal moves of the side to move from the board.
         After check Draw conditions.
+        With the move cache enabled, positions already generated are looked up
+        and the legal moves are a tuple shared by the games on the position.
         """
 
-        legal_moves = []
+        cache = movecache.move_cache
+        entry = cache.get(self.board) if cache is not None else None
+        if entry:
+            legal_moves, outcomes = entry
+        else:
+            legal_moves = self.board.generate_legal_moves()
+            outcomes = self.position_outcomes(legal_moves)
+            if cache is not None:
+                legal_moves = cache.put(self.board, legal_moves, outcomes)
         self.algebric_legal_moves = []
         self.uci_legal_moves = []
+        if self.debug:
+            # The strings are only made if they are used, maybe after moves were played,
+            # so the algebric ones are made from a copy of the squares
+            squares = [column[:] for column in self.board.board]
+            self.algebric_legal_moves = LazyMoveList(legal_moves_2_algebric, squares, legal_moves)
+            self.uci_legal_moves = LazyMoveList(lambda: [move_2_uci(move) for move in legal_moves])
 
-        for piece in self.board.get_all_pieces():
-            if piece.color == self.board.turn:
-                piece_moves = piece.get_valid_moves(self.board)
-                # Simulate moves to see if it ends up with king in check
-                for move in piece_moves:
-                    origin = move[0]
-                    target = move[1]
-
-                    # Do move
-                    captured_piece = piece.move(target, self.board)
-
-                    enemy_targets = self.board.get_controlled_squares(not self.board.turn)
-                    if piece.name != "K":
-                        friend_king = self.board.get_king(self.board.turn)
-                    else:
-                        friend_king = piece
-
-                    # If king not in enemy targets after move, is legal move
-                    if friend_king.get_pos() not in enemy_targets:
-                        legal_moves.append(move)
-                        if self.debug:
-                            self.debug_algebric_legal_moves(move, piece, captured_piece)
-                            self.uci_legal_moves.append(move_2_uci(move))
-
-                    # Undo move
-                    piece.move(origin,self.board)
-                    if captured_piece:
-                        captured_piece.move(captured_piece.get_pos(),self.board)
-                        # captured_piece.move(target,self.board)
-
-
-
-        self.check_endgame_conditions(legal_moves)
+        self.check_endgame_conditions(legal_moves, outcomes)
 
 
         return legal_moves
 
-
-    def get_promotion(self, promotion, selected_piece):
-        """
-        Return promoted piece
-
-        """
-        color = selected_piece.color
-        if promotion == "q":
-            promoted_piece = Queen(color, selected_piece.x, selected_piece.y)
-        elif promotion == "r":
-            promoted_piece = Rook(color, selected_piece.x, selected_piece.y)
-        elif promotion == "b":
-            promoted_piece = Bishop(color, selected_piece.x, selected_piece.y)
-        elif promotion == "n":
-            promoted_piece = Knight(color, selected_piece.x, selected_piece.y)
-        return promoted_piece
-
-    def apply_castle(self, move, selected_piece):
-        """
-        Execute castle on board
-
-        """
-        logging.debug("Castling")
-        # ShortCastling
-        to = move[1]
-        if to[0] == 6:
-            castling = "O-O"
-            if selected_piece.color:
-                rook = self.board[7,7]
-                rook.move((5,7), self.board)
-            else:
-                rook = self.board[7,0]
-                rook.move((5,0), self.board)
-
-        # LongCastling
-        elif to[0] == 2:
-            castling = "O-O-O"
-            if selected_piece.color:
-                rook = self.board[0,7]
-                rook.move((3,7), self.board)
-            else:
-                rook = self.board[0,0]
-                rook.move((3,0), self.board)
-        return castling
-
     def play_move(self, move):
         """
         Moves a piece at `start` to `to`.
         Checks if the move is a special one, and apply the
         correct transformation to the board.
+        Returns the UndoRecord of Board.make_move(), which can
+        be passed to Board.unmake_move() to take the move back.
 
         move: tup
             UCI in the form of a tuple
@@ -305,92 +307,28 @@ class Chess():
             the third is the promotion.
 
         """
-        start = move[0]
-        to = move[1]
-        promotion = move[2]
-
-        selected_piece = self.board[start]
-        castling = None
-        promoted_piece = None
-
-
-        if selected_piece.name == "P":
-            start = move[0]
-            to = move[1]
-            # Double pawn movement logic
-            if abs(to[1]-start[1]) > 1:
-                self.board.activate_ghost_pawn(selected_piece.get_pos(), selected_piece.color)
-
-            # Check Promotion
-            if promotion in "qrbn":
-                promoted_piece = self.get_promotion(promotion, selected_piece)
-
-            # Pawn moves resets no progress counter
-            self.board.no_progress_plies = 0
-
-        if selected_piece.name == "K":
-            # If king moves, whether is castle or normal move:
-            # Removes all castling rights
-            self.board.remove_castling_rights(self.board.turn)
-
-            # If king moves more than one square, it is castling
-            if abs(start[0]-to[0]) > 1:
-                castling = self.apply_castle(move, selected_piece)
-
-                # After castle, a position can't be repeated
-                self.board.board_states_counter = {}
-
-
-        captured_piece = selected_piece.move(to, self.board)
-
-        # Check if move made progress to the game
-        # whether it captured or moved a pawn
-        if captured_piece:
-            self.board.no_progress_plies = 0
-        else:
-            if selected_piece.name != "P":
-                self.board.no_progress_plies += 1
 
         # Save move in different formats for debugging
         if self.debug:
-            self.debug_game_pgn(move, selected_piece, captured_piece, castling)
+            self.debug_game_pgn(move)
+            self.debug_game_uci(move)
             self.moves_list.append(move)
-        self.debug_game_uci(move)
-
-        if promoted_piece:
-            promoted_piece.move(to, self.board)
 
-        # Increment turn counter for draw criteria
-        if not self.board.turn:
-            self.board.turn_counter += 1
-
-
-        # Remove first_move from pieces that has special movement
-        if selected_piece.name == "P":
-            selected_piece.first_move = False
-        if selected_piece.name == "R":
-            self.board.can_castle[selected_piece.rook_side] = False
-
-        # Flip turn
-        self.board.turn = not self.board.turn
+        # The legal moves strings would no longer match the board
+        self.algebric_legal_moves = []
+        self.uci_legal_moves = []
 
-        # Deactivate ghost pawn
-        self.board.deactivate_ghost_pawn(self.board.turn)
+        undo = self.board.make_move(move)
 
         # Check if king is in check
         self.kings_in_check()
 
-        # Adds current board state to board state counter
-        # Relevant for draw criteria
-        fen = " ".join(self.board.board_2_fen().split(" ")[:4])
-        if fen in self.board.board_states_counter.keys():
-            self.board.board_states_counter[fen] += 1
-        else:
-            self.board.board_states_counter[fen] = 1
+        return undo
 
-    def check_endgame_conditions(self, legal_moves):
+    def position_outcomes(self, legal_moves):
         """
-        Check endgame conditions such as checkmate and draw.
+        Check the endings that only depend on the position, which the move cache keeps.
+        Returns (checkmate or stalemate, material draw), each a GameResult or None.
 
         """
         def check_material_draw():
@@ -399,40 +337,8 @@ class Chess():
             What constitutes objetively a draw.
 
             """
-            pieces_left = [] # Other than both kings
-            for piece in self.board.get_all_pieces():
-                if piece.name != "K":
-                    pieces_left.append(piece)
-            if not pieces_left:
-                self.game_running = False
-                print("DRAW -- Only kings left")
-            elif len(pieces_left) == 1:
-                piece = pieces_left[0]
-                if piece.name == "B":
-                    print("DRAW -- King and Bishop cannot checkmate")
-                    self.game_running = False
-                elif piece.name == "N":
-                    print("DRAW -- King and Knight cannot checkmate")
-                    self.game_running = False
-            elif len(pieces_left) == 2:
-                piece1 = pieces_left[0]
-                piece2 = pieces_left[1]
-                if piece1.color != piece2.color:
-                    if piece1.name == "B" and piece2.name == "B":
-                        if piece1.color_complex != piece2.color_complex:
-                            print("DRAW -- Kings and Bishop vs Bishop of different color complexes cannot checkmate")
-                            self.game_running = False
-
-        def check_no_progress_draw():
-            """
-            No captures or no pawn movements counts as no progress moves.
-            If there are 100 no progress half-moves, there is a draw.
-
-            """
-
-            if self.board.no_progress_plies >= 100:
-                print("DRAW -- 100 moves without captures or pawn movements")
-                self.game_running = False
+            draw = self.board.material_draw()
+            return GameResult[draw] if draw else None
 
         def check_stalemate_or_checkmate(legal_moves):
             """
@@ -444,33 +350,50 @@ class Chess():
 
             if len(legal_moves) == 0:
                 if not friend_king.in_check:
-                    self.game_running = False
-                    print("DRAW -- Stalemate")
-                else:
-                    self.game_running = False
-                    print("CHECKMATE!!!!")
-                    logging.debug("CHECKMATE")
-                    if self.board.turn:
-                        print("BLACK WINS!!!")
-                    else:
-                        print("WHITE WINS!!!")
+                    return GameResult.STALEMATE
+                logging.debug("CHECKMATE")
+                return GameResult.BLACK_WINS if self.board.turn else GameResult.WHITE_WINS
+            return None
 
-        def check_three_fold_repetition():
+        return check_stalemate_or_checkmate(legal_moves), check_material_draw()
+
+    def check_endgame_conditions(self, legal_moves, outcomes=None):
+        """
+        Check endgame conditions such as checkmate and draw.
+        outcomes are the ones of position_outcomes(), checked if not given.
+        Returns the GameResult, None if the game goes on.
+
+        """
+        def check_no_progress_draw():
             """
-            Checks if set of legal moves already repeated three times.
+            No captures or no pawn movements counts as no progress moves.
+            If there are 100 no progress half-moves, there is a draw.
 
             """
-            for val in self.board.board_states_counter.values():
-                if val >= 3:
-                    self.game_running = False
-                    print("DRAW -- Three fold repetition")
 
-        # Check Insufficient material draw
+            if self.board.no_progress_plies >= 100:
+                return GameResult.NO_PROGRESS
+            return None
+
+        def check_three_fold_repetition():
+            """
+            Checks if current position already repeated three times.
 
-        check_stalemate_or_checkmate(legal_moves)
-        check_no_progress_draw()
-        check_material_draw()
-        check_three_fold_repetition()
+            """
+            if self.board.board_states_counter.get(self.board.zobrist_key, 0) >= 3:
+                return GameResult.THREE_FOLD_REPETITION
+            return None
+
+        if outcomes is None:
+            outcomes = self.position_outcomes(legal_moves)
+        stalemate_or_checkmate, material_draw = outcomes
+        self.result = (stalemate_or_checkmate
+                       or check_no_progress_draw()
+                       or material_draw
+                       or check_three_fold_repetition())
+        if self.result:
+            self.game_running = False
+        return self.result
 
     def kings_in_check(self):
         """
@@ -480,9 +403,8 @@ class Chess():
 
         for color in [True, False]:
             king = self.board.get_king(color)
-            controlled_squares = self.board.get_controlled_squares(not color)
 
-            if king.get_pos() in controlled_squares:
+            if self.board.is_attacked(king.get_pos(), not color):
                 logging.debug("CHECK")
                 king.in_check = True
             else:
@@ -490,23 +412,21 @@ class Chess():
 
     def push_uci(self, uci_move):
         """
-        Function to be used when making moves on the interpreter
+        Function to be used when making moves on the interpreter.
+        Returns the UndoRecord of the move.
+        Raises InvalidMoveError if the move is not in uci format
+        and IllegalMoveError if it can't be played.
+
         """
         if self.game_running:
             self.legal_moves = self.get_legal_moves()
+        if not self.game_running:
+            raise IllegalMoveError(f"{uci_move}: the game is over, {self.result.value}")
 
-            if not self.game_running:
-                return
-
-            move = uci_2_move(uci_move)
-
-            if move not in self.legal_moves:
-                print("Illegal or impossible move")
-            else:
-                # self.turn_debug()
-                self.play_move(move)
-        self.print_turn_decorator()
-        self.board.print_board()
+        move = uci_2_move(uci_move)
+        if move not in self.legal_moves:
+            raise IllegalMoveError(f"{uci_move}: illegal or impossible move")
+        return self.play_move(move)
 
     def get_move_player(self):
         """
@@ -516,12 +436,14 @@ class Chess():
         """
         try:
             uci_move = input("Move: ")
-            move = uci_2_move(uci_move)
-            return move
-
-        except Exception as e:
+        except EOFError:
             print("EOF")
             return "EOF"
+        try:
+            return uci_2_move(uci_move)
+        except InvalidMoveError as e:
+            print(e)
+            return None
 
 
     def get_move_random(self):
@@ -545,13 +467,15 @@ class Chess():
         gui.show()
 
 
-    def play_gui(self):
+    def play_gui(self, get_move=None):
         """
         Play game with Graphical User Interface.
+        If get_move is given, it plays the side not to move,
+        as the get_move functions of play_cli().
 
         """
         from .GUI import GUI
-        gui = GUI(640,640,self)
+        gui = GUI(640,640,self,get_move)
         gui.main()
 
     def play_cli_interactive(self):
@@ -587,30 +511,26 @@ class Chess():
             self.turn_debug()
             self.board.print_board()
 
+        print(self.result.value)
         return self.board.board_2_fen()
 
     def test_input_moves(self, input_moves):
         """
         Function used for testing. Plays the game with a list of moves.
+        Moves that are not legal are skipped.
 
         """
-        for move in input_moves:
+        for uci_move in input_moves:
             self.legal_moves = self.get_legal_moves()
-            self.board.print_board()
-            self.print_turn_decorator()
-
-            move = uci_2_move(move)
-            print("Move:", move)
             if not self.game_running:
                 break
 
-            if move not in self.legal_moves:
-                print("Illegal or impossible move")
+            try:
+                move = uci_2_move(uci_move)
+            except InvalidMoveError:
                 continue
-
-            self.play_move(move)
-            self.turn_debug()
-            self.board.print_board()
+            if move in self.legal_moves:
+                self.play_move(move)
         self.legal_moves = self.get_legal_moves()
 
         return self.board.board_2_fen()
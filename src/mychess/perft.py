@@ -0,0 +1,294 @@
+"""
+perft.py -- Counts leaf nodes of the legal move tree, for validating move generation
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Perft (performance test) walks every legal move sequence up to a certain depth
+and counts the positions reached. Results can be compared with well known tables,
+and the "divide" (nodes under each root move) helps finding which move is wrong.
+"""
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import move_2_uci
+from .mychess import BACKENDS
+
+
+class PerftResult():
+    """
+    Result of a perft run.
+    ...
+
+    Attributes:
+    -----------
+    fen : str
+        Position searched, None for the initial position
+
+    depth : int
+        Depth in plies
+
+    nodes : int
+        Number of leaf nodes at depth
+
+    divide : dict
+        Nodes under each root move, keyed by the move in uci format.
+        Only filled when asked for.
+
+    elapsed : float
+        Time spent in seconds
+
+    hash_probes : int
+    hash_hits : int
+        Lookups and hits in the transposition table, if one was used
+
+    Methods:
+    --------
+    nodes_per_second() -> float
+        Speed of the run
+
+    hash_hit_rate() -> float
+        Fraction of transposition table lookups that hit
+
+    """
+    def __init__(self, fen, depth):
+        self.fen = fen
+        self.depth = depth
+        self.nodes = 0
+        self.divide = {}
+        self.elapsed = 0.0
+        self.hash_probes = 0
+        self.hash_hits = 0
+
+    def hash_hit_rate(self):
+        """
+        Returns fraction of transposition table lookups that hit.
+
+        """
+        if self.hash_probes == 0:
+            return 0.0
+        return self.hash_hits / self.hash_probes
+
+    def nodes_per_second(self):
+        """
+        Returns nodes searched per second.
+
+        """
+        if self.elapsed == 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+
+class PerftTable():
+    """
+    Fixed size transposition table for perft, mapping
+    (zobrist key, remaining depth) to the node count of the subtree.
+    Entries live in flat arrays, so memory is fixed by size_mb.
+    ...
+
+    Attributes:
+    -----------
+    size : int
+        Number of entries
+
+    replacement : str
+        What to do when the slot of a new entry is taken:
+        "depth" keeps the entry with more remaining depth, since it saves more work,
+        "always" replaces it.
+
+    keys : array
+    nodes : array
+    depths : array
+        Entry fields. Depth 0 marks an empty slot.
+
+    probes : int
+    hits : int
+    stores : int
+        Usage statistics
+
+    Methods:
+    --------
+    probe(key : int, depth : int) -> int
+        Returns node count of the position, None if not in the table
+
+    store(key : int, depth : int, nodes : int) -> None
+        Save node count of the position
+
+    entries_for(size_mb : float) -> int
+        Number of entries of a table of size_mb
+
+    """
+    ENTRY_SIZE = 17 # Bytes: key, nodes and depth
+
+    def __init__(self, size_mb=16, replacement="depth"):
+        if replacement not in ["depth", "always"]:
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+        self.size = self.entries_for(size_mb)
+        self.replacement = replacement
+        self.keys = array("Q", bytes(8 * self.size))
+        self.nodes = array("Q", bytes(8 * self.size))
+        self.depths = array("B", bytes(self.size))
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @classmethod
+    def entries_for(cls, size_mb):
+        """
+        Returns the number of entries of a table of size_mb.
+
+        """
+        return max(1, int(size_mb * 1024 * 1024) // cls.ENTRY_SIZE)
+
+    def probe(self, key, depth):
+        """
+        Returns node count of the position at remaining depth, None if not in the table.
+
+        """
+        self.probes += 1
+        index = key % self.size
+        if self.keys[index] == key and self.depths[index] == depth:
+            self.hits += 1
+            return self.nodes[index]
+        return None
+
+    def store(self, key, depth, nodes):
+        """
+        Save node count of the position at remaining depth,
+        following the replacement policy.
+
+        """
+        index = key % self.size
+        if self.replacement == "depth" and self.depths[index] > depth:
+            return
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.nodes[index] = nodes
+        self.stores += 1
+
+
+def count_nodes(board, depth, table=None):
+    """
+    Count leaf nodes under the board position.
+    Moves of the last ply are counted without being made.
+    Subtrees already counted are taken from the table, if given.
+
+    """
+    if depth == 0:
+        return 1
+    if table is not None:
+        nodes = table.probe(board.zobrist_key, depth)
+        if nodes is not None:
+            return nodes
+    moves = board.generate_legal_moves()
+    if depth == 1:
+        nodes = len(moves)
+        if table is not None:
+            table.store(board.zobrist_key, depth, nodes)
+        return nodes
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += count_nodes(board, depth - 1, table)
+        board.unmake_move(undo)
+    if table is not None:
+        table.store(board.zobrist_key, depth, nodes)
+    return nodes
+
+
+# Transposition table of a worker process, kept between the subtrees it counts
+worker_table = None
+
+def count_nodes_from_fen(fen, depth, backend, hash_mb=0, replacement="depth"):
+    """
+    Count leaf nodes under a position shipped as FEN.
+    Runs on worker processes, which only need the FEN to rebuild the board.
+    Returns node count and the table probes and hits spent on it.
+
+    """
+    global worker_table
+    table = None
+    if hash_mb:
+        if (worker_table is None or worker_table.replacement != replacement
+                or worker_table.size != PerftTable.entries_for(hash_mb)):
+            worker_table = PerftTable(hash_mb, replacement)
+        table = worker_table
+    probes, hits = (table.probes, table.hits) if table else (0, 0)
+    nodes = count_nodes(BACKENDS[backend](fen), depth, table)
+    if table:
+        return nodes, table.probes - probes, table.hits - hits
+    return nodes, 0, 0
+
+
+def split_subtrees(board, depth, workers):
+    """
+    Split the tree in subtrees to be counted by workers.
+    Returns (root move in uci, FEN of subtree position, remaining depth).
+    Root moves are enough to keep workers busy in most positions,
+    otherwise the tree is split one ply deeper. Root moves without replies
+    still get their subtree, so they are counted as 0 in the divide.
+
+    """
+    subtrees = []
+    root_moves = board.generate_legal_moves()
+    split_deeper = depth >= 3 and len(root_moves) < 2 * workers
+    for move in root_moves:
+        uci_move = move_2_uci(move)
+        undo = board.make_move(move)
+        replies = board.generate_legal_moves() if split_deeper else []
+        if replies:
+            for reply in replies:
+                reply_undo = board.make_move(reply)
+                subtrees.append((uci_move, board.board_2_fen(), depth - 2))
+                board.unmake_move(reply_undo)
+        else:
+            subtrees.append((uci_move, board.board_2_fen(), depth - 1))
+        board.unmake_move(undo)
+    return subtrees
+
+
+def perft(fen, depth, divide=False, backend="bitboard", workers=1,
+          hash_mb=0, replacement="depth"):
+    """
+    Count positions reachable from `fen` in `depth` plies.
+    If fen is None the initial position is used.
+    With divide=True also saves nodes under each root move.
+    With workers > 1 subtrees are counted in parallel processes.
+    With hash_mb > 0 subtrees reached by transpositions are counted once,
+    using a PerftTable of that size (one per process).
+
+    """
+    result = PerftResult(fen, depth)
+    start = time.perf_counter()
+    board = BACKENDS[backend](fen)
+    if depth == 0:
+        result.nodes = 1
+    elif workers > 1 and depth > 1:
+        subtrees = split_subtrees(board, depth, workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = executor.map(count_nodes_from_fen,
+                                  [subtree[1] for subtree in subtrees],
+                                  [subtree[2] for subtree in subtrees],
+                                  [backend] * len(subtrees),
+                                  [hash_mb] * len(subtrees),
+                                  [replacement] * len(subtrees))
+            for (uci_move, _, _), (nodes, probes, hits) in zip(subtrees, counts):
+                if divide:
+                    result.divide[uci_move] = result.divide.get(uci_move, 0) + nodes
+                result.nodes += nodes
+                result.hash_probes += probes
+                result.hash_hits += hits
+    else:
+        table = PerftTable(hash_mb, replacement) if hash_mb else None
+        for move in board.generate_legal_moves():
+            undo = board.make_move(move)
+            nodes = count_nodes(board, depth - 1, table)
+            board.unmake_move(undo)
+            if divide:
+                result.divide[move_2_uci(move)] = nodes
+            result.nodes += nodes
+        if table:
+            result.hash_probes = table.probes
+            result.hash_hits = table.hits
+    result.elapsed = time.perf_counter() - start
+    return result
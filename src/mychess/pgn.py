@@ -0,0 +1,246 @@
+"""
+pgn.py -- Reads games in PGN format, one at a time
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+A PGN file is a sequence of games, each with header tags and the movetext:
+    [Event "Casual game"]
+    [Result "1-0"]
+
+    1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+Files are read line by line and every game is replayed through Chess
+as it is read, so files of any size can be streamed.
+Comments, variations and numeric annotations are skipped.
+"""
+import re
+
+from .mychess import Chess, BACKENDS
+from .utils import move_2_uci
+
+
+HEADER_RE = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+TOKEN_RE = re.compile(r"[{};()]|[^\s{};()]+")
+MOVE_NUMBER_RE = re.compile(r"^\d+\.*")
+SAN_RE = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$")
+CASTLING_RE = re.compile(r"^([O0]-[O0](?:-[O0])?)[+#]?[!?]*$")
+RESULTS = ["1-0", "0-1", "1/2-1/2", "*"]
+
+
+class PgnGame():
+    """
+    A game read from a PGN file.
+    ...
+
+    Attributes:
+    -----------
+    headers : dict
+        Header tags of the game
+        Ex: {"White": "Kasparov", "Result": "1-0"}
+
+    moves : list[tup]
+        Moves of the game in tuple format
+        Ex: ((4,6),(4,4),%)
+
+    san_moves : list[str]
+        Moves of the game as written in the file
+
+    result : str
+        Game termination marker: 1-0, 0-1, 1/2-1/2 or *
+
+    error : str
+        Why the movetext couldn't be replayed, None if it could.
+        Moves are kept up to the one that failed.
+
+    Methods:
+    --------
+    fen() -> str
+        Starting position, None for the standard one
+
+    uci_moves() -> list[str]
+        Moves of the game in UCI format
+
+    """
+    def __init__(self):
+        self.headers = {}
+        self.moves = []
+        self.san_moves = []
+        self.result = "*"
+        self.error = None
+
+    def fen(self):
+        """
+        Returns the starting position from the FEN tag, None for the standard one.
+
+        """
+        return self.headers.get("FEN")
+
+    def uci_moves(self):
+        """
+        Returns the moves of the game in UCI format.
+
+        """
+        return [move_2_uci(move) for move in self.moves]
+
+
+def index_legal_moves(board, legal_moves):
+    """
+    Index legal moves by what every SAN move tells about them:
+    (piece type, target, promotion). The start file and rank a SAN move
+    may add are only needed to choose between the few moves of a key.
+    Castling moves are indexed by "O-O" and "O-O-O".
+
+    """
+    index = {}
+    for move in legal_moves:
+        start, to, promotion = move
+        name = board[start].name
+        if name == "K" and abs(to[0] - start[0]) > 1:
+            key = "O-O" if to[0] > start[0] else "O-O-O"
+        else:
+            key = (name, to, None if promotion == "%" else promotion.upper())
+        if key in index:
+            index[key].append(move)
+        else:
+            index[key] = [move]
+    return index
+
+def san_2_move(index, san):
+    """
+    Finds the legal move written as `san` in a position indexed by index_legal_moves().
+    Raises ValueError if no legal move or more than one match.
+    Ex: Nbd2 -> ((1,7),(3,6),%)
+
+    """
+    match = CASTLING_RE.match(san)
+    if match:
+        moves = index.get(match.group(1).replace("0", "O"), [])
+    else:
+        match = SAN_RE.match(san)
+        if not match:
+            raise ValueError(f"{san} is not a SAN move")
+        name, file, rank, to, promotion = match.groups()
+        moves = index.get((name or "P", ("abcdefgh".index(to[0]), 8 - int(to[1])), promotion), [])
+        if file:
+            moves = [move for move in moves if move[0][0] == "abcdefgh".index(file)]
+        if rank:
+            moves = [move for move in moves if move[0][1] == 8 - int(rank)]
+    if not moves:
+        raise ValueError(f"{san} is illegal")
+    if len(moves) > 1:
+        raise ValueError(f"{san} is ambiguous")
+    return moves[0]
+
+def apply_result_tag(game):
+    """
+    Takes the result of a game whose movetext has no termination marker from its Result tag.
+
+    """
+    if game.headers.get("Result") in RESULTS:
+        game.result = game.headers["Result"]
+
+def iter_games(file_obj, backend="bitboard"):
+    """
+    Yields the games of a PGN file one by one, as PgnGame.
+    `file_obj` is any text file, or iterable of lines, that is read as it goes.
+    Games are replayed on a Chess with the chosen board backend.
+
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown board backend: {backend}")
+    game = None
+    chess = None
+    index = None
+    in_movetext = False
+    comment = False
+    variation_depth = 0
+
+    for line in file_obj:
+        if comment:
+            # Inside a comment that started in a previous line
+            end = line.find("}")
+            if end == -1:
+                continue
+            line = line[end+1:]
+            comment = False
+        elif line.startswith("%"):
+            continue
+        elif line.startswith("["):
+            match = HEADER_RE.match(line)
+            if match:
+                if game is None or in_movetext:
+                    if game is not None:
+                        apply_result_tag(game)
+                        yield game
+                    game = PgnGame()
+                    chess = None
+                    in_movetext = False
+                    variation_depth = 0
+                tag, value = match.groups()
+                game.headers[tag] = value.replace('\\"', '"').replace("\\\\", "\\")
+                continue
+
+        position = 0
+        while True:
+            match = TOKEN_RE.search(line, position)
+            if not match:
+                break
+            token = match.group()
+            position = match.end()
+
+            if token == "{":
+                end = line.find("}", position)
+                if end == -1:
+                    comment = True
+                    break
+                position = end + 1
+                continue
+            if token == ";":
+                break
+            if token == "(":
+                variation_depth += 1
+                continue
+            if token == ")":
+                variation_depth = max(0, variation_depth - 1)
+                continue
+            if variation_depth or token.startswith("$"):
+                continue
+
+            if game is None:
+                game = PgnGame()
+            in_movetext = True
+
+            if token in RESULTS:
+                game.result = token
+                yield game
+                game = None
+                chess = None
+                in_movetext = False
+                continue
+
+            # Move numbers may be glued to the move, as in 1.e4
+            token = MOVE_NUMBER_RE.sub("", token)
+            if not token or game.error:
+                continue
+
+            if chess is None:
+                try:
+                    chess = Chess(game.fen(), debug=False, backend=backend)
+                except (ValueError, IndexError, KeyError):
+                    game.error = f"Invalid FEN: {game.fen()}"
+                    continue
+                index = index_legal_moves(chess.board, chess.legal_moves)
+            try:
+                move = san_2_move(index, token)
+            except ValueError as e:
+                game.error = f"Move {chess.board.turn_counter}: {e}"
+                continue
+            chess.play_move(move)
+            game.moves.append(move)
+            game.san_moves.append(token)
+            chess.legal_moves = chess.get_legal_moves()
+            index = index_legal_moves(chess.board, chess.legal_moves)
+
+    if game is not None:
+        apply_result_tag(game)
+        yield game
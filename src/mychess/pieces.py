@@ -4,6 +4,14 @@ Author: Geraldo Luiz Pereira
 www.github.com/rousbound
 """
 
+DIAGONAL_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+ORTOGONAL_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+KNIGHT_OFFSETS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+KING_OFFSETS = [(1, 0), (-1, 0), (0, -1), (0, 1), (1, 1), (1, -1), (-1, -1), (-1, 1)]
+
+# Piece types as small ints
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+
 class Piece():
     """
     Base class to represent Pieces
@@ -14,7 +22,11 @@ class Piece():
         White if true Black if false
 
     name : string
-        Piece type
+        Piece type, class attribute
+
+    kind : int
+        Piece type as a small int, class attribute
+        Ex: PAWN, KNIGHT, ..., KING
 
     x : int
         X coordinate of piece
@@ -22,8 +34,9 @@ class Piece():
     y : int
         Y coordinate of piece
 
-    piece_held : piece
-        Saves the piece which is being held (Only used while playing with the GUI)
+    Obs: Pieces use __slots__ and keep no state other than the
+    attributes above and the ones of each piece type, so boards
+    holding many of them stay small and cheap to copy.
 
     Methods:
     ----------
@@ -55,6 +68,13 @@ class Piece():
     get_ortogonal_moves(board:Board) -> list[tup]
         Returns diagonal moves of selected piece
 
+    get_attacked_squares(board:Board) -> list[tup]
+        Returns squares attacked by the piece, including the ones
+        occupied by friendly pieces i.e defended squares.
+
+    get_ray_squares(board:Board, directions:list[tup]) -> list[tup]
+        Returns squares attacked along rays, used by Queen, Bishop and Rook
+
     def get_pos() -> tup
         Return (x,y) position in the chess board
 
@@ -63,13 +83,14 @@ class Piece():
 
 
     """
+    __slots__ = ("color", "x", "y")
+    name = ""
+    kind = 0
+
     def __init__(self, color : bool, x,y):
         self.color = color
-        self.name = ""
         self.x : int = x
         self.y : int = y
-        self.pos = (x,y)
-        self.piece_held = False
 
     def get_pos(self):
         """
@@ -82,7 +103,6 @@ class Piece():
         Sets position of piece in the board.
         Updates x and y.
         """
-        self.pos = pos
         self.x = pos[0]
         self.y = pos[1]
 
@@ -132,6 +152,41 @@ class Piece():
 
         """
 
+    def get_attacked_squares(self, board):
+        """
+        Get squares attacked by the piece.
+
+        """
+
+    def get_offset_squares(self, offsets):
+        """
+        Get squares at fixed offsets inside the board, for Knight, King and Pawn attacks.
+
+        """
+        squares = []
+        for dx, dy in offsets:
+            x, y = self.x + dx, self.y + dy
+            if 0 <= x <= 7 and 0 <= y <= 7:
+                squares.append((x, y))
+        return squares
+
+    def get_ray_squares(self, board, directions):
+        """
+        Get squares attacked along rays for Queen, Bishop and Rook.
+        Each ray stops at the first piece found, friend or enemy,
+        and that square is attacked as well.
+
+        """
+        squares = []
+        for dx, dy in directions:
+            x, y = self.x + dx, self.y + dy
+            while 0 <= x <= 7 and 0 <= y <= 7:
+                squares.append((x, y))
+                if board[x,y]:
+                    break
+                x, y = x + dx, y + dy
+        return squares
+
     def get_diagonal_moves(self, board):
         """
         Get diagonal moves for Queen and Bishop.
@@ -237,11 +292,13 @@ class Rook(Piece):
     1 | |_| |X| |_| |_|
       a b c d e f g h
     """
+    __slots__ = ("rook_side",)
+    name = "R"
+    kind = ROOK
+
     def __init__(self, color,x,y, rook_side = None):
         super().__init__(color,x,y)
-        self.name = "R"
         self.rook_side = rook_side
-        self.moves = []
 
 
 
@@ -249,6 +306,9 @@ class Rook(Piece):
         moves = self.get_ortogonal_moves(board)
         return moves
 
+    def get_attacked_squares(self, board):
+        return self.get_ray_squares(board, ORTOGONAL_DIRECTIONS)
+
 
 class Bishop(Piece):
     """
@@ -267,10 +327,12 @@ class Bishop(Piece):
            1 |X|_| | | |_|X|_|
               a b c d e f g h
     """
+    __slots__ = ("color_complex",)
+    name = "B"
+    kind = BISHOP
+
     def __init__(self, color, x,y, color_complex = True):
         super().__init__(color,x,y)
-        self.name = "B"
-        self.moves = []
         self.color_complex = color_complex
 
 
@@ -279,6 +341,9 @@ class Bishop(Piece):
         moves = self.get_diagonal_moves(board)
         return moves
 
+    def get_attacked_squares(self, board):
+        return self.get_ray_squares(board, DIAGONAL_DIRECTIONS)
+
 class Knight(Piece):
     """
                 Knight moves
@@ -292,10 +357,9 @@ class Knight(Piece):
            1 | |_| |_| |_| |_|
               a b c d e f g h
     """
-    def __init__(self, color,x,y):
-        super().__init__(color,x,y)
-        self.name = "N"
-        self.moves = []
+    __slots__ = ()
+    name = "N"
+    kind = KNIGHT
 
     def get_valid_moves(self, board):
         targets = [
@@ -312,6 +376,9 @@ class Knight(Piece):
         moves = [move for move in moves if self.move_is_possible(move[1], board)]
         return moves
 
+    def get_attacked_squares(self, board):
+        return self.get_offset_squares(KNIGHT_OFFSETS)
+
 class Queen(Piece):
     """
                 Queen moves
@@ -325,10 +392,9 @@ class Queen(Piece):
            1 |X|_| |X| |_|X|_|
               a b c d e f g h
     """
-    def __init__(self, color, x,y):
-        super().__init__(color,x,y)
-        self.name = "Q"
-        self.moves = []
+    __slots__ = ()
+    name = "Q"
+    kind = QUEEN
 
 
 
@@ -339,6 +405,9 @@ class Queen(Piece):
 
         return moves
 
+    def get_attacked_squares(self, board):
+        return self.get_ray_squares(board, DIAGONAL_DIRECTIONS + ORTOGONAL_DIRECTIONS)
+
 class Pawn(Piece):
     """
     Pawn can En Passeant and do double movement on the first move
@@ -359,11 +428,13 @@ class Pawn(Piece):
            1 | |_| | | |_| |_|         1 | |_| | | |_| |_|
               a b c d e f g h             a b c d e f g h
     """
+    __slots__ = ("first_move",)
+    name = "P"
+    kind = PAWN
+
     def __init__(self, color,x,y, first_move = True):
         super().__init__(color,x,y)
-        self.name = "P"
         self.first_move = first_move
-        self.moves = []
 
 
 
@@ -434,8 +505,11 @@ class Pawn(Piece):
                         if enemy_ghost_pawn == target:
                             move = (self.get_pos(), target, "%")
                             moves.append(move)
-        self.moves = moves
-        return self.moves
+        return moves
+
+    def get_attacked_squares(self, board):
+        ahead = -1 if self.color else 1
+        return self.get_offset_squares([(-1, ahead), (1, ahead)])
 
 
 class King(Piece):
@@ -455,12 +529,12 @@ class King(Piece):
            1 | |_| |_| |_| |_|
               a b c d e f g h
     """
+    __slots__ = ("in_check",)
+    name = "K"
+    kind = KING
+
     def __init__(self, color, x, y):
         super().__init__(color, x, y)
-        self.name = "K"
-        self.moves = []
-
-
         self.in_check = False
 
 
@@ -487,13 +561,14 @@ class King(Piece):
                                                                                 board)]
         return candidate_moves
 
-    def get_valid_moves(self, board):
-        enemy_targets = board.get_controlled_squares(not self.color)
+    def get_attacked_squares(self, board):
+        return self.get_offset_squares(KING_OFFSETS)
 
+    def get_valid_moves(self, board):
         candidate_moves = self.get_normal_valid_moves(board)
 
         # Check Castling possibility
-        if not self.in_check:
+        if not board.is_attacked(self.get_pos(), not self.color):
             for rook in board.get_piece("R", self.color):
                 castle_enabled = True
                 cant_be_occupied = None
@@ -514,7 +589,7 @@ class King(Piece):
                     else:
                         # Still, if square doesn't have pieces,
                         # check if they are controlled by enemy pieces
-                        if square in enemy_targets:
+                        if board.is_attacked(square, not self.color):
                             castle_enabled = False
                 # This one can be controlled but not occupied
                 if cant_be_occupied and board[cant_be_occupied]:
@@ -522,5 +597,4 @@ class King(Piece):
                 if castle_enabled:
                     move = (self.get_pos(), king_to, "%")
                     candidate_moves.append(move)
-        self.moves = candidate_moves
-        return self.moves
+        return candidate_moves
@@ -0,0 +1,426 @@
+"""
+server.py -- Hosts many games at once over TCP with asyncio
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Clients send one JSON request per line and get one JSON answer per line:
+    > {"id": 1, "command": "new"}
+    < {"id": 1, "ok": true, "game": 1, "fen": "rnbqkbnr/... w KQkq - 0 1", "turn": "w", "result": null, "score": null}
+    > {"id": 2, "command": "move", "game": 1, "move": "e2e4"}
+    < {"id": 2, "ok": true, "game": 1, "fen": "rnbqkbnr/... b KQkq e3 0 1", "turn": "b", "result": null, "score": null}
+    > {"id": 3, "command": "move", "game": 1, "move": "e2e4"}
+    < {"id": 3, "ok": false, "error": "e2e4: illegal or impossible move"}
+
+Commands:
+    new [fen]           Start a game, from the initial position or fen
+    move game move      Play a move in UCI format
+    state game          Position and result of a game
+    legal_moves game    Legal moves of a game in UCI format
+    close game          End a game and forget it
+
+Every game is a Chess, whose legal moves are kept between requests.
+Generating them is the slow part of a move, so when it took longer than
+offload_threshold for a game, it is done by a pool of processes for it,
+and the event loop keeps serving the other games meanwhile.
+With the move cache enabled (see movecache.py), positions already generated
+by any game are not generated again.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .mychess import Chess, BACKENDS, IllegalMoveError
+from . import movecache
+from .utils import uci_2_move, move_2_uci
+
+
+# Bytes a request line may take, longer ones are answered with an error and the connection closed
+MAX_REQUEST_SIZE = 1 << 16
+
+class GameNotFoundError(LookupError):
+    """
+    Raised when a request names a game the server is not hosting.
+
+    """
+
+
+def generate_moves_from_fen(fen, backend):
+    """
+    Generate the legal moves of a position shipped as FEN.
+    Runs on worker processes, which only need the FEN to rebuild the board.
+    Returns the moves and the time spent generating them.
+
+    """
+    board = BACKENDS[backend](fen)
+    start = time.perf_counter()
+    moves = board.generate_legal_moves()
+    return moves, time.perf_counter() - start
+
+
+class GameSession():
+    """
+    A game hosted by the server.
+    ...
+
+    Attributes:
+    -----------
+    game_id : int
+        Number of the game in the server
+
+    chess : Chess
+        The game. Its legal_moves are the ones of the current position.
+
+    lock : asyncio.Lock
+        Moves of the same game are played one at a time
+
+    generation_time : float
+        Seconds the last legal move generation took
+
+    Methods:
+    --------
+    state() -> dict
+        Position and result of the game
+
+    """
+    def __init__(self, game_id, chess):
+        self.game_id = game_id
+        self.chess = chess
+        self.lock = asyncio.Lock()
+        self.generation_time = 0.0
+
+    def state(self):
+        """
+        Returns the position and result of the game, as sent to clients.
+
+        """
+        result = self.chess.result
+        return {"game": self.game_id,
+                "fen": self.chess.board.board_2_fen(),
+                "turn": "w" if self.chess.board.turn else "b",
+                "result": result.value if result else None,
+                "score": result.score() if result else None}
+
+
+class GameServer():
+    """
+    Asyncio server of games, speaking JSON lines.
+    ...
+
+    Attributes:
+    -----------
+    host : str
+    port : int
+        Address to listen to. Port 0 picks a free one, see address().
+
+    backend : str
+        Board backend of the games, as in Chess
+
+    workers : int
+        Processes of the pool for slow move generation
+
+    offload_threshold : float
+        Seconds a game's move generation must have taken to be sent to the pool.
+        None to always generate in the event loop.
+
+    sessions : dict
+        Games being played, keyed by game id
+
+    offloaded : int
+        Number of move generations done by the pool
+
+    connections : dict
+        Writer of each open connection, keyed by the task answering it
+
+    Methods:
+    --------
+    start() -> None
+        Start listening
+
+    serve_forever() -> None
+        Start listening and serve until cancelled
+
+    close() -> None
+        Stop listening and shut the pool down
+
+    address() -> tup
+        Host and port the server listens to
+
+    handle_client(reader : StreamReader, writer : StreamWriter) -> None
+        Answer the requests of a connection
+
+    handle_request(request : dict) -> dict
+        Answer a request
+
+    play(session : GameSession, uci_move : str) -> None
+        Play a move and generate the legal moves of the new position
+
+    """
+    def __init__(self, host="127.0.0.1", port=8765, backend="bitboard", workers=1,
+                 offload_threshold=0.005):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown board backend: {backend}")
+        self.host = host
+        self.port = port
+        self.backend = backend
+        self.workers = workers
+        self.offload_threshold = offload_threshold
+        self.sessions = {}
+        self.offloaded = 0
+        self.connections = {}
+        self.next_game_id = 1
+        self.server = None
+        self.executor = None
+
+    async def start(self):
+        """
+        Starts listening for connections.
+
+        """
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port,
+                                                 limit=MAX_REQUEST_SIZE)
+
+    async def serve_forever(self):
+        """
+        Starts listening and serves until cancelled.
+
+        """
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops listening and shuts the process pool down.
+
+        """
+        if self.server:
+            self.server.close()
+            # Open connections end as if clients closed them
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+        if self.executor:
+            # Waiting for pending generations would block the event loop
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def address(self):
+        """
+        Returns host and port the server listens to.
+
+        """
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle_client(self, reader, writer):
+        """
+        Answers the requests of a connection, one JSON object per line, until it closes.
+        A line longer than MAX_REQUEST_SIZE is answered with an error and ends the
+        connection, since the rest of it can't be told apart from the next request.
+
+        """
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Raised by readline for LimitOverrunError
+                    answer = {"ok": False, "error": "Invalid request: line too long"}
+                    writer.write(json.dumps(answer).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    answer = {"ok": False, "error": f"Invalid request: {e}"}
+                else:
+                    answer = await self.handle_request(request)
+                writer.write(json.dumps(answer).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+
+    async def handle_request(self, request):
+        """
+        Answers a request. The id of the request, if any, is sent back with the answer.
+        Bad requests, fields of the wrong type included, are answered with ok false and the error,
+        as are unexpected errors, so the connection stays open.
+
+        """
+        answer = {"id": request["id"]} if "id" in request else {}
+        command = request.get("command")
+        try:
+            if command == "new":
+                fen = request.get("fen")
+                if fen is not None and not isinstance(fen, str):
+                    raise ValueError(f"fen must be a string: {fen!r}")
+                session = self.new_game(fen)
+                answer.update(session.state())
+            elif command in ["move", "state", "legal_moves", "close"]:
+                game_id = request.get("game")
+                # JSON true and false are bools, which are ints in Python
+                if not isinstance(game_id, int) or isinstance(game_id, bool):
+                    raise ValueError(f"game must be an integer: {game_id!r}")
+                session = self.sessions.get(game_id)
+                if session is None:
+                    raise GameNotFoundError(f"No game {game_id}")
+                if command == "move":
+                    uci_move = request.get("move", "")
+                    if not isinstance(uci_move, str):
+                        raise ValueError(f"move must be a string: {uci_move!r}")
+                    await self.play(session, uci_move)
+                    answer.update(session.state())
+                elif command == "state":
+                    async with session.lock:
+                        answer.update(session.state())
+                elif command == "legal_moves":
+                    async with session.lock:
+                        answer["game"] = session.game_id
+                        answer["legal_moves"] = [move_2_uci(move) for move in session.chess.legal_moves]
+                else:
+                    del self.sessions[session.game_id]
+                    answer["game"] = session.game_id
+            else:
+                raise ValueError(f"Unknown command: {command}")
+        except (GameNotFoundError, ValueError) as e:
+            # Also InvalidMoveError and IllegalMoveError
+            answer.update({"ok": False, "error": str(e)})
+            return answer
+        except Exception as e:
+            answer.update({"ok": False, "error": f"Internal error: {type(e).__name__}: {e}"})
+            return answer
+        answer["ok"] = True
+        return answer
+
+    def new_game(self, fen=None):
+        """
+        Starts a game and returns its session.
+        Raises ValueError if the FEN can't be read or
+        doesn't have one king of each color.
+
+        """
+        try:
+            chess = Chess(fen, debug=False, backend=self.backend)
+        except (ValueError, IndexError, KeyError):
+            raise ValueError(f"Invalid FEN: {fen}") from None
+        session = GameSession(self.next_game_id, chess)
+        self.sessions[session.game_id] = session
+        self.next_game_id += 1
+        return session
+
+    async def play(self, session, uci_move):
+        """
+        Plays a move in UCI format, checked against the legal moves kept in the game.
+        Then generates the legal moves of the new position, in the process pool
+        if the last generation of the game took longer than offload_threshold,
+        unless the move cache has them. If the pool broke, a new one is started
+        by the next offload and this generation is done in the event loop.
+        Raises InvalidMoveError or IllegalMoveError on bad moves.
+
+        """
+        async with session.lock:
+            chess = session.chess
+            if not chess.game_running:
+                raise IllegalMoveError(f"{uci_move}: the game is over, {chess.result.value}")
+            move = uci_2_move(uci_move)
+            if move not in chess.legal_moves:
+                raise IllegalMoveError(f"{uci_move}: illegal or impossible move")
+            chess.play_move(move)
+
+            cache = movecache.move_cache
+            entry = cache.get(chess.board) if cache is not None else None
+            if entry:
+                chess.legal_moves, outcomes = entry
+                chess.check_endgame_conditions(chess.legal_moves, outcomes)
+                return
+
+            if self.offload_threshold is not None and session.generation_time > self.offload_threshold:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                loop = asyncio.get_running_loop()
+                try:
+                    moves, session.generation_time = await loop.run_in_executor(
+                        self.executor, generate_moves_from_fen, chess.board.board_2_fen(), self.backend)
+                    self.offloaded += 1
+                except BrokenProcessPool:
+                    self.executor = None
+                    moves = None
+            else:
+                moves = None
+            if moves is None:
+                start = time.perf_counter()
+                moves = chess.board.generate_legal_moves()
+                session.generation_time = time.perf_counter() - start
+            outcomes = chess.position_outcomes(moves)
+            if cache is not None:
+                moves = cache.put(chess.board, moves, outcomes)
+            chess.legal_moves = moves
+            chess.check_endgame_conditions(moves, outcomes)
+
+
+class GameClient():
+    """
+    Asyncio client of GameServer, sending one request at a time.
+    ...
+
+    Methods:
+    --------
+    connect(host : str, port : int) -> GameClient
+        Open a connection to a server
+
+    request(command : str, **fields) -> dict
+        Send a request and return the answer
+
+    close() -> None
+        Close the connection
+
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 1
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        """
+        Opens a connection to a server.
+
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, command, **fields):
+        """
+        Sends a request and returns the answer.
+        Ex: await client.request("move", game=1, move="e2e4")
+
+        """
+        request = {"id": self.next_id, "command": command, **fields}
+        self.next_id += 1
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        """
+        Closes the connection.
+
+        """
+        self.writer.close()
+        await self.writer.wait_closed()
@@ -0,0 +1,331 @@
+"""
+uci.py -- Universal Chess Interface front-end for the engine
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+UCI is the text protocol chess GUIs and tournament managers use to talk to engines,
+one command per line over stdin and stdout:
+    > uci
+    < id name mychess
+    < uciok
+    > position startpos moves e2e4 e7e5
+    > go movetime 1000
+    < info depth 1 score cp 40 nodes 31 nps 15500 time 2 pv g1f3
+    < bestmove g1f3 ponder b8c6
+
+The search runs on a background thread, so commands as stop are answered
+while it is running.
+"""
+import sys
+import threading
+
+from .mychess import Chess, IllegalMoveError
+from .engine import Searcher, MATE, MAX_PLY
+from .utils import InvalidMoveError, move_2_uci
+
+
+ENGINE_NAME = "mychess"
+ENGINE_AUTHOR = "Geraldo Luiz Pereira"
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+
+# Moves expected until the next time control, when the GUI doesn't say
+DEFAULT_MOVES_TO_GO = 30
+# Seconds kept for the GUI to receive the move
+MOVE_OVERHEAD = 0.05
+
+
+class UciEngine():
+    """
+    Reads UCI commands, keeps the game position and runs the Searcher.
+    ...
+
+    Attributes:
+    -----------
+    input : file
+    output : file
+        Where commands are read from and answers written to, stdin and stdout by default
+
+    backend : str
+        Board backend of the games, as in Chess
+
+    chess : Chess
+        Game on the position of the last position command.
+        None if it was invalid, or a search failed on it, until the next valid one.
+
+    fen : str
+        FEN of the last position command, None for startpos
+
+    moves : list[str]
+        Moves of the last position command played on chess, in UCI format.
+        A position command that only adds moves to them is played incrementally.
+
+    searcher : Searcher
+        Engine searching the position
+
+    thread : Thread
+        Thread of the running search, None if there is none
+
+    infinite : bool
+        True if the running search was started with go infinite,
+        whose best move is only sent after stop
+
+    stop_requested : Event
+        Set by stop(), for the search thread to know it may send its best move
+
+    Methods:
+    --------
+    run() -> None
+        Answer commands until quit or the end of input
+
+    handle(line : str) -> bool
+        Answer a command, False if it was quit
+
+    set_option(tokens : list[str]) -> None
+        Apply a setoption command
+
+    set_position(tokens : list[str]) -> None
+        Apply a position command
+
+    go(tokens : list[str]) -> None
+        Start searching the position in the background
+
+    search() -> None
+        Search the position and send the best move, run by the search thread
+
+    stop() -> None
+        Stop the running search, which answers with its best move
+
+    send_info(result : SearchResult) -> None
+        Send the progress of the search
+
+    send(line : str) -> None
+        Write a line to the GUI
+
+    """
+    def __init__(self, input=None, output=None, backend="bitboard"):
+        self.input = input or sys.stdin
+        self.output = output or sys.stdout
+        self.backend = backend
+        self.chess = Chess(debug=False, backend=backend)
+        self.fen = None
+        self.moves = []
+        self.searcher = Searcher(self.chess, hash_mb=DEFAULT_HASH_MB, info=self.send_info)
+        self.thread = None
+        self.infinite = False
+        self.stop_requested = threading.Event()
+        self.output_lock = threading.Lock()
+
+    def run(self):
+        """
+        Answers commands until quit or the end of input.
+
+        """
+        for line in self.input:
+            if not self.handle(line):
+                return
+        self.stop()
+
+    def handle(self, line):
+        """
+        Answers a command. Returns False if it was quit.
+        Unknown commands are ignored, as the protocol asks.
+
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 0 max {MAX_HASH_MB}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(tokens[1:])
+        elif command == "ucinewgame":
+            self.stop()
+            if self.searcher.table:
+                self.searcher.table.clear()
+            self.fen = None
+            self.moves = []
+            self.chess = Chess(debug=False, backend=self.backend)
+            self.searcher.chess = self.chess
+        elif command == "position":
+            self.stop()
+            self.set_position(tokens[1:])
+        elif command == "go":
+            self.stop()
+            self.go(tokens[1:])
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, tokens):
+        """
+        Applies setoption name <name> value <value>. Only Hash, in MB, is known.
+
+        """
+        if "name" not in tokens or "value" not in tokens:
+            return
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+        value = " ".join(tokens[tokens.index("value") + 1:])
+        if name.lower() == "hash":
+            self.stop()
+            try:
+                hash_mb = min(max(int(value), 0), MAX_HASH_MB)
+            except ValueError:
+                self.send(f"info string Invalid Hash value: {value}")
+                return
+            self.searcher = Searcher(self.chess, hash_mb=hash_mb, info=self.send_info)
+
+    def set_position(self, tokens):
+        """
+        Applies position startpos|fen <fen> [moves <move> ...].
+        If it is the last position with more moves, as GUIs send during a game,
+        only the new moves are played. Otherwise the position is built again.
+
+        """
+        if "moves" in tokens:
+            moves = tokens[tokens.index("moves") + 1:]
+            tokens = tokens[:tokens.index("moves")]
+        else:
+            moves = []
+        if tokens and tokens[0] == "fen":
+            fen = " ".join(tokens[1:])
+        else:
+            fen = None
+
+        if self.chess is None or fen != self.fen or moves[:len(self.moves)] != self.moves:
+            try:
+                chess = Chess(fen, debug=False, backend=self.backend)
+            except (ValueError, IndexError, KeyError):
+                self.send(f"info string Invalid FEN: {fen}")
+                # Searching the previous position would answer for one the GUI didn't ask
+                self.chess = None
+                self.searcher.chess = None
+                return
+            self.chess = chess
+            self.searcher.chess = chess
+            self.fen = fen
+            self.moves = []
+
+        for uci_move in moves[len(self.moves):]:
+            try:
+                self.chess.push_uci(uci_move)
+            except (InvalidMoveError, IllegalMoveError) as e:
+                self.send(f"info string {e}")
+                break
+            self.moves.append(uci_move)
+        # Endgame conditions of the last position
+        self.chess.legal_moves = self.chess.get_legal_moves()
+
+    def go(self, tokens):
+        """
+        Starts searching the position in the background, with the limits of
+        go [depth <n>] [nodes <n>] [movetime <ms>] [wtime <ms>] [btime <ms>]
+        [winc <ms>] [binc <ms>] [movestogo <n>] [infinite].
+        The best move is sent when the search ends.
+        Without a valid position, bestmove 0000 is sent right away.
+
+        """
+        if self.chess is None:
+            self.send("bestmove 0000")
+            return
+        options = {}
+        for i, token in enumerate(tokens[:-1]):
+            if token in ["depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo"]:
+                try:
+                    options[token] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+        self.infinite = "infinite" in tokens
+
+        time_limit = None
+        if "movetime" in options:
+            time_limit = options["movetime"] / 1000
+        elif not self.infinite:
+            remaining = options.get("wtime" if self.chess.board.turn else "btime")
+            if remaining is not None:
+                increment = options.get("winc" if self.chess.board.turn else "binc", 0)
+                moves_to_go = options.get("movestogo", DEFAULT_MOVES_TO_GO)
+                time_limit = (remaining / max(moves_to_go, 1) + increment / 2) / 1000
+                time_limit = min(time_limit, remaining / 1000 - MOVE_OVERHEAD)
+                time_limit = max(time_limit - MOVE_OVERHEAD, 0.01)
+
+        self.searcher.time_limit = time_limit
+        self.searcher.node_limit = options.get("nodes")
+        self.searcher.max_depth = min(options.get("depth", MAX_PLY), MAX_PLY)
+        self.stop_requested.clear()
+        self.thread = threading.Thread(target=self.search, daemon=True)
+        self.thread.start()
+
+    def search(self):
+        """
+        Runs on the search thread. Sends the best move when the search ends,
+        which for go infinite waits for stop.
+        A best move is always sent, 0000 if the search failed.
+
+        """
+        try:
+            result = self.searcher.search(self.chess.board)
+            move, pv = result.move, result.pv
+        except Exception as e:
+            self.send(f"info string Search failed: {type(e).__name__}: {e}")
+            # The board may be left in the middle of the search,
+            # the next position command builds it again
+            self.chess = None
+            self.searcher.chess = None
+            move, pv = None, []
+        if self.infinite:
+            self.stop_requested.wait()
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(pv) > 1:
+            self.send(f"bestmove {move_2_uci(move)} ponder {move_2_uci(pv[1])}")
+        else:
+            self.send(f"bestmove {move_2_uci(move)}")
+
+    def stop(self):
+        """
+        Stops the running search and waits for it to send its best move.
+
+        """
+        if self.thread is None:
+            return
+        self.stop_requested.set()
+        while self.thread.is_alive():
+            # The search may not have started yet, when stopping it does nothing
+            self.searcher.stop()
+            self.thread.join(0.01)
+        self.thread = None
+
+    def send_info(self, result):
+        """
+        Sends the progress of the search after an iteration.
+
+        """
+        if abs(result.score) >= MATE - MAX_PLY:
+            plies = MATE - abs(result.score)
+            moves = (plies + 1) // 2
+            score = f"mate {moves if result.score > 0 else -moves}"
+        else:
+            score = f"cp {result.score}"
+        self.send(f"info depth {result.depth} score {score} nodes {result.nodes} "
+                  f"nps {result.nodes_per_second():.0f} time {result.elapsed * 1000:.0f} "
+                  f"pv {' '.join(result.uci_pv())}")
+
+    def send(self, line):
+        """
+        Writes a line to the GUI. Both threads write, so lines are written whole.
+
+        """
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
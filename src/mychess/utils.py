@@ -18,14 +18,24 @@ where:
 For example: ((4,4),(4,6),%) or ((4,7),(4,8),"q")
 """
 import re
+from collections.abc import Sequence
 
-def move_2_algebric(board, move, selected_piece, captured_piece, castling):
+
+class InvalidMoveError(ValueError):
+    """
+    Raised when a move is not written in the expected format.
+
+    """
+
+def move_2_algebric(board, move, selected_piece, captured_piece, castling, specifier=None):
     """
     Translates a tuple-move to algebric format.
     Ex: ((4,4),(4,6),%) -> e4
         ((4,4),(5,5),%) -> exf5
 
     It needs board context to understand whether or not it was a capture, promotion, etc.
+    Must be called before the move is made on the board.
+    If the disambiguation `specifier` is not given, it is asked to the board.
 
     """
 
@@ -44,13 +54,108 @@ def move_2_algebric(board, move, selected_piece, captured_piece, castling):
     else:
         piece_name = selected_piece.name
 
-    specifier = ""
-    if selected_piece.name != "K":
-        specifier = board.has_same_target(start, selected_piece, selected_piece.color)
+    if specifier is None:
+        specifier = ""
+        if selected_piece.name not in "KP":
+            specifier = board.has_same_target(start, to, selected_piece, selected_piece.color)
 
     promotion = "" if promotion == "%" else "=" + promotion.upper()
     return piece_name + specifier + capture + algebric_to + promotion
 
+def legal_moves_2_algebric(squares, legal_moves):
+    """
+    Translates all legal moves of a position to algebric format at once.
+    Pieces that can go to the same square are found in the legal moves
+    themselves, so no move generation is needed for disambiguation.
+    `squares` are the pieces of the position as in Board.board, squares[x][y],
+    which may be a copy taken before moves were made on the board.
+
+    """
+
+    # Start squares of the pieces of each type that can reach each square
+    same_target = {}
+    for start, to, promotion in legal_moves:
+        name = squares[start[0]][start[1]].name
+        if name not in "KP":
+            same_target.setdefault((name, to), []).append(start)
+
+    algebric_moves = []
+    for move in legal_moves:
+        start, to, promotion = move
+        selected_piece = squares[start[0]][start[1]]
+        captured_piece = squares[to[0]][to[1]]
+        castling = None
+        specifier = ""
+        if selected_piece.name == "P":
+            if not captured_piece and start[0] != to[0]:
+                # En passeant
+                captured_piece = squares[to[0]][start[1]]
+        elif selected_piece.name == "K":
+            if to[0] - start[0] > 1:
+                castling = "O-O"
+            elif start[0] - to[0] > 1:
+                castling = "O-O-O"
+        else:
+            others = [other for other in same_target[selected_piece.name, to] if other != start]
+            specifier = disambiguate(start, others)
+        algebric_moves.append(move_2_algebric(None, move, selected_piece,
+                                              captured_piece, castling, specifier))
+    return algebric_moves
+
+def disambiguate(start, others):
+    """
+    Returns what is needed in algebric format to tell the piece at `start`
+    apart from pieces of the same type at `others` going to the same square:
+    the file if it is enough, else the rank, else both.
+    Ex: (1,7), [(5,7)] -> b
+        (0,7), [(0,3)] -> 1
+
+    """
+    if not others:
+        return ""
+    uci_move = mat_2_uci(start)
+    if all(other[0] != start[0] for other in others):
+        return uci_move[0]
+    if all(other[1] != start[1] for other in others):
+        return uci_move[1]
+    return uci_move
+
+class LazyMoveList(Sequence):
+    """
+    Read only list of moves that is only computed when it is first used.
+    Ex: LazyMoveList(legal_moves_2_algebric, squares, legal_moves)
+
+    """
+    __slots__ = ("function", "args", "moves")
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self.moves = None
+
+    def get_moves(self):
+        if self.moves is None:
+            self.moves = self.function(*self.args)
+            self.args = None
+        return self.moves
+
+    def __getitem__(self, index):
+        return self.get_moves()[index]
+
+    def __iter__(self):
+        return iter(self.get_moves())
+
+    def __len__(self):
+        return len(self.get_moves())
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return self.get_moves() == list(other)
+
+    def __repr__(self):
+        return repr(self.get_moves())
+
 def move_2_uci(move):
     """
     Translate move to uci format
@@ -70,16 +175,24 @@ def mat_2_uci(square):
     b = str(abs(square[1]-8))
     return a + b
 
+def uci_2_mat(square):
+    """
+    Translates a square in uci format to a coordinate in the board matrix.
+    Ex: e4 -> (4,4)
+        f5 -> (5,5)
+
+    """
+    return ("abcdefgh".find(square[0]), abs(int(square[1])-8))
+
 def uci_2_move(uci_move):
     """
     1. Check move grammar and
     2. Translates uci notation as 'e2e4' into our move index notation as '((4,4)(4,6),%)'
 
     """
-    match = re.match(r"([a-h][1-8])([a-h][1-8])([qbnr]?)", uci_move)
+    match = re.fullmatch(r"([a-h][1-8])([a-h][1-8])([qbnr]?)", uci_move)
     if not match:
-        print(uci_move + " is not in the format '[a-h][1-8][a-h][1-8]([qbnr])'")
-        return None
+        raise InvalidMoveError(uci_move + " is not in the format '[a-h][1-8][a-h][1-8]([qbnr])'")
 
     start = match.group(1)
     end = match.group(2)
@@ -0,0 +1,135 @@
+"""
+validate.py -- Checks moves of many games at once
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+Each move is checked with Board.is_legal(), which only generates the moves
+of the piece being moved, instead of all the legal moves of the position.
+Moves of live games are checked on their own boards. Positions given as FEN
+or packed bytes need a board built for them, so big batches of them are
+split between worker processes.
+"""
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .board import Board
+from .mychess import Chess, BACKENDS
+from .utils import InvalidMoveError, uci_2_move
+
+# Smaller batches are checked in the calling process, where they take less
+# time than starting the workers
+MIN_POOL_BATCH = 256
+
+
+class ValidationResult():
+    """
+    Result of checking a move.
+    ...
+
+    Attributes:
+    -----------
+    uci_move : str
+        Move checked, in UCI format
+
+    legal : bool
+        True if the move can be played in the position
+
+    error : str
+        Why the move can't be played, None if it can
+
+    """
+    def __init__(self, uci_move, legal, error=None):
+        self.uci_move = uci_move
+        self.legal = legal
+        self.error = error
+
+    def __repr__(self):
+        return f"ValidationResult({self.uci_move!r}, {self.legal}, {self.error!r})"
+
+
+def validate_move(board, uci_move):
+    """
+    Checks a move in UCI format on a board.
+    Returns (legal, error).
+
+    """
+    try:
+        move = uci_2_move(uci_move)
+    except InvalidMoveError as e:
+        return False, str(e)
+    if not board.is_legal(move):
+        return False, f"{uci_move}: illegal or impossible move"
+    return True, None
+
+def validate_chunk(items, backend):
+    """
+    Checks (position, uci_move) pairs, positions being FEN or packed bytes.
+    Runs on worker processes. Boards of repeated positions are built once.
+    Positions that can't be read, or without one king of each color, fail their items.
+    Returns a list of (legal, error).
+
+    """
+    boards = {}
+    results = []
+    for position, uci_move in items:
+        if position not in boards:
+            try:
+                board = BACKENDS[backend](position)
+            except (ValueError, IndexError, KeyError, struct.error):
+                # struct.error comes from packed positions of the wrong length
+                board = None
+            if board is not None and (len(board.piece_lists["K"]) != 1 or len(board.piece_lists["k"]) != 1):
+                board = None
+            boards[position] = board
+        board = boards[position]
+        if board is None:
+            results.append((False, f"Invalid position: {position!r}"))
+        else:
+            results.append(validate_move(board, uci_move))
+    return results
+
+def validate_batch(items, workers=None, backend="bitboard"):
+    """
+    Checks a batch of moves, each in its own position.
+    `items` is a list of (position_or_game, uci_move), where position_or_game
+    is a FEN, a position packed by Board.to_bytes(), a Board or a Chess.
+    None is the initial position.
+    Returns a ValidationResult for every item, in the same order.
+    Boards and games are checked in the calling process, on the board itself.
+    With workers > 1, or None for one per CPU, batches of MIN_POOL_BATCH or more
+    FEN and packed positions are checked in worker processes.
+
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown board backend: {backend}")
+    workers = workers or os.cpu_count() or 1
+
+    results = [None] * len(items)
+    pending = [] # Index and (position, uci_move) of the items that need a board built
+    for i, (position, uci_move) in enumerate(items):
+        if isinstance(position, Chess):
+            if not position.game_running:
+                results[i] = ValidationResult(uci_move, False,
+                                              f"{uci_move}: the game is over, {position.result.value}")
+                continue
+            position = position.board
+        if isinstance(position, Board):
+            results[i] = ValidationResult(uci_move, *validate_move(position, uci_move))
+        else:
+            pending.append((i, (position, uci_move)))
+
+    pending_items = [item for _, item in pending]
+    if workers > 1 and len(pending) >= MIN_POOL_BATCH:
+        chunk_size = -(-len(pending) // workers)
+        chunks = [pending_items[start:start + chunk_size]
+                  for start in range(0, len(pending_items), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            checked = [result for chunk_results in executor.map(validate_chunk, chunks, [backend] * len(chunks))
+                       for result in chunk_results]
+    else:
+        checked = validate_chunk(pending_items, backend)
+
+    for (i, (_, uci_move)), (legal, error) in zip(pending, checked):
+        results[i] = ValidationResult(uci_move, legal, error)
+    return results
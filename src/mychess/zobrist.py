@@ -0,0 +1,27 @@
+"""
+zobrist.py -- Random keys used for Zobrist hashing of positions
+Author: Geraldo Luiz Pereira
+www.github.com/rousbound
+
+The key of a position is the XOR of the keys of each piece on its square,
+the side to move, the castling rights and the En passeant file.
+Making a move only needs to XOR out what changed and XOR in the new state.
+"""
+import random
+
+# Fixed seed, so keys are the same in every process and can be stored
+generator = random.Random(0x6D7963686573)
+
+def random_key():
+    """
+    Returns a random 64 bit key
+    """
+    return generator.getrandbits(64)
+
+# Keyed by FEN character of the piece, then x and y
+ZOBRIST_PIECES = {char: [[random_key() for _ in range(8)] for _ in range(8)]
+                  for char in "PNBRQKpnbrqk"}
+ZOBRIST_BLACK_TO_MOVE = random_key()
+ZOBRIST_CASTLING = {side: random_key() for side in "KQkq"}
+# Keyed by file of the En passeant square
+ZOBRIST_EN_PASSEANT = [random_key() for _ in range(8)]
@@ -0,0 +1,69 @@
+"""
+This test checks batch FEN parsing against the Board FEN parser.
+
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mychess import Board
+from mychess.pieces import PAWN, ROOK, KING
+from mychess.batch import parse_fens, serialize_fens
+
+
+fens = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 3",
+    "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+    "7k/4N3/5K2/5BN1/8/8/8/r7 b - - 100 113",
+]
+
+def test_round_trip():
+    positions = parse_fens(fens)
+    assert len(positions) == len(fens)
+    assert serialize_fens(positions) == fens
+    assert serialize_fens(parse_fens([])) == []
+
+def test_fields():
+    positions = parse_fens(fens)
+    assert positions["pieces"][0][60] == KING
+    assert positions["pieces"][0][4] == -KING
+    assert positions["pieces"][0][48] == PAWN
+    assert positions["turn"].tolist() == [True, True, True, False, False]
+    assert positions["castling"].tolist() == [15, 15, 9, 0, 0]
+    assert positions["en_passeant"].tolist() == [-1, -1, 21, 43, -1]
+    assert positions["no_progress_plies"].tolist() == [0, 0, 0, 0, 100]
+
+@pytest.mark.parametrize("index", range(len(fens)))
+def test_same_inference_as_board(index):
+    board = Board(fens[index])
+    positions = parse_fens(fens[index:index+1])
+    first_move = positions.pawns_first_move()[0]
+    rook_sides = positions.rook_sides()[0]
+    for square in range(64):
+        piece = board[square % 8, square // 8]
+        code = positions["pieces"][0][square]
+        if piece is None:
+            assert code == 0
+            continue
+        assert (code > 0) == piece.color
+        if piece.name == "P":
+            assert first_move[square] == piece.first_move
+        if piece.name == "R":
+            assert abs(code) == ROOK
+            assert rook_sides[square] == (piece.rook_side or "")
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBN w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkx - 0 1",
+    # Empty squares are only digits, as Board reads them
+    "rnbqkbnr/pppppppp/......../8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/4...1/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+])
+def test_invalid_fens(fen):
+    with pytest.raises(ValueError):
+        parse_fens(fens + [fen])
@@ -6,12 +6,12 @@ This way we can debug positions that shouldn't happen.
 
 """
 
-import copy
 import time
 import datetime
 import sys
 import logging
 import os
+import pytest
 import chess as debug_chess
 
 from mychess import Chess
@@ -38,11 +38,8 @@ def move_generation_test(depth, chess, original_fen):
     chess.legal_moves = chess.get_legal_moves()
     counter = 0
     for move in chess.legal_moves:
-        # Save board for undoing move later
-        board = copy.deepcopy(chess.board)
-
-        # Make move
-        chess.play_move(move)
+        # Make move, saving what is needed for undoing it later
+        undo = chess.play_move(move)
 
         # Compare with a more mature library result
         debug_board = debug_chess.Board(original_fen)
@@ -60,14 +57,14 @@ def move_generation_test(depth, chess, original_fen):
         counter += move_generation_test(depth-1, chess, original_fen)
 
         # Undo move
-        chess.board = board
+        chess.board.unmake_move(undo)
 
     return counter
 
 
-def brute_force_position(depth, expected_results, fen):
+def brute_force_position(depth, expected_results, fen, backend="board"):
     logging.info("----------------------------------------")
-    logging.info(f"Initiating move generation test on depth: {depth}")
+    logging.info(f"Initiating move generation test on depth: {depth} with {backend} backend")
     if fen:
         logging.info(f"FEN of position to be brute forced:{fen}")
 
@@ -78,7 +75,7 @@ def brute_force_position(depth, expected_results, fen):
 
     for current_depth, expected_result in zip(range(1,depth+1), expected_results):
         # Create Chess() instance based on a FEN
-        game = Chess(fen=fen, print_turn_decorator=False)
+        game = Chess(fen=fen, print_turn_decorator=False, backend=backend)
         
         # Brute force position and count number of possible moves
         result = move_generation_test(current_depth, game, fen)
@@ -102,50 +99,62 @@ def brute_force_position(depth, expected_results, fen):
 
     return result_list[:depth]
 
-def test_initial_position():
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_initial_position(backend):
     depth = 5
     expected_results = [20, 400, 8_902, 197_281, 4_865_609]
     fen =  "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
 
-def test_position_1():
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_position_1(backend):
     depth = 3
     expected_results = [48, 2_039, 97_862, 4_085_603]
     fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
 
-def test_position_2():
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_position_2(backend):
     depth = 4
     expected_results = [14, 191, 2_812, 43_238]
     fen =  "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 0"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
 
-def test_position_3():
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_position_3(backend):
     depth = 4
     expected_results = [6, 264 , 9_467, 422_333]
     fen = "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
 
-def test_position_4():
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_position_4(backend):
     depth = 4
     expected_results = [44, 1_486 , 62_379, 2_103_487]
     fen = "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
 
-def test_position_5(): 
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_position_5(backend):
     depth = 3
     expected_results = [46 , 2_079, 89_890]
     fen = "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"
     assert brute_force_position(depth,
                                 expected_results,
-                                fen = fen) == expected_results[:depth]
+                                fen = fen,
+                                backend = backend) == expected_results[:depth]
@@ -0,0 +1,102 @@
+"""
+This test writes games to a database file and reads them back.
+
+"""
+import io
+
+import pytest
+
+from mychess import IllegalMoveError
+from mychess.pgn import iter_games
+from mychess.database import GameWriter, GameDatabase
+
+
+pgn = """[Event "Scholar's mate"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+[Event "Castling and promotion"]
+[FEN "r3k2r/6P1/8/8/8/8/8/R3K2R w KQkq - 0 1"]
+
+1. O-O O-O-O 2. gxh8=N Rxh8 3. Rfb1 *
+
+[Event "No moves"]
+
+*
+
+1. d4 d5 2. c4 dxc4 3. e3 b5 4. a4 c6 5. axb5 cxb5 6. Qf3 1-0
+"""
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_round_trip(tmp_path, backend):
+    games = list(iter_games(io.StringIO(pgn)))
+    path = str(tmp_path / "games.db")
+    with GameWriter(path, backend=backend) as writer:
+        for game_id, game in enumerate(games):
+            assert writer.add_game(game.moves, game.headers, game.fen()) == game_id
+
+    with GameDatabase(path, backend=backend) as db:
+        assert len(db) == len(games)
+        # Read out of order
+        for game_id in [3, 1, 0, 2]:
+            stored_game = db[game_id]
+            assert stored_game.game_id == game_id
+            assert stored_game.headers == games[game_id].headers
+            assert stored_game.moves == games[game_id].moves
+            assert stored_game.fen() == games[game_id].fen()
+        assert db.read_headers(1)["Event"] == "Castling and promotion"
+        assert [len(game.moves) for game in db] == [7, 5, 0, 11]
+
+        plies = [chess.board.board_2_fen() for chess in db.replay(1)]
+        assert plies[0] == games[1].fen()
+        assert plies[-1] == "2k4r/8/8/8/8/8/8/RR4K1 b - - 1 3"
+
+        with pytest.raises(IndexError):
+            db[4]
+
+def test_illegal_move(tmp_path):
+    path = str(tmp_path / "games.db")
+    with GameWriter(path) as writer:
+        with pytest.raises(IllegalMoveError):
+            writer.add_game([((4,6),(4,3),"%")])
+        assert writer.add_game([((4,6),(4,4),"%")]) == 0
+    with GameDatabase(path) as db:
+        assert len(db) == 1
+        assert db[0].uci_moves() == ["e2e4"]
+
+def test_not_a_database(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text(pgn)
+    with pytest.raises(ValueError):
+        GameDatabase(str(path))
+
+def test_games_with_position(tmp_path):
+    games = list(iter_games(io.StringIO(pgn)))
+    path = str(tmp_path / "games.db")
+    with GameWriter(path, position_index=True) as writer:
+        for game in games:
+            writer.add_game(game.moves, game.headers, game.fen())
+    with open(path + ".pos", "rb") as index_file:
+        written_index = index_file.read()
+
+    with GameDatabase(path) as db:
+        assert db.games_with_position() == [(0, 0), (2, 0), (3, 0)]
+        assert db.games_with_position("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2") == [(0, 2)]
+        assert db.games_with_position("2k4r/8/8/8/8/8/8/RR4K1 b - - 1 3") == [(1, 5)]
+        # Move counters are not part of the position
+        assert db.games_with_position("rnbqkbnr/p3pppp/8/1p6/2pP4/4PQ2/1P3PPP/RNB1KBNR b KQkq - 0 1") == [(3, 11)]
+        assert db.games_with_position("8/8/8/8/8/8/8/K6k w - - 0 1") == []
+
+        # Built again from the database in small chunks
+        db.build_position_index(chunk_entries=5)
+        assert db.games_with_position() == [(0, 0), (2, 0), (3, 0)]
+    with open(path + ".pos", "rb") as index_file:
+        assert index_file.read() == written_index
+
+    # Writing another database over it drops the stale index
+    with GameWriter(path) as writer:
+        writer.add_game([])
+    with GameDatabase(path) as db:
+        with pytest.raises(FileNotFoundError):
+            db.games_with_position()
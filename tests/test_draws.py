@@ -5,7 +5,9 @@ This script tests draw conditions.
 import logging
 import os
 
-from mychess import Chess
+import pytest
+
+from mychess import Chess, GameResult, IllegalMoveError, InvalidMoveError
 import datetime 
 
 
@@ -59,3 +61,46 @@ def test_all_draw_cases():
     print("DRAW TEST SUCCESSFUL")
     logging.info(f"DRAW TEST SUCCESSFUL")
 
+
+
+@pytest.mark.parametrize("test,expected_result", [
+    (movedraw50, GameResult.NO_PROGRESS),
+    (draw_three_fold_repetition, GameResult.THREE_FOLD_REPETITION),
+    (draw_by_stalemate, GameResult.STALEMATE),
+    (only_knight_left, GameResult.KING_AND_KNIGHT),
+    (only_kings, GameResult.ONLY_KINGS),
+])
+def test_draw_results(test, expected_result, capsys):
+    chess = Chess()
+    chess.test_input_moves(test[0].split(" "))
+    assert not chess.game_running
+    assert chess.result is expected_result
+    assert chess.result.score() == "1/2-1/2"
+    assert capsys.readouterr().out == ""
+
+    # Quiet mode doesn't build the debug move lists either
+    chess = Chess(debug=False)
+    chess.test_input_moves(test[0].split(" "))
+    assert chess.result is expected_result
+    assert chess.uci_moves_list == chess.pgn_moves_list == ""
+
+def test_checkmate_result():
+    chess = Chess()
+    for uci_move in ["f2f3", "e7e5", "g2g4", "d8h4"]:
+        chess.push_uci(uci_move)
+    chess.legal_moves = chess.get_legal_moves()
+    assert chess.result is GameResult.BLACK_WINS
+    assert chess.result.score() == "0-1"
+    with pytest.raises(IllegalMoveError):
+        chess.push_uci("e2e4")
+
+def test_bad_input():
+    # The side to move could capture the king
+    with pytest.raises(ValueError):
+        Chess("7k/8/6K1/8/8/8/8/Q7 w - - 0 1")
+    chess = Chess()
+    with pytest.raises(InvalidMoveError):
+        chess.push_uci("e9e4")
+    with pytest.raises(IllegalMoveError):
+        chess.push_uci("e2e5")
+    assert chess.game_running
@@ -0,0 +1,47 @@
+"""
+This test checks that packed positions round trip exactly with FEN.
+
+"""
+import pytest
+
+from mychess import Board, BitBoard
+from mychess.board import POSITION_SIZE
+
+
+fens = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 3",
+    "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+    "7k/4N3/5K2/5BN1/8/8/8/r7 b - - 100 113",
+    "8/8/8/8/8/8/8/K6k w - - 12345 9999",
+]
+
+@pytest.mark.parametrize("backend", [Board, BitBoard])
+@pytest.mark.parametrize("fen", fens)
+def test_bytes_round_trip(fen, backend):
+    board = backend(fen)
+    data = board.to_bytes()
+    assert len(data) == POSITION_SIZE
+
+    packed_board = backend.from_bytes(data)
+    assert packed_board.board_2_fen() == fen
+    assert packed_board.zobrist_key == board.zobrist_key
+    assert sorted(packed_board.generate_legal_moves()) == sorted(board.generate_legal_moves())
+
+def test_bytes_after_moves():
+    board = Board()
+    for move in [((4,6),(4,4),"%"), ((3,1),(3,3),"%"), ((4,4),(3,3),"%")]:
+        board.make_move(move)
+        assert Board.from_bytes(board.to_bytes()).board_2_fen() == board.board_2_fen()
+
+def test_too_many_pieces():
+    with pytest.raises(ValueError):
+        Board("qqqqkqqq/qqqqqqqq/p7/8/8/8/QQQQQQQQ/QQQQKQQQ w - - 0 1").to_bytes()
+
+@pytest.mark.parametrize("backend", [Board, BitBoard])
+def test_invalid_piece(backend):
+    # As batch.parse_fens, letters that are not pieces are refused, not read as kings
+    with pytest.raises(ValueError):
+        backend("rnbqxbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
@@ -0,0 +1,141 @@
+"""
+This test checks that the engine finds mates, respects its limits
+and leaves the board as it found it.
+
+"""
+import pytest
+
+from mychess import Chess, GameResult
+from mychess.engine import Searcher, TranspositionTable, MATE, INFINITY, EXACT, LOWER, UPPER
+from mychess.engine import encode_move, decode_move
+
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+@pytest.mark.parametrize("fen,depth,expected_pv", [
+    # Back rank mate in 1
+    ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", 2, ["d1d8"]),
+    # Scholar's mate
+    ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", 2, ["h5f7"]),
+    # Mate in 2 with a knight sacrifice
+    ("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1", 4, ["d5f6", "g7f6", "c4f7"]),
+])
+def test_finds_mate(fen, depth, expected_pv, backend):
+    chess = Chess(fen, debug=False, backend=backend)
+    result = Searcher(max_depth=depth).search(chess.board)
+    assert result.uci_pv() == expected_pv
+    assert result.score == MATE - len(expected_pv)
+
+def test_getting_mated():
+    chess = Chess("3R2k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1", debug=False)
+    result = Searcher(max_depth=3).search(chess.board)
+    assert result.move is None
+
+    chess = Chess("6k1/8/8/8/8/1r5P/r7/7K w - - 0 1", debug=False)
+    result = Searcher(max_depth=3).search(chess.board)
+    assert result.score == -MATE + 2
+
+def test_wins_material():
+    # The queen is hanging
+    chess = Chess("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1", debug=False)
+    result = Searcher(max_depth=3).search(chess.board)
+    assert result.uci_pv()[0] == "d2d5"
+
+def test_quiescence():
+    # The pawn is defended, and a shallow search must see the recapture
+    chess = Chess("4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1", debug=False)
+    result = Searcher(max_depth=1).search(chess.board)
+    assert result.uci_pv()[0] != "d2d5"
+    assert result.score > 500
+
+def test_quiescence_in_check():
+    # Black is a queen up but in check, and the only evasion Qc8 is taken with mate
+    chess = Chess("k2R4/pp6/8/8/8/7q/8/6K1 b - - 0 1", debug=False)
+    score = Searcher().quiescence(chess.board, -INFINITY, INFINITY, 0)
+    assert score == -MATE + 2
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_limits(backend):
+    chess = Chess(debug=False, backend=backend)
+    fen = chess.board.board_2_fen()
+    key = chess.board.zobrist_key
+
+    result = Searcher(node_limit=500).search(chess.board)
+    assert result.nodes <= 500
+    assert result.move in chess.legal_moves
+
+    result = Searcher(time_limit=0.2).search(chess.board)
+    assert result.elapsed < 1.0
+    assert result.depth >= 1
+    assert result.move == result.pv[0]
+
+    assert chess.board.board_2_fen() == fen
+    assert chess.board.zobrist_key == key
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+@pytest.mark.parametrize("time_limit", [0.05, 0.2])
+def test_time_limit(time_limit, backend):
+    # A knight is hanging, but the rook mates on the back rank
+    chess = Chess("6k1/5ppp/8/8/n7/1P6/5PPP/3R2K1 w - - 0 1", debug=False, backend=backend)
+    result = Searcher(time_limit=time_limit).search(chess.board)
+    assert result.elapsed < time_limit + 0.1
+    assert result.move == ((3, 7), (3, 0), "%")
+
+    # Kiwipete: the first iteration alone takes longer than the limit
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    chess = Chess(fen, debug=False, backend=backend)
+    result = Searcher(time_limit=time_limit).search(chess.board)
+    assert result.elapsed < time_limit + 0.1
+    assert result.move in chess.legal_moves
+    # The king doesn't walk away while a bishop is hanging
+    assert chess.board[result.move[0]].name != "K"
+    assert chess.board.board_2_fen() == fen
+
+def test_get_move():
+    chess = Chess("7k/8/5K2/8/8/8/8/6Q1 w - - 0 1", debug=False)
+    searcher = Searcher(chess, max_depth=3)
+    chess.play_cli(searcher.get_move)
+    assert chess.result is GameResult.WHITE_WINS
+
+def test_move_encoding():
+    chess = Chess("4k3/1P6/8/8/8/8/8/R3K3 w Q - 0 1", debug=False)
+    for move in chess.legal_moves:
+        assert decode_move(encode_move(move)) == move
+    assert encode_move(None) == 0
+    assert decode_move(0) is None
+
+def test_transposition_table():
+    table = TranspositionTable(size_mb=0)
+    assert table.size == 2
+    move = ((4,6),(4,4),"%")
+    assert table.probe(1) is None
+    table.store(1, move, 35, 4, EXACT)
+    assert table.probe(1) == (move, 35, 4, EXACT)
+
+    # A shallower entry goes to the always-replace slot, keeping the deep one
+    table.store(2, None, -20, 2, UPPER)
+    assert table.probe(1) == (move, 35, 4, EXACT)
+    assert table.probe(2) == (None, -20, 2, UPPER)
+    table.store(3, move, 10, 1, LOWER)
+    assert table.probe(2) is None
+    assert table.probe(3) == (move, 10, 1, LOWER)
+
+    # Entries of older searches give way
+    table.new_search()
+    table.store(4, None, 0, 1, EXACT)
+    assert table.probe(1) is None
+    assert table.probe(4) == (None, 0, 1, EXACT)
+    assert table.hits == 5
+
+@pytest.mark.parametrize("fen", [
+    None,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 0",
+])
+def test_hash_search(fen):
+    # The table saves nodes without changing the result
+    chess = Chess(fen, debug=False, backend="bitboard")
+    plain = Searcher(max_depth=4, hash_mb=0).search(chess.board)
+    hashed = Searcher(max_depth=4, hash_mb=1).search(chess.board)
+    assert hashed.score == plain.score
+    assert hashed.nodes < plain.nodes
+    assert hashed.hash_hits > 0
@@ -0,0 +1,76 @@
+"""
+This test checks that the incremental evaluation matches the one computed
+from scratch, and that it sees positions as both sides do.
+
+"""
+import random
+
+import pytest
+
+from mychess import Board, BitBoard, Chess, GameResult
+from mychess.evaluation import evaluate
+
+
+def scratch_scores(board):
+    fresh = type(board)(board.board_2_fen())
+    return fresh.midgame_score, fresh.endgame_score, fresh.phase
+
+def mirror_fen(fen):
+    # Same position with colors swapped
+    fields = fen.split(" ")
+    ranks = fields[0].split("/")[::-1]
+    fields[0] = "/".join(rank.swapcase() for rank in ranks)
+    fields[1] = "b" if fields[1] == "w" else "w"
+    fields[2] = "".join(sorted(fields[2].swapcase())) if fields[2] != "-" else "-"
+    if fields[3] != "-":
+        fields[3] = fields[3][0] + str(9 - int(fields[3][1]))
+    return " ".join(fields)
+
+@pytest.mark.parametrize("backend", [Board, BitBoard])
+def test_incremental_scores(backend):
+    generator = random.Random(7)
+    board = backend("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1")
+    start = (board.midgame_score, board.endgame_score, board.phase)
+    undos = []
+    for _ in range(60):
+        moves = board.generate_legal_moves()
+        if not moves:
+            break
+        undos.append(board.make_move(generator.choice(moves)))
+        assert (board.midgame_score, board.endgame_score, board.phase) == scratch_scores(board)
+    for undo in reversed(undos):
+        board.unmake_move(undo)
+    assert (board.midgame_score, board.endgame_score, board.phase) == start
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+])
+def test_symmetry(fen):
+    assert evaluate(Board(fen)) == evaluate(Board(mirror_fen(fen)))
+
+def test_side_to_move():
+    # The score doesn't divide by the phase evenly
+    white, black = Board("4k3/8/8/8/8/8/8/3QK3 w - - 0 1"), Board("4k3/8/8/8/8/8/8/3QK3 b - - 0 1")
+    assert evaluate(white) == -evaluate(black) > 0
+
+def test_phase():
+    board = Board()
+    assert board.phase == 24
+    assert evaluate(board) == board.midgame_score == 0
+    # Without pieces only the endgame scores count
+    board = Board("4k3/pppp4/8/8/8/8/PPPPP3/4K3 w - - 0 1")
+    assert board.phase == 0
+    assert evaluate(board) == board.endgame_score > 0
+    board.make_move(((4,7),(4,6),"%"))
+    assert evaluate(board) == -board.endgame_score
+
+@pytest.mark.parametrize("fen,result", [
+    ("8/8/8/4k3/8/8/8/4K3 w - - 0 1", GameResult.ONLY_KINGS),
+    ("8/8/8/4k3/8/8/8/2B1K3 w - - 0 1", GameResult.KING_AND_BISHOP),
+    ("8/8/8/4k3/8/8/8/1N2K3 b - - 0 1", GameResult.KING_AND_KNIGHT),
+])
+def test_material_draw(fen, result):
+    assert evaluate(Board(fen)) == 0
+    assert Chess(fen).result is result
@@ -0,0 +1,114 @@
+"""
+This test checks the legal moves cache gives the same games as generating them.
+
+"""
+import asyncio
+
+import pytest
+
+from mychess import Chess, GameResult, enable_move_cache, disable_move_cache, get_move_cache
+from mychess.movecache import MoveCache
+from mychess.server import GameServer, GameClient
+
+
+opening = "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7".split()
+repetition = "e2e4 e7e5 e1e2 e8e7 e2e1 e7e8 e1e2 e8e7 e2e1 e7e8 e1e2 e8e7 a2a4".split()
+
+@pytest.fixture
+def cache():
+    cache = enable_move_cache(1000)
+    yield cache
+    disable_move_cache()
+
+def test_disabled():
+    assert get_move_cache() is None
+    chess = Chess(debug=False)
+    assert isinstance(chess.get_legal_moves(), list)
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_same_games(cache, backend):
+    uncached = Chess(backend=backend)
+    disable_move_cache()
+    expected = []
+    for uci_move in opening:
+        uncached.push_uci(uci_move)
+        expected.append(uncached.get_legal_moves())
+    enable_move_cache(1000)
+    cache = get_move_cache()
+
+    for game in range(3):
+        chess = Chess(backend=backend)
+        for uci_move, legal_moves in zip(opening, expected):
+            chess.push_uci(uci_move)
+            assert chess.get_legal_moves() == tuple(legal_moves)
+        assert chess.uci_moves() == uncached.uci_moves()
+    # Each position is generated once, then served from the cache
+    assert len(cache) == len(opening) + 1
+    assert cache.misses == len(opening) + 1
+    assert cache.hit_rate() > 0.8
+
+def test_backends_apart(cache):
+    Chess(debug=False, backend="board")
+    Chess(debug=False, backend="bitboard")
+    assert len(cache) == 2 and cache.hits == 0
+
+def test_endings(cache):
+    fen = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+    for _ in range(2):
+        chess = Chess(fen, debug=False)
+        assert chess.result == GameResult.BLACK_WINS and not chess.game_running
+    assert cache.hits == 1
+
+    # Repetitions depend on the game, not on the position
+    Chess(debug=False).test_input_moves(repetition[:4])
+    chess = Chess(debug=False)
+    chess.test_input_moves(repetition)
+    assert chess.result == GameResult.THREE_FOLD_REPETITION
+    assert cache.hits > 1
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_captured_rook(cache, backend):
+    # The h1 rook is captured on its square, and the a1 rook takes its place
+    fen = "4k3/r7/8/8/8/8/8/4K2R w K - 1 5"
+    fresh = Chess(fen, debug=False, backend=backend)
+    castle = ((4, 7), (6, 7), "%")
+    assert castle in fresh.get_legal_moves()
+
+    chess = Chess("r3k3/8/8/8/8/8/6b1/R3K2R b KQq - 0 1", debug=False, backend=backend)
+    for uci_move in "g2h1 a1a2 a8a7 a2h2 a7a8 h2h1 a8a7".split():
+        chess.push_uci(uci_move)
+    assert chess.board.board_2_fen() == "4k3/r7/8/8/8/8/8/4K2R w - - 1 5"
+    assert chess.board.zobrist_key != fresh.board.zobrist_key
+    assert castle not in chess.get_legal_moves()
+
+def test_lru():
+    cache = MoveCache(2)
+    boards = [Chess(fen, debug=False).board for fen in [None,
+              "8/8/8/8/8/8/8/K6k w - - 0 1", "8/8/8/8/8/8/8/K6k b - - 0 1"]]
+    cache.put(boards[0], [], (None, None))
+    cache.put(boards[1], [], (None, None))
+    assert cache.get(boards[0]) is not None
+    cache.put(boards[2], [], (None, None))
+    # The least recently used position was dropped
+    assert cache.get(boards[1]) is None
+    assert cache.get(boards[0]) is not None and cache.get(boards[2]) is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+    with pytest.raises(ValueError):
+        MoveCache(0)
+
+def test_server(cache):
+    async def main():
+        server = GameServer(port=0, offload_threshold=None)
+        await server.start()
+        try:
+            client = await GameClient.connect(*server.address())
+            for _ in range(2):
+                game = (await client.request("new"))["game"]
+                for uci_move in opening:
+                    answer = await client.request("move", game=game, move=uci_move)
+                    assert answer["ok"] and answer["result"] is None
+            await client.close()
+        finally:
+            await server.close()
+    asyncio.run(main())
+    assert cache.misses == len(opening) + 1
@@ -0,0 +1,47 @@
+"""
+This test checks the algebric and uci forms of the legal moves.
+
+"""
+import pytest
+
+from mychess import Chess
+
+
+@pytest.mark.parametrize("fen,expected_moves", [
+    # Knights on the same file, rooks on the same rank
+    ("1k6/8/8/8/8/N7/8/N3K2R w K - 0 1", ["Nb1", "N1c2", "N3c2", "Nb5", "Nc4", "O-O", "Rf1"]),
+    ("1k6/8/8/8/8/8/8/R4R1K w - - 0 1", ["Rab1", "Rfb1", "Rae1", "Rg1", "Ra8"]),
+    # The e2 knight is pinned, so Nc3 needs no specifier
+    ("4k3/4r3/8/8/8/8/4N3/1N2K3 w - - 0 1", ["Nc3", "Na3", "Nd2"]),
+    # En passeant and promotions
+    ("4k3/8/8/8/3pP3/8/1p6/7K b - e3 0 1", ["dxe3", "d3", "b1=Q", "b1=N"]),
+    # Three queens reaching the same square
+    ("kn6/8/8/4Q2Q/8/8/7Q/K7 w - - 0 1", ["Qee2", "Q2e2", "Qh5e2", "Q2h4", "Q5h4", "Qhh8", "Qxb8"]),
+])
+def test_algebric_legal_moves(fen, expected_moves):
+    chess = Chess(fen, print_turn_decorator=False)
+    for move in expected_moves:
+        assert move in chess.algebric_legal_moves
+    for move in chess.legal_moves:
+        assert chess.get_algebric_move(move) in chess.algebric_legal_moves
+
+def test_legal_moves_strings_are_lazy():
+    chess = Chess(print_turn_decorator=False)
+    assert chess.uci_legal_moves.moves is None
+    assert chess.algebric_legal_moves.moves is None
+    assert len(chess.algebric_legal_moves) == len(chess.uci_legal_moves) == 20
+    assert "e2e4" in chess.uci_legal_moves
+    assert "Nf3" in chess.algebric_legal_moves
+
+    chess.play_move(chess.legal_moves[0])
+    assert chess.algebric_legal_moves == chess.uci_legal_moves == []
+
+def test_legal_moves_strings_kept_after_move():
+    chess = Chess(print_turn_decorator=False)
+    algebric_moves = chess.algebric_legal_moves
+    uci_moves = chess.uci_legal_moves
+    chess.push_uci("e2e4")
+    # Still the moves of the position they were made for
+    assert len(algebric_moves) == len(uci_moves) == 20
+    assert "e4" in algebric_moves and "Nf3" in algebric_moves
+    assert "e2e4" in uci_moves
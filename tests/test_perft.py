@@ -0,0 +1,65 @@
+"""
+This test runs the library perft on the positions of the brute force test,
+at depths small enough to be used as a quick regression gate.
+
+"""
+import sys
+
+import pytest
+
+from mychess import perft
+
+
+positions = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0", [20, 400, 8_902]),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0", [48, 2_039]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 0", [14, 191, 2_812]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9_467]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1_486]),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2_079]),
+    ("8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", [15, 126, 1_928]),
+]
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+@pytest.mark.parametrize("fen,expected_results", positions)
+def test_perft(fen, expected_results, backend):
+    results = [perft(fen, depth, backend=backend).nodes
+               for depth in range(1, len(expected_results)+1)]
+    assert results == expected_results
+
+def test_perft_divide():
+    result = perft(None, 3, divide=True)
+    assert len(result.divide) == 20
+    assert result.divide["e2e4"] == 600
+    assert sum(result.divide.values()) == result.nodes == 8_902
+
+def test_perft_workers():
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 0"
+    single = perft(fen, 3, divide=True)
+    parallel = perft(fen, 3, divide=True, workers=2)
+    assert parallel.nodes == single.nodes == 97_862
+    assert parallel.divide == single.divide
+
+def test_perft_workers_mate():
+    # Root moves are split one ply deeper, a1a8 has no replies
+    fen = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+    single = perft(fen, 3, divide=True)
+    parallel = perft(fen, 3, divide=True, workers=16)
+    assert parallel.divide["a1a8"] == 0
+    assert parallel.divide == single.divide
+    assert parallel.nodes == single.nodes
+
+def test_worker_table_size():
+    perft_module = sys.modules["mychess.perft"]
+    perft_module.count_nodes_from_fen(None, 2, "bitboard", hash_mb=1)
+    assert perft_module.worker_table.size == perft_module.PerftTable.entries_for(1)
+    perft_module.count_nodes_from_fen(None, 2, "bitboard", hash_mb=2)
+    assert perft_module.worker_table.size == perft_module.PerftTable.entries_for(2)
+
+@pytest.mark.parametrize("replacement", ["depth", "always"])
+@pytest.mark.parametrize("fen,expected_results", positions)
+def test_perft_hash(fen, expected_results, replacement):
+    depth = len(expected_results)
+    result = perft(fen, depth, hash_mb=1, replacement=replacement)
+    assert result.nodes == expected_results[-1]
+    assert result.hash_probes > 0
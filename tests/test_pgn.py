@@ -0,0 +1,90 @@
+"""
+This test reads games in PGN format.
+
+"""
+import io
+
+import pytest
+
+from mychess.pgn import iter_games
+
+
+pgn = """[Event "Scholar's mate"]
+[White "Player \\"One\\""]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 {threatening mate} Nc6 (2... g6 3. Qxe5+) 3. Bc4 $1 Nf6?? 4. Qxf7# 1-0
+
+[Event "Castling and promotion"]
+[SetUp "1"]
+[FEN "r3k2r/6P1/8/8/8/8/8/R3K2R w KQkq - 0 1"]
+
+1.O-O O-O-O 2. gxh8=Q ; the rest of the line is a comment
+Rxh8 {a comment
+that spans lines} 3. Rfb1 *
+
+% escaped line
+1. d4 d5 2. Nf3 Nf6 3. Nbd2 Nbd7 4. Ne5 Nb6 5. Ndf3 1/2-1/2
+
+1. d3 d6 2. Nf3 e6 3. Nd2 0-1
+
+1. e4 e5 2. Ke3 Nc6 *
+
+1. d4 e5 2. dxe5
+"""
+
+def test_iter_games():
+    games = list(iter_games(io.StringIO(pgn)))
+    assert len(games) == 6
+
+    scholar = games[0]
+    assert scholar.headers["White"] == 'Player "One"'
+    assert scholar.result == "1-0"
+    assert scholar.error is None
+    assert scholar.san_moves == ["e4", "e5", "Qh5", "Nc6", "Bc4", "Nf6??", "Qxf7#"]
+    assert scholar.uci_moves() == ["e2e4", "e7e5", "d1h5", "b8c6", "f1c4", "g8f6", "h5f7"]
+
+    castling = games[1]
+    assert castling.fen() == "r3k2r/6P1/8/8/8/8/8/R3K2R w KQkq - 0 1"
+    assert castling.uci_moves() == ["e1g1", "e8c8", "g7h8q", "d8h8", "f1b1"]
+    assert castling.result == "*"
+
+    assert games[2].error is None
+    assert games[2].uci_moves()[4:] == ["b1d2", "b8d7", "f3e5", "d7b6", "d2f3"]
+    assert games[2].result == "1/2-1/2"
+
+    # Ambiguous and illegal moves stop the replay of the game, not the reading
+    assert games[3].error == "Move 3: Nd2 is ambiguous"
+    assert len(games[3].moves) == 4
+    assert games[4].error == "Move 2: Ke3 is illegal"
+
+    # Last game without result
+    assert games[5].uci_moves() == ["d2d4", "e7e5", "d4e5"]
+    assert games[5].result == "*"
+
+def test_result_tag():
+    games = list(iter_games(io.StringIO("""[Result "1-0"]
+
+1. e4 e5
+
+[FEN "4k3/8/8/8/8/8/8/4K3 b - - 0 12"]
+[Result "1/2-1/2"]
+
+12... Kd7 13. Kd2 Kd6 14. Ke5
+""")))
+    # Without a termination marker the Result tag is kept, also before the next game
+    assert games[0].result == "1-0"
+    assert games[1].result == "1/2-1/2"
+    # Moves are numbered from the FEN, where Black moves first
+    assert games[1].error == "Move 14: Ke5 is illegal"
+    assert games[1].uci_moves() == ["e8d7", "e1d2", "d7d6"]
+
+def test_reads_lazily():
+    lines = iter(pgn.splitlines(keepends=True))
+    games = iter_games(lines)
+    next(games)
+    assert '[Event "Castling and promotion"]\n' in list(lines)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        next(iter_games(io.StringIO(pgn), backend="abacus"))
@@ -0,0 +1,35 @@
+"""
+This test checks the static exchange evaluation of captures.
+
+"""
+import pytest
+
+from mychess import Board, BitBoard
+from mychess.utils import uci_2_move
+
+
+@pytest.mark.parametrize("backend", [Board, BitBoard])
+@pytest.mark.parametrize("fen,uci_move,expected", [
+    # Undefended pawn
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+    # Knight takes a pawn and the exchange goes on with x-rays on both sides
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -220),
+    # Black doesn't recapture with the rook, it would lose it
+    ("3rk3/8/2n5/3p4/4P3/8/8/3RK3 w - - 0 1", "e4d5", 100),
+    # The king recaptures the queen
+    ("4k3/4r3/8/8/8/8/4Q3/4K3 w - - 0 1", "e2e7", -400),
+    # but not if the square is defended by the rook behind the queen
+    ("4k3/3nr3/8/8/8/8/4Q3/4R1K1 w - - 0 1", "e2e7", 500),
+    ("4k3/8/5n2/3q4/8/8/3R4/3RK3 w - - 0 1", "d2d5", 900 - 500 + 320),
+    ("4k3/3r4/3r4/3p4/8/8/3R4/3R2K1 w - - 0 1", "d2d5", 100 - 500 + 500 - 500),
+    # En passeant and promotions
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 100),
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q", 500 + 800),
+    ("1rr1k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q", 500 + 800 - 900),
+    # Quiet moves are exchanges as well
+    ("4k3/8/2p5/8/8/8/8/3QK3 w - - 0 1", "d1d5", -900),
+])
+def test_see(fen, uci_move, expected, backend):
+    board = backend(fen)
+    assert board.see(uci_2_move(uci_move)) == expected
+    assert board.board_2_fen() == fen
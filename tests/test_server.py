@@ -0,0 +1,144 @@
+"""
+This test plays games on the game server with asyncio clients.
+
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from mychess.server import GameServer, GameClient, MAX_REQUEST_SIZE
+
+
+def run_with_server(test, **options):
+    async def main():
+        server = GameServer(port=0, **options)
+        await server.start()
+        try:
+            return await test(server, *server.address())
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_play_game():
+    async def test(server, host, port):
+        client = await GameClient.connect(host, port)
+        answer = await client.request("new")
+        assert answer["ok"] and answer["turn"] == "w"
+        game = answer["game"]
+
+        answer = await client.request("legal_moves", game=game)
+        assert len(answer["legal_moves"]) == 20
+
+        for move in ["f2f3", "e7e5", "g2g4"]:
+            answer = await client.request("move", game=game, move=move)
+            assert answer["ok"]
+            assert answer["result"] is None
+        answer = await client.request("move", game=game, move="d8h4")
+        assert answer["ok"]
+        assert answer["score"] == "0-1"
+
+        answer = await client.request("move", game=game, move="e2e4")
+        assert not answer["ok"]
+        assert "the game is over" in answer["error"]
+        answer = await client.request("close", game=game)
+        assert answer["ok"]
+        assert game not in server.sessions
+        await client.close()
+    run_with_server(test)
+
+def test_bad_requests():
+    async def test(server, host, port):
+        client = await GameClient.connect(host, port)
+        game = (await client.request("new"))["game"]
+        for request, error in [
+            ({"command": "move", "game": game, "move": "e2e5"}, "e2e5: illegal or impossible move"),
+            ({"command": "move", "game": game, "move": "hello"}, "hello is not in the format"),
+            ({"command": "move", "game": game, "move": "e2e4extra"}, "e2e4extra is not in the format"),
+            ({"command": "state", "game": 999}, "No game 999"),
+            ({"command": "new", "fen": "not a fen"}, "Invalid FEN: not a fen"),
+            ({"command": "dance"}, "Unknown command: dance"),
+            ({"command": "new", "fen": 5}, "fen must be a string"),
+            ({"command": "new", "fen": "8/8/8/8/8/8/8/K7 w - - 0 1"}, "Invalid FEN"),
+            ({"command": "new", "fen": "7k/8/6K1/8/8/8/8/Q7 w - - 0 1"}, "Invalid FEN"),
+            ({"command": "move", "game": game, "move": 5}, "move must be a string"),
+            ({"command": "state", "game": [game]}, "game must be an integer"),
+            ({"command": "state", "game": True}, "game must be an integer"),
+        ]:
+            answer = await client.request(**request)
+            assert not answer["ok"]
+            assert answer["error"].startswith(error)
+        assert (await client.request("state", game=game))["fen"].startswith("rnbqkbnr/pppppppp/")
+        await client.close()
+    run_with_server(test)
+
+def test_line_too_long():
+    async def test(server, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b'{"command": "new", "fen": "' + b"x" * MAX_REQUEST_SIZE + b'"}\n')
+        await writer.drain()
+        answer = json.loads(await reader.readline())
+        assert answer == {"ok": False, "error": "Invalid request: line too long"}
+        assert await reader.readline() == b""
+        writer.close()
+        # Other connections are still served
+        client = await GameClient.connect(host, port)
+        assert (await client.request("new"))["ok"]
+        await client.close()
+    run_with_server(test)
+
+def test_concurrent_games():
+    async def play(host, port, moves):
+        client = await GameClient.connect(host, port)
+        game = (await client.request("new"))["game"]
+        for move in moves:
+            assert (await client.request("move", game=game, move=move))["ok"]
+        state = await client.request("state", game=game)
+        await client.close()
+        return state
+
+    async def test(server, host, port):
+        games = [["e2e4", "e7e5", "g1f3"], ["d2d4", "d7d5"], ["c2c4"]] * 20
+        states = await asyncio.gather(*[play(host, port, moves) for moves in games])
+        assert len(server.sessions) == len(games)
+        assert len({state["game"] for state in states}) == len(games)
+        assert [state["turn"] for state in states[:3]] == ["b", "w", "b"]
+    run_with_server(test)
+
+def test_offload():
+    # Every generation after the first goes to the process pool
+    async def test(server, host, port):
+        client = await GameClient.connect(host, port)
+        game = (await client.request("new"))["game"]
+        for move in ["e2e4", "e7e5", "d1h5", "b8c6", "f1c4", "g8f6", "h5f7"]:
+            answer = await client.request("move", game=game, move=move)
+            assert answer["ok"]
+        assert answer["score"] == "1-0"
+        assert server.offloaded == 6
+        await client.close()
+    run_with_server(test, offload_threshold=0)
+
+def test_unexpected_errors():
+    # Errors the requests don't expect are answered, and the connection stays open
+    async def test(server, host, port):
+        def fail(fen=None):
+            raise RuntimeError("no more games")
+        client = await GameClient.connect(host, port)
+        game = (await client.request("new"))["game"]
+        server.new_game = fail
+        answer = await client.request("new")
+        assert not answer["ok"]
+        assert answer["error"] == "Internal error: RuntimeError: no more games"
+        assert (await client.request("state", game=game))["ok"]
+
+        # A broken pool is replaced, and the moves are still generated
+        assert (await client.request("move", game=game, move="e2e4"))["ok"]
+        server.executor = ProcessPoolExecutor(max_workers=1)
+        await asyncio.wait([asyncio.wrap_future(server.executor.submit(os._exit, 1))])
+        answer = await client.request("move", game=game, move="e7e5")
+        assert answer["ok"] and answer["turn"] == "w"
+        assert server.offloaded == 0 and server.executor is None
+        assert (await client.request("move", game=game, move="g1f3"))["ok"]
+        assert server.offloaded == 1
+        await client.close()
+    run_with_server(test, offload_threshold=0)
@@ -0,0 +1,101 @@
+"""
+This test talks UCI to the engine, as a GUI would.
+
+"""
+import io
+
+from mychess.uci import UciEngine
+
+
+def answers(engine):
+    lines = engine.output.getvalue().splitlines()
+    engine.output.truncate(0)
+    engine.output.seek(0)
+    return lines
+
+def test_handshake():
+    engine = UciEngine(io.StringIO("uci\nisready\nquit\n"), io.StringIO())
+    engine.run()
+    lines = answers(engine)
+    assert lines[0] == "id name mychess"
+    assert lines[-2:] == ["uciok", "readyok"]
+
+def test_position_is_incremental():
+    engine = UciEngine(output=io.StringIO())
+    engine.handle("position startpos moves e2e4 e7e5")
+    chess = engine.chess
+    engine.handle("position startpos moves e2e4 e7e5 g1f3")
+    assert engine.chess is chess
+    assert engine.moves == ["e2e4", "e7e5", "g1f3"]
+    assert chess.board.board_2_fen() == "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+
+    # Other moves, or other start, build the position again
+    engine.handle("position startpos moves d2d4")
+    assert engine.chess is not chess
+    assert engine.chess.board.board_2_fen() == "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1"
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    assert engine.chess.board.board_2_fen() == "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"
+
+    engine.handle("position startpos moves e2e4 e2e4")
+    assert engine.moves == ["e2e4"]
+    assert answers(engine) == ["info string e2e4: illegal or impossible move"]
+    engine.handle("position startpos moves e2e4 e7e5zz")
+    assert engine.moves == ["e2e4"]
+    assert "not in the format" in answers(engine)[0]
+
+    # Positions without both kings, or with a king to capture, are refused,
+    # and no move is searched until a valid position comes
+    for fen in ["8/8/8/8/8/8/8/K7 w - - 0 1", "7k/8/6K1/8/8/8/8/Q7 w - - 0 1"]:
+        engine.handle(f"position fen {fen}")
+        assert answers(engine)[0].startswith("info string Invalid FEN")
+        engine.handle("go depth 2")
+        assert answers(engine) == ["bestmove 0000"]
+    engine.handle("position startpos moves e2e4")
+    assert engine.chess.board.board_2_fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+
+def test_search_failure():
+    engine = UciEngine(output=io.StringIO())
+    engine.handle("position startpos moves e2e4")
+    def fail(board):
+        board.make_move(((4,1),(4,3),"%"))
+        raise RuntimeError("lost the king")
+    engine.searcher.search = fail
+    engine.handle("go infinite")
+    engine.handle("stop")
+    # The best move is still sent, and the position built again before the next search
+    assert answers(engine) == ["info string Search failed: RuntimeError: lost the king", "bestmove 0000"]
+    engine.handle("go depth 1")
+    assert answers(engine) == ["bestmove 0000"]
+    engine.handle("position startpos moves e2e4")
+    assert engine.chess.board.board_2_fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+
+def test_go_depth():
+    engine = UciEngine(output=io.StringIO())
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    engine.handle("go depth 3")
+    engine.thread.join()
+    lines = answers(engine)
+    assert lines[-2].startswith("info depth ")
+    assert " score mate 1 " in lines[-2]
+    assert lines[-1] == "bestmove d1d8"
+
+def test_stop_infinite():
+    engine = UciEngine(output=io.StringIO())
+    engine.handle("position startpos")
+    engine.handle("go infinite")
+    engine.thread.join(0.2)
+    # An infinite search only answers after stop
+    assert not any(line.startswith("bestmove") for line in engine.output.getvalue().splitlines())
+    engine.handle("stop")
+    lines = answers(engine)
+    assert lines[-1].startswith("bestmove ")
+    assert engine.thread is None
+
+def test_go_clock():
+    engine = UciEngine(output=io.StringIO())
+    engine.handle("position startpos moves e2e4")
+    engine.handle("go wtime 100 btime 3000 winc 0 binc 0")
+    assert 0.01 <= engine.searcher.time_limit <= 0.1
+    engine.thread.join()
+    assert answers(engine)[-1].startswith("bestmove ")
+    engine.handle("quit")
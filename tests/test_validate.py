@@ -0,0 +1,101 @@
+"""
+This test checks single move validation against the legal move generation.
+
+"""
+import random
+
+import pytest
+
+from mychess import Board, BitBoard, Chess, validate_batch
+from mychess.utils import move_2_uci
+from mychess.validate import MIN_POOL_BATCH
+
+
+fens = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+]
+all_moves = [((x, y), (to_x, to_y), promotion) for x in range(8) for y in range(8)
+             for to_x in range(8) for to_y in range(8) for promotion in "%qrbn"]
+
+@pytest.mark.parametrize("backend", [Board, BitBoard])
+@pytest.mark.parametrize("fen", fens)
+def test_is_legal(fen, backend):
+    generator = random.Random(fen)
+    board = backend(fen)
+    for _ in range(10):
+        legal_moves = board.generate_legal_moves()
+        if not legal_moves:
+            break
+        for move in legal_moves + generator.sample(all_moves, 200):
+            assert board.is_legal(move) == (move in legal_moves)
+        board.make_move(generator.choice(legal_moves))
+
+def test_validate_batch():
+    chess = Chess(debug=False)
+    chess.push_uci("e2e4")
+    mated = Chess("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3", debug=False)
+    items = [
+        (fens[0], "e2e4"),
+        (fens[0], "e2e5"),
+        (fens[0], "hello"),
+        (Board(fens[1]), "e1g1"),
+        (Board(fens[1]).to_bytes(), "e1c1"),
+        (chess, "e7e5"),
+        (chess, "e2e4"),
+        (mated, "a2a3"),
+        ("not a fen", "e2e4"),
+        (fens[5], "c4d3"),
+        (fens[5], "c5d4"),
+        (fens[0], "e2e4zzz"),
+        (fens[0], "e7e8qq"),
+    ]
+    results = validate_batch(items, workers=1)
+    assert [result.legal for result in results] == [True, False, False, True, True, True,
+                                                    False, False, False, True, True,
+                                                    False, False]
+    assert [result.uci_move for result in results] == [uci_move for _, uci_move in items]
+    assert results[1].error == "e2e5: illegal or impossible move"
+    assert "not in the format" in results[2].error
+    assert "the game is over" in results[7].error
+    assert results[8].error.startswith("Invalid position")
+    # Trailing characters are not ignored
+    assert "not in the format" in results[11].error
+    assert "not in the format" in results[12].error
+
+def test_validate_batch_bad_positions():
+    results = validate_batch([(b"too short", "e2e4"),
+                              ("8/8/8/8/8/8/8/K7 w - - 0 1", "a1a2"),
+                              ("rnbqxbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", "e2e4"),
+                              (fens[0], "e2e4")], workers=1)
+    assert [result.legal for result in results] == [False, False, False, True]
+    assert results[0].error.startswith("Invalid position")
+    assert results[1].error.startswith("Invalid position")
+    assert results[2].error.startswith("Invalid position")
+
+def test_validate_batch_live_boards():
+    # Boards are checked on themselves, even big batches with workers
+    boards = [BitBoard(fen) for fen in fens]
+    items = [(board, move_2_uci(move)) for board in boards
+             for move in board.generate_legal_moves()] * 2
+    assert len(items) >= MIN_POOL_BATCH
+    results = validate_batch(items, workers=2)
+    assert all(result.legal for result in results)
+    assert [board.board_2_fen() for board in boards] == [BitBoard(fen).board_2_fen() for fen in fens]
+
+def test_validate_batch_workers():
+    items = []
+    for fen in fens:
+        board = Board(fen)
+        legal_moves = board.generate_legal_moves()
+        items += [(fen, move_2_uci(move)) for move in legal_moves]
+        items += [(fen, move_2_uci(move)) for move in all_moves[:50] if move not in legal_moves]
+    assert len(items) >= MIN_POOL_BATCH
+    single = validate_batch(items, workers=1)
+    parallel = validate_batch(items, workers=2)
+    assert [(r.legal, r.error) for r in parallel] == [(r.legal, r.error) for r in single]
+    assert sum(r.legal for r in single) == sum(len(Board(fen).generate_legal_moves()) for fen in fens)